@@ -9,55 +9,217 @@ namespace py = pybind11;
 #include <xnect.hpp>
 #pragma warning(default:4101 4244 4267 4700)
 
+// HELPER FUNCTIONS
+
+/**
+ * \brief Checks that an output buffer is a writeable, C-contiguous array of the right type and shape.
+ *
+ * \param arr   The array.
+ * \param shape The shape the array must have.
+ * \param name  The name of the array (used in any error message).
+ * \return      The array, as an array of the right type.
+ * \throws      py::type_error If the array is not a C-contiguous array of the right type.
+ * \throws      py::value_error If the array is not writeable or has the wrong shape.
+ */
+template <typename T>
+py::array_t<T> check_out_array(py::handle arr, const std::vector<ptrdiff_t>& shape, const std::string& name)
+{
+  if(!py::isinstance<py::array_t<T, py::array::c_style>>(arr))
+  {
+    const std::string dtype = py::str(py::dtype::of<T>());
+    throw py::type_error("get_frame_results: expected " + name + " to be a C-contiguous array of dtype " + dtype);
+  }
+
+  auto result = py::reinterpret_borrow<py::array_t<T>>(arr);
+  if(!result.writeable())
+  {
+    throw py::value_error("get_frame_results: expected " + name + " to be writeable");
+  }
+
+  if(std::vector<ptrdiff_t>(result.shape(), result.shape() + result.ndim()) != shape)
+  {
+    std::string expected;
+    for(size_t i = 0; i < shape.size(); ++i) expected += (i > 0 ? "x" : "") + std::to_string(shape[i]);
+    const std::string actual = py::str(arr.attr("shape"));
+    throw py::value_error(
+      "get_frame_results: expected " + name + " to have shape " + expected + ", got shape " + actual
+    );
+  }
+
+  return result;
+}
+
+/**
+ * \brief Resets XNect's temporal tracking state via XNECT::resetSkeletons (used if XNect provides that function).
+ *
+ * \param self The XNect instance.
+ * \return     true, to indicate that the tracking state has been reset.
+ */
+template <typename T>
+auto reset_tracking(T& self, int) -> decltype(self.resetSkeletons(), bool())
+{
+  self.resetSkeletons();
+  return true;
+}
+
+/**
+ * \brief Fallback used if the version of XNect being used provides no way of resetting just its tracking state.
+ *
+ * \param self The XNect instance.
+ * \return     false, to indicate that the caller will need to re-construct the XNect instance instead.
+ */
+template <typename T>
+bool reset_tracking(T& self, long)
+{
+  return false;
+}
+
 PYBIND11_MODULE(pyxnect, m)
 {
   // CLASSES
 
   py::class_<XNECT>(m, "XNect")
     .def(
-      py::init<std::string>(),
+      py::init([](std::string configFile)
+      {
+        // XNect appends file names directly to the config path, so make sure that it ends with a separator.
+        if(!configFile.empty() && configFile.back() != '/' && configFile.back() != '\\') configFile += '/';
+        return new XNECT(configFile);
+      }),
       py::arg("config_file") = "../../data/FullBodyTracker/",
       py::call_guard<py::gil_scoped_release>()
     )
+    .def(
+      "get_frame_results",
+      [](XNECT& self, py::object out)
+      {
+        const int peopleCount = self.getNumOfPeople();
+        const int jointCount = self.getNumOf3DJoints();
+
+        const std::vector<ptrdiff_t> activeShape{peopleCount};
+        const std::vector<ptrdiff_t> positionsShape{peopleCount, jointCount, 3};
+        const std::vector<ptrdiff_t> localRotationsShape{peopleCount, jointCount, 3, 3};
+        const std::vector<ptrdiff_t> globalRotationsShape{peopleCount, 3, 3};
+        const std::vector<ptrdiff_t> joints2DShape{peopleCount, jointCount, 2};
+
+        // If no output buffers were passed in, allocate new arrays for the results. Otherwise, check that the
+        // buffers are suitable, and write the results into them (this avoids allocating anything per frame).
+        py::array_t<bool> active;
+        py::array_t<double> positions, localRotations, globalRotations, joints2D;
+        if(out.is_none())
+        {
+          active = py::array_t<bool>(activeShape);
+          positions = py::array_t<double>(positionsShape);
+          localRotations = py::array_t<double>(localRotationsShape);
+          globalRotations = py::array_t<double>(globalRotationsShape);
+          joints2D = py::array_t<double>(joints2DShape);
+        }
+        else
+        {
+          py::tuple buffers = py::tuple(out);
+          if(buffers.size() != 5)
+          {
+            throw py::value_error("get_frame_results: expected out to contain 5 arrays");
+          }
+
+          active = check_out_array<bool>(buffers[0], activeShape, "out[0]");
+          positions = check_out_array<double>(buffers[1], positionsShape, "out[1]");
+          localRotations = check_out_array<double>(buffers[2], localRotationsShape, "out[2]");
+          globalRotations = check_out_array<double>(buffers[3], globalRotationsShape, "out[3]");
+          joints2D = check_out_array<double>(buffers[4], joints2DShape, "out[4]");
+        }
+
+        bool *activePtr = active.mutable_data();
+        double *positionsPtr = positions.mutable_data();
+        double *localRotationsPtr = localRotations.mutable_data();
+        double *globalRotationsPtr = globalRotations.mutable_data();
+        double *joints2DPtr = joints2D.mutable_data();
+
+        // Fill in the arrays with the GIL released (if the arrays were passed in, the caller must not touch them
+        // from another thread until get_frame_results has returned).
+        {
+          py::gil_scoped_release release;
+
+          // Zero everything first, so that the slots of any inactive people have well-defined contents.
+          std::fill_n(activePtr, peopleCount, false);
+          std::fill_n(positionsPtr, peopleCount * jointCount * 3, 0.0);
+          std::fill_n(localRotationsPtr, peopleCount * jointCount * 9, 0.0);
+          std::fill_n(globalRotationsPtr, peopleCount * 9, 0.0);
+          std::fill_n(joints2DPtr, peopleCount * jointCount * 2, 0.0);
+
+          for(int p = 0; p < peopleCount; ++p)
+          {
+            if(!self.isPersonActive(p)) continue;
+            activePtr[p] = true;
+
+            Eigen::Matrix3f globalRotation = self.GetSkeletonGlobalRotation(p);
+            for(int i = 0; i < 9; ++i) globalRotationsPtr[p * 9 + i] = globalRotation(i / 3, i % 3);
+
+            for(int j = 0; j < jointCount; ++j)
+            {
+              const int pj = p * jointCount + j;
+
+              cv::Vec3f position = self.getJoint3DIK(p, j);
+              for(int i = 0; i < 3; ++i) positionsPtr[pj * 3 + i] = position[i];
+
+              Eigen::Matrix3f localRotation = self.GetJointLocalRotation(p, j);
+              for(int i = 0; i < 9; ++i) localRotationsPtr[pj * 9 + i] = localRotation(i / 3, i % 3);
+
+              cv::Vec2f joint2D = self.ProjectWithIntrinsics(position);
+              for(int i = 0; i < 2; ++i) joints2DPtr[pj * 2 + i] = joint2D[i];
+            }
+          }
+        }
+
+        return py::make_tuple(active, positions, localRotations, globalRotations, joints2D);
+      },
+      py::arg("out") = py::none()
+    )
     .def(
       "get_joint_local_rotation",
       [](XNECT& self, int p, int joint)
       {
-        Eigen::Matrix3f rawResult = self.GetJointLocalRotation(p, joint);
         auto result = py::array_t<double>(std::vector<ptrdiff_t>{3, 3});
         py::buffer_info buf = result.request();
         double *ptr = (double*)buf.ptr;
-        for(int i = 0; i < 9; ++i) ptr[i] = rawResult(i / 3, i % 3);
+        {
+          py::gil_scoped_release release;
+          Eigen::Matrix3f rawResult = self.GetJointLocalRotation(p, joint);
+          for(int i = 0; i < 9; ++i) ptr[i] = rawResult(i / 3, i % 3);
+        }
         return result;
-      }/*,
-      py::call_guard<py::gil_scoped_release>()*/
+      }
     )
     .def(
       "get_joint3d_ik",
       [](XNECT& self, int person, int joint)
       {
-        cv::Vec3f rawResult = self.getJoint3DIK(person, joint);
         auto result = py::array_t<double>(3);
         py::buffer_info buf = result.request();
         double *ptr = (double*)buf.ptr;
-        for(int i = 0; i < 3; ++i) ptr[i] = rawResult[i];
+        {
+          py::gil_scoped_release release;
+          cv::Vec3f rawResult = self.getJoint3DIK(person, joint);
+          for(int i = 0; i < 3; ++i) ptr[i] = rawResult[i];
+        }
         return result;
-      }/*,
-      py::call_guard<py::gil_scoped_release>()*/
+      }
     )
     .def("get_joint3d_parent", &XNECT::getJoint3DParent, py::call_guard<py::gil_scoped_release>())
     .def(
       "get_joint3d_pred",
       [](XNECT& self, int person, int joint)
       {
-        cv::Vec3f rawResult = self.getJoint3DPred(person, joint);
         auto result = py::array_t<double>(3);
         py::buffer_info buf = result.request();
         double *ptr = (double*)buf.ptr;
-        for(int i = 0; i < 3; ++i) ptr[i] = rawResult[i];
+        {
+          py::gil_scoped_release release;
+          cv::Vec3f rawResult = self.getJoint3DPred(person, joint);
+          for(int i = 0; i < 3; ++i) ptr[i] = rawResult[i];
+        }
         return result;
-      }/*,
-      py::call_guard<py::gil_scoped_release>()*/
+      }
     )
     .def("get_num_of_3d_joints", &XNECT::getNumOf3DJoints, py::call_guard<py::gil_scoped_release>())
     .def("get_num_of_people", &XNECT::getNumOfPeople, py::call_guard<py::gil_scoped_release>())
@@ -65,51 +227,82 @@ PYBIND11_MODULE(pyxnect, m)
       "get_person_colour",
       [](XNECT& self, int p)
       {
-        cv::Vec3b rawResult = self.getPersonColor(p);
         auto result = py::array_t<int>(3);
         py::buffer_info buf = result.request();
         int *ptr = (int*)buf.ptr;
-        for(int i = 0; i < 3; ++i) ptr[i] = rawResult[i];
+        {
+          py::gil_scoped_release release;
+          cv::Vec3b rawResult = self.getPersonColor(p);
+          for(int i = 0; i < 3; ++i) ptr[i] = rawResult[i];
+        }
         return result;
-      }/*,
-      py::call_guard<py::gil_scoped_release>()*/
+      }
     )
     .def(
       "get_skeleton_global_position",
       [](XNECT& self, int p)
       {
-        Eigen::Vector3f rawResult = self.GetSkeletonGlobalPosition(p);
         auto result = py::array_t<double>(3);
         py::buffer_info buf = result.request();
         double *ptr = (double*)buf.ptr;
-        for(int i = 0; i < 3; ++i) ptr[i] = rawResult(i);
+        {
+          py::gil_scoped_release release;
+          Eigen::Vector3f rawResult = self.GetSkeletonGlobalPosition(p);
+          for(int i = 0; i < 3; ++i) ptr[i] = rawResult(i);
+        }
         return result;
-      }/*,
-      py::call_guard<py::gil_scoped_release>()*/
+      }
     )
     .def(
       "get_skeleton_global_rotation",
       [](XNECT& self, int p)
       {
-        Eigen::Matrix3f rawResult = self.GetSkeletonGlobalRotation(p);
         auto result = py::array_t<double>(std::vector<ptrdiff_t>{3, 3});
         py::buffer_info buf = result.request();
         double *ptr = (double*)buf.ptr;
-        for(int i = 0; i < 9; ++i) ptr[i] = rawResult(i / 3, i % 3);
+        {
+          py::gil_scoped_release release;
+          Eigen::Matrix3f rawResult = self.GetSkeletonGlobalRotation(p);
+          for(int i = 0; i < 9; ++i) ptr[i] = rawResult(i / 3, i % 3);
+        }
         return result;
-      }/*,
-      py::call_guard<py::gil_scoped_release>()*/
+      }
     )
     .def("is_person_active", &XNECT::isPersonActive, py::call_guard<py::gil_scoped_release>())
     .def(
       "process_image",
-      [](XNECT& self, py::array_t<uint8_t> img)
+      [](XNECT& self, py::array img)
       {
-        py::buffer_info buf = img.request();
+        // Check that the image is an 8-bit, 3-channel image of the right shape.
+        if(!py::isinstance<py::array_t<uint8_t>>(img))
+        {
+          const std::string dtype = py::str(img.dtype());
+          throw py::type_error("process_image: expected a uint8 image, got dtype " + dtype);
+        }
+
+        if(img.ndim() != 3 || img.shape(2) != 3)
+        {
+          const std::string shape = py::str(img.attr("shape"));
+          throw py::value_error("process_image: expected an HxWx3 image, got shape " + shape);
+        }
+
+        // Wrap the image's buffer without copying it if it's C-contiguous; otherwise (e.g. for crops or mirrored
+        // views), make a single C-contiguous copy of it.
+        auto contiguousImg = py::array_t<uint8_t, py::array::c_style>::ensure(img);
+        py::buffer_info buf = contiguousImg.request();
         cv::Mat mat((int)buf.shape[0], (int)buf.shape[1], CV_8UC3, (unsigned char*)buf.ptr);
+
+        // Release the GIL while XNect does the heavy lifting, so that other Python threads can make progress.
+        // Note that the image buffer is kept alive by contiguousImg until the end of the call, but the caller
+        // must not modify the image from another thread until process_image has returned.
+        py::gil_scoped_release release;
         self.processImg(mat);
-      }/*,
-      py::call_guard<py::gil_scoped_release>()*/
+      }
+    )
+    .def(
+      "reset_tracking",
+      [](XNECT& self) { return reset_tracking(self, 0); },
+      py::call_guard<py::gil_scoped_release>()
     )
     .def(
       "project_with_intrinsics",
@@ -117,16 +310,19 @@ PYBIND11_MODULE(pyxnect, m)
       {
         py::buffer_info pointBuf = point.request();
         float *pointPtr = (float*)pointBuf.ptr;
-        cv::Vec2f rawResult = self.ProjectWithIntrinsics(cv::Vec3f((float*)pointBuf.ptr));
 
         auto result = py::array_t<double>(2);
         py::buffer_info resultBuf = result.request();
         double *resultPtr = (double*)resultBuf.ptr;
-        for(int i = 0; i < 2; ++i) resultPtr[i] = rawResult[i];
+
+        {
+          py::gil_scoped_release release;
+          cv::Vec2f rawResult = self.ProjectWithIntrinsics(cv::Vec3f(pointPtr));
+          for(int i = 0; i < 2; ++i) resultPtr[i] = rawResult[i];
+        }
 
         return result;
-      }/*,
-      py::call_guard<py::gil_scoped_release>()*/
+      }
     )
   ;
 }
@@ -1,10 +1,15 @@
 import numpy as np
 
+from typing import Optional, Tuple
+
 
 # CLASSES
 
 class XNect:
     def __init__(self, config_file: str = "../../data/FullBodyTracker/"): ...
+    def get_frame_results(
+        self, out: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]: ...
     def get_joint_local_rotation(self, p: int, joint: int) -> np.ndarray: ...
     def get_joint3d_ik(self, person: int, joint: int) -> np.ndarray: ...
     def get_joint3d_parent(self, joint: int) -> int: ...
@@ -17,3 +22,4 @@ class XNect:
     def is_person_active(self, p: int) -> bool: ...
     def process_image(self, img: np.ndarray) -> None: ...
     def project_with_intrinsics(self, point: np.ndarray) -> np.ndarray: ...
+    def reset_tracking(self) -> bool: ...
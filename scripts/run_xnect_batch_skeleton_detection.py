@@ -0,0 +1,324 @@
+# noinspection PyPackageRequirements
+import cv2
+# noinspection PyPackageRequirements
+import numpy as np
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer as timer
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from smg.pyxnect import SkeletonBatch, SkeletonDetector, SkeletonTracker
+
+
+# The file extensions of the images that will be read from an image directory.
+IMAGE_EXTENSIONS = (".bmp", ".jpeg", ".jpg", ".png", ".ppm", ".tif", ".tiff")
+
+
+def iterate_image_directory(directory: str, executor: ThreadPoolExecutor, prefetch: int) -> Iterator[np.ndarray]:
+    """
+    Iterate over the images in a directory (in filename order), decoding them ahead of time on a thread pool.
+
+    .. note::
+        At most prefetch images are decoded ahead of the one currently being processed, so the memory used is
+        bounded however long the sequence is.
+
+    :param directory:   The directory.
+    :param executor:    The thread pool on which to decode the images.
+    :param prefetch:    The maximum number of images to decode ahead of time.
+    :return:            An iterator over the decoded images.
+    """
+    filenames = sorted(f for f in os.listdir(directory) if f.lower().endswith(IMAGE_EXTENSIONS))  # type: List[str]
+    pending = deque()  # type: deque
+
+    def read_image(filename: str) -> np.ndarray:
+        image = cv2.imread(os.path.join(directory, filename), cv2.IMREAD_COLOR)  # type: Optional[np.ndarray]
+        if image is None:
+            raise RuntimeError("Could not read image '{}'".format(os.path.join(directory, filename)))
+        return image
+
+    try:
+        for filename in filenames:
+            pending.append(executor.submit(read_image, filename))
+            if len(pending) > prefetch:
+                yield pending.popleft().result()
+
+        while len(pending) > 0:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def iterate_video(filename: str, prefetch: int) -> Tuple[Iterator[np.ndarray], float]:
+    """
+    Iterate over the frames of a video, decoding them ahead of time on a background thread.
+
+    .. note::
+        Video decoding is inherently sequential, so only a single thread is used, but it still allows decoding
+        to overlap with detection. At most prefetch frames are decoded ahead of the one currently being processed.
+
+    :param filename:    The name of the video file.
+    :param prefetch:    The maximum number of frames to decode ahead of time.
+    :return:            A tuple consisting of an iterator over the decoded frames, and the video's frame rate
+                        (or 0 if it's unknown).
+    """
+    # Note: The video is opened eagerly (rather than on the first call to next), so that any failure to open it
+    #       is reported before any output is written.
+    capture = cv2.VideoCapture(filename)
+    if not capture.isOpened():
+        raise RuntimeError("Could not open video '{}'".format(filename))
+    fps = capture.get(cv2.CAP_PROP_FPS)  # type: float
+
+    frames = queue.Queue(maxsize=prefetch)  # type: queue.Queue
+    should_stop = threading.Event()
+
+    def put(item: Optional[np.ndarray]) -> None:
+        # Wait for space in the queue, periodically checking whether the consumer has given up.
+        while not should_stop.is_set():
+            try:
+                frames.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def read_frames() -> None:
+        try:
+            while not should_stop.is_set():
+                success, frame = capture.read()
+                if not success:
+                    break
+                put(frame)
+        finally:
+            capture.release()
+            put(None)
+
+    def generate_frames() -> Iterator[np.ndarray]:
+        reader = threading.Thread(target=read_frames, daemon=True)
+        reader.start()
+
+        try:
+            while True:
+                frame = frames.get()  # type: Optional[np.ndarray]
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            should_stop.set()
+
+    return generate_frames(), fps
+
+
+def batch_to_json(batch: SkeletonBatch) -> Dict[str, Any]:
+    """
+    Convert a batch of skeletons into a JSON-serialisable form.
+
+    :param batch:   The batch of skeletons.
+    :return:        The JSON-serialisable form of the batch.
+    """
+    keypoint_names = batch.get_keypoint_names()
+    global_rotations = batch.get_global_rotations()  # type: Optional[np.ndarray]
+    local_rotations = batch.get_local_rotations()  # type: Optional[np.ndarray]
+    people = []  # type: List[Dict[str, Any]]
+
+    for i, (person_id, active, positions) in enumerate(zip(
+        batch.get_person_ids().tolist(), batch.get_active().tolist(), batch.get_positions().tolist()
+    )):
+        person = {
+            "active": active,
+            "id": person_id,
+            "keypoints": dict(zip(keypoint_names, positions))
+        }  # type: Dict[str, Any]
+
+        if global_rotations is not None:
+            person["global_rotation"] = global_rotations[i].tolist()
+            person["local_rotations"] = dict(zip(keypoint_names, local_rotations[i].tolist()))
+
+        people.append(person)
+
+    return {"frame_idx": batch.get_frame_idx(), "people": people}
+
+
+def write_batch(f: BinaryIO, batch: SkeletonBatch, output_format: str) -> None:
+    """
+    Append a batch of skeletons to an output file.
+
+    .. note::
+        In "jsonl" format, each batch is written as a single line of JSON. In "binary" format, each batch is
+        written as a 4-byte little-endian length, followed by the batch in the form produced by
+        SkeletonBatch.to_bytes (which can be read back using SkeletonBatch.from_bytes).
+
+    :param f:               The output file.
+    :param batch:           The batch of skeletons.
+    :param output_format:   The output format ("jsonl" or "binary").
+    """
+    if output_format == "jsonl":
+        f.write(json.dumps(batch_to_json(batch), separators=(",", ":")).encode("utf-8"))
+        f.write(b"\n")
+    else:
+        data = batch.to_bytes()  # type: bytes
+        f.write(struct.pack("<I", len(data)))
+        f.write(data)
+
+
+def process_sequence(source: str, skeleton_detector: SkeletonDetector, executor: ThreadPoolExecutor,
+                     args: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Detect the skeletons in a single sequence (a video file or an image directory), and write them to disk.
+
+    :param source:              The video file or image directory.
+    :param skeleton_detector:   The skeleton detector.
+    :param executor:            The thread pool on which to decode the images of an image directory.
+    :param args:                The command-line arguments.
+    :return:                    Throughput statistics for the sequence.
+    """
+    # Note: The frames are decoded much faster (or slower) than they were captured, so they're time-stamped using
+    #       the sequence's frame rate, so that the extrapolated and tracked skeletons don't depend on how fast we
+    #       manage to process them.
+    fps = args["fps"]  # type: float
+    if os.path.isdir(source):
+        frames = iterate_image_directory(source, executor, args["prefetch"])  # type: Iterator[np.ndarray]
+    else:
+        frames, video_fps = iterate_video(source, args["prefetch"])
+        if video_fps > 0:
+            fps = video_fps
+
+    extension = ".jsonl" if args["format"] == "jsonl" else ".skb"  # type: str
+    output_filename = os.path.join(
+        args["output_dir"], os.path.splitext(os.path.basename(os.path.normpath(source)))[0] + extension
+    )  # type: str
+
+    # Make sure that the detector's state from any previous sequence doesn't leak into this one.
+    skeleton_detector.restart()
+
+    frame_count = 0  # type: int
+    wait_time = 0.0  # type: float
+    start = timer()  # type: float
+
+    with open(output_filename, "wb") as f:
+        while True:
+            # Get the next frame, recording how long we had to wait for it to be decoded.
+            wait_start = timer()  # type: float
+            frame = next(frames, None)  # type: Optional[np.ndarray]
+            wait_time += timer() - wait_start
+            if frame is None:
+                break
+
+            # Detect any skeletons in the frame, and write them straight out.
+            batch, _ = skeleton_detector.detect_skeleton_batch(
+                frame, np.eye(4), timestamp=frame_count / fps, use_xnect_poses=args["use_xnect_poses"]
+            )
+            write_batch(f, batch, args["format"])
+            frame_count += 1
+
+    elapsed = timer() - start  # type: float
+    print("{}: {} frames in {:.2f}s ({:.2f} FPS, {:.1f}% of the time waiting for frames) -> {}".format(
+        source, frame_count, elapsed, frame_count / elapsed if elapsed > 0 else 0.0,
+        100 * wait_time / elapsed if elapsed > 0 else 0.0, output_filename
+    ))
+
+    return {"elapsed": elapsed, "frame_count": frame_count, "wait_time": wait_time}
+
+
+def main() -> None:
+    np.set_printoptions(suppress=True)
+
+    # Parse any command-line arguments.
+    parser = ArgumentParser(description="Detect 3D skeletons in video files and/or image directories, headlessly.")
+    parser.add_argument(
+        "sources", type=str, nargs="+",
+        help="the video files and/or image directories to process (each is treated as a separate sequence)"
+    )
+    parser.add_argument(
+        "--data_dir", type=str, default="D:/xnect/data",
+        help="the XNect data directory"
+    )
+    parser.add_argument(
+        "--decode_threads", type=int, default=2,
+        help="the number of threads to use to decode the images of an image directory"
+    )
+    parser.add_argument(
+        "--format", type=str, default="jsonl", choices=["binary", "jsonl"],
+        help="the format in which to write the skeletons"
+    )
+    parser.add_argument(
+        "--fps", type=float, default=30.0,
+        help="the frame rate of the image directories (and of any videos that don't specify one)"
+    )
+    parser.add_argument(
+        "--inference_interval", type=int, default=1,
+        help="the interval (in frames) at which to run XNect (the skeletons for other frames are extrapolated)"
+    )
+    parser.add_argument(
+        "--output_dir", "-o", type=str, default=".",
+        help="the directory to which to write the skeletons (one file per sequence)"
+    )
+    parser.add_argument(
+        "--prefetch", type=int, default=8,
+        help="the maximum number of frames to decode ahead of the one being processed"
+    )
+    parser.add_argument(
+        "--roi_padding", type=float,
+        help="the padding around the previous frame's people of the region of interest to which to crop each image"
+    )
+    parser.add_argument(
+        "--track", action="store_true",
+        help="whether to track the people over time (giving them stable IDs and smoothing their joints)"
+    )
+    parser.add_argument(
+        "--use_xnect_poses", action="store_true",
+        help="whether to output the joint rotations produced by XNect"
+    )
+    args = vars(parser.parse_args())  # type: Dict[str, Any]
+
+    if args["fps"] <= 0:
+        parser.error("--fps must be positive")
+    if args["prefetch"] < 1:
+        parser.error("--prefetch must be at least 1")
+
+    os.makedirs(args["output_dir"], exist_ok=True)
+
+    # Construct the skeleton detector. This is done once, and it's then restarted between sequences, which is much
+    # cheaper than constructing a new one for each sequence. Since each batch is written out before the next frame
+    # is processed, the detector can safely write its outputs into the same buffers every frame.
+    skeleton_detector = SkeletonDetector(
+        data_dir=args["data_dir"], inference_interval=args["inference_interval"], reuse_buffers=True,
+        roi_padding=args["roi_padding"], tracker_factory=SkeletonTracker if args["track"] else None
+    )
+
+    # Process each sequence in turn.
+    total_elapsed = 0.0  # type: float
+    total_frame_count = 0  # type: int
+    failure_count = 0  # type: int
+
+    with ThreadPoolExecutor(max_workers=args["decode_threads"]) as executor:
+        for source in args["sources"]:
+            try:
+                stats = process_sequence(source, skeleton_detector, executor, args)  # type: Dict[str, float]
+            except RuntimeError as e:
+                print("{}: {}".format(source, e), file=sys.stderr)
+                failure_count += 1
+                continue
+
+            total_elapsed += stats["elapsed"]
+            total_frame_count += stats["frame_count"]
+
+    # Report the overall throughput, and the latencies of the individual stages of the detection process.
+    print("Total: {} frames in {:.2f}s ({:.2f} FPS), {} of {} sequence(s) failed".format(
+        total_frame_count, total_elapsed, total_frame_count / total_elapsed if total_elapsed > 0 else 0.0,
+        failure_count, len(args["sources"])
+    ))
+    print(skeleton_detector.get_latency_monitor().format_statistics())
+
+    sys.exit(1 if failure_count > 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+# noinspection PyPackageRequirements
+import numpy as np
+import importlib.util
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+
+from argparse import ArgumentParser
+from datetime import datetime
+from timeit import default_timer as timer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from smg.pyxnect import SkeletonBatch, SkeletonDetector, SkeletonDetectorPool, SyntheticXNect
+
+
+# The input resolutions over which to sweep, as (width, height) pairs.
+RESOLUTIONS = {
+    "480p": (640, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4K": (3840, 2160)
+}  # type: Dict[str, Tuple[int, int]]
+
+# The numbers of people over which to sweep.
+PEOPLE_COUNTS = [1, 5, 10, 20]  # type: List[int]
+
+
+def make_detector(people_count: int, resolution: Tuple[int, int]) -> SkeletonDetector:
+    """
+    Make a skeleton detector that uses a synthetic backend with the specified number of people and image resolution.
+
+    :param people_count:    The number of people.
+    :param resolution:      The image resolution, as a (width, height) pair.
+    :return:                The skeleton detector.
+    """
+    width, height = resolution
+    f = 532.57 * width / 640  # type: float
+    return SkeletonDetector(backend_factory=lambda: SyntheticXNect(
+        intrinsics=(f, f, width / 2, height / 2), max_num_people=max(people_count, 15), num_people=people_count
+    ))
+
+
+def load_service_script() -> Any:
+    """
+    Load the XNect skeleton detection service script as a module, so that its frame processor can be benchmarked.
+
+    :return:    The loaded module.
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_xnect_skeleton_detection_service.py")
+    spec = importlib.util.spec_from_file_location("run_xnect_skeleton_detection_service", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def time_function(fn: Callable[[], Any], *, rounds: int, warmup_rounds: int) -> Dict[str, float]:
+    """
+    Time repeated calls to a function.
+
+    :param fn:              The function to time.
+    :param rounds:          The number of timed calls to make.
+    :param warmup_rounds:   The number of untimed calls to make first.
+    :return:                Summary statistics (in seconds) for the timed calls.
+    """
+    for _ in range(warmup_rounds):
+        fn()
+
+    times = np.zeros(rounds)  # type: np.ndarray
+    for i in range(rounds):
+        start = timer()
+        fn()
+        times[i] = timer() - start
+
+    return {
+        "max": float(np.max(times)),
+        "mean": float(np.mean(times)),
+        "median": float(np.median(times)),
+        "min": float(np.min(times)),
+        "p95": float(np.percentile(times, 95)),
+        "rounds": rounds,
+        "stddev": float(np.std(times))
+    }
+
+
+def make_benchmarks() -> List[Tuple[str, Callable[[], Callable[[], Any]]]]:
+    """
+    Make the benchmarks to run.
+
+    .. note::
+        Each benchmark is a (name, setup) pair, where the setup function makes the function to be timed. Setup
+        is deferred so that only the benchmarks that are actually selected need to be set up.
+
+    :return:    The benchmarks to run.
+    """
+    benchmarks = []  # type: List[Tuple[str, Callable[[], Callable[[], Any]]]]
+
+    # Benchmark detect_skeletons, sweeping over the people count and resolution, with XNect poses on/off and
+    # visualisation on/off.
+    for resolution_name, resolution in RESOLUTIONS.items():
+        for people_count in PEOPLE_COUNTS:
+            for use_xnect_poses in [False, True]:
+                for visualise in [False, True]:
+                    def setup(people_count=people_count, resolution=resolution, use_xnect_poses=use_xnect_poses,
+                              visualise=visualise) -> Callable[[], Any]:
+                        detector = make_detector(people_count, resolution)
+                        image = np.zeros((resolution[1], resolution[0], 3), dtype=np.uint8)
+                        return lambda: detector.detect_skeletons(
+                            image, np.eye(4), use_xnect_poses=use_xnect_poses, visualise=visualise
+                        )
+
+                    benchmarks.append((
+                        "detect_skeletons[res={},people={},poses={},visualise={}]".format(
+                            resolution_name, people_count, int(use_xnect_poses), int(visualise)
+                        ), setup
+                    ))
+
+    # Benchmark the frame processor of the skeleton detection service end-to-end.
+    for people_count in PEOPLE_COUNTS:
+        for use_xnect_poses in [False, True]:
+            def setup(people_count=people_count, use_xnect_poses=use_xnect_poses) -> Callable[[], Any]:
+                service_script = load_service_script()
+                pool = SkeletonDetectorPool(1, detector_factory=lambda: make_detector(people_count, (640, 480)))
+                frame_processor = service_script.make_frame_processor(pool, 0, use_xnect_poses=use_xnect_poses)
+                colour_image = np.zeros((480, 640, 3), dtype=np.uint8)
+                depth_image = np.zeros((480, 640), dtype=np.float32)
+                intrinsics = (532.57, 531.54, 320.0, 240.0)
+                return lambda: frame_processor(0, colour_image, depth_image, np.eye(4), intrinsics)
+
+            benchmarks.append((
+                "service_frame_processor[people={},poses={}]".format(people_count, int(use_xnect_poses)), setup
+            ))
+
+    # Benchmark making skeletons bare and round-tripping them through pickle (as the service does over the network).
+    for people_count in PEOPLE_COUNTS:
+        def setup(people_count=people_count) -> Callable[[], Any]:
+            detector = make_detector(people_count, (640, 480))
+            skeletons, _ = detector.detect_skeletons(
+                np.zeros((480, 640, 3), dtype=np.uint8), np.eye(4), use_xnect_poses=True
+            )
+            return lambda: pickle.loads(pickle.dumps([s.make_bare() for s in skeletons]))
+
+        benchmarks.append(("make_bare_round_trip[people={}]".format(people_count), setup))
+
+    # Benchmark round-tripping skeleton batches through their compact binary serialisation.
+    for people_count in PEOPLE_COUNTS:
+        for use_xnect_poses in [False, True]:
+            def setup(people_count=people_count, use_xnect_poses=use_xnect_poses) -> Callable[[], Any]:
+                detector = make_detector(people_count, (640, 480))
+                batch, _ = detector.detect_skeleton_batch(
+                    np.zeros((480, 640, 3), dtype=np.uint8), np.eye(4), use_xnect_poses=use_xnect_poses
+                )
+                return lambda: SkeletonBatch.from_bytes(batch.to_bytes())
+
+            benchmarks.append((
+                "skeleton_batch_round_trip[people={},poses={}]".format(people_count, int(use_xnect_poses)), setup
+            ))
+
+    return benchmarks
+
+
+def get_metadata() -> Dict[str, Any]:
+    """
+    Get metadata describing the environment in which the benchmarks are being run.
+
+    :return:    The metadata.
+    """
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL
+        ).decode().strip()  # type: Optional[str]
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "machine": platform.machine(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def run(args: Dict[str, Any]) -> int:
+    """
+    Run the benchmarks and save the results as JSON.
+
+    :param args:    The command-line arguments.
+    :return:        The exit code.
+    """
+    results = {}  # type: Dict[str, Dict[str, float]]
+
+    for name, setup in make_benchmarks():
+        if args["filter"] is not None and args["filter"] not in name:
+            continue
+
+        try:
+            fn = setup()
+        except ImportError as e:
+            print("Skipping {} ({})".format(name, e))
+            continue
+
+        results[name] = time_function(fn, rounds=args["rounds"], warmup_rounds=args["warmup_rounds"])
+        print("{:<72} median {:10.3f} ms   p95 {:10.3f} ms".format(
+            name, results[name]["median"] * 1000, results[name]["p95"] * 1000
+        ))
+
+    with open(args["output"], "w") as f:
+        json.dump({"benchmarks": results, "metadata": get_metadata()}, f, indent=2, sort_keys=True)
+
+    print("Saved results to {}".format(args["output"]))
+    return 0
+
+
+def compare(args: Dict[str, Any]) -> int:
+    """
+    Compare two sets of benchmark results, and report any regressions.
+
+    :param args:    The command-line arguments.
+    :return:        The exit code (1 if any regressions were found, or 0 otherwise).
+    """
+    with open(args["baseline"]) as f:
+        baseline = json.load(f)["benchmarks"]  # type: Dict[str, Dict[str, float]]
+    with open(args["contender"]) as f:
+        contender = json.load(f)["benchmarks"]  # type: Dict[str, Dict[str, float]]
+
+    regression_count = 0  # type: int
+    statistic = args["statistic"]  # type: str
+
+    for name in sorted(set(baseline.keys()) & set(contender.keys())):
+        before, after = baseline[name][statistic], contender[name][statistic]
+        ratio = after / before if before > 0 else float("inf")  # type: float
+
+        if ratio > 1 + args["threshold"]:
+            status = "REGRESSION"
+            regression_count += 1
+        elif ratio < 1 - args["threshold"]:
+            status = "improvement"
+        else:
+            status = ""
+
+        print("{:<72} {:10.3f} ms -> {:10.3f} ms  x{:6.3f}  {}".format(
+            name, before * 1000, after * 1000, ratio, status
+        ))
+
+    for name in sorted(set(baseline.keys()) ^ set(contender.keys())):
+        print("{:<72} only in {}".format(name, "baseline" if name in baseline else "contender"))
+
+    print("{} regression(s) found (threshold: {:.0f}%)".format(regression_count, args["threshold"] * 100))
+    return 1 if regression_count > 0 else 0
+
+
+def main() -> None:
+    # Parse any command-line arguments.
+    parser = ArgumentParser(description="Benchmark the Python-side XNect skeleton detection pipeline.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks and save the results as JSON")
+    run_parser.add_argument(
+        "--filter", "-k", type=str,
+        help="only run the benchmarks whose names contain this string"
+    )
+    run_parser.add_argument(
+        "--output", "-o", type=str, default="xnect_benchmarks.json",
+        help="the file to which to save the results"
+    )
+    run_parser.add_argument(
+        "--rounds", type=int, default=50,
+        help="the number of timed rounds for each benchmark"
+    )
+    run_parser.add_argument(
+        "--warmup_rounds", type=int, default=5,
+        help="the number of untimed warm-up rounds for each benchmark"
+    )
+
+    compare_parser = subparsers.add_parser("compare", help="compare two sets of saved results")
+    compare_parser.add_argument("baseline", type=str, help="the baseline results")
+    compare_parser.add_argument("contender", type=str, help="the results to compare against the baseline")
+    compare_parser.add_argument(
+        "--statistic", type=str, default="median", choices=["mean", "median", "min", "p95"],
+        help="the statistic to compare"
+    )
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.1,
+        help="the relative slowdown above which a benchmark is counted as having regressed"
+    )
+
+    args = vars(parser.parse_args())  # type: Dict[str, Any]
+
+    if args["command"] == "run":
+        sys.exit(run(args))
+    elif args["command"] == "compare":
+        sys.exit(compare(args))
+    else:
+        parser.print_help()
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,16 +7,20 @@ import os
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
 # noinspection PyPackageRequirements
 import pygame
+import threading
+import time
 
 # noinspection PyPackageRequirements
 from OpenGL.GL import *
+from argparse import ArgumentParser
+from concurrent.futures import Future, wait
 from timeit import default_timer as timer
-from typing import List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from smg.comms.base import RGBDFrameMessageUtil, RGBDFrameReceiver
 from smg.comms.mapping import MappingServer
 from smg.opengl import OpenGLMatrixContext, OpenGLUtil
-from smg.pyxnect import SkeletonDetector
+from smg.pyxnect import AsyncSkeletonDetector, ResultPresenter, SkeletonDetectionResult, SkeletonDetector
 from smg.rigging.cameras import SimpleCamera
 from smg.rigging.controllers import KeyboardCameraController
 from smg.rigging.helpers import CameraPoseConverter
@@ -27,20 +31,28 @@ from smg.utility import GeometryUtil, PooledQueue
 def main() -> None:
     np.set_printoptions(suppress=True)
 
-    # Initialise PyGame and create the window.
-    pygame.init()
-    window_size = (640, 480)  # type: Tuple[int, int]
-    pygame.display.set_mode(window_size, pygame.DOUBLEBUF | pygame.OPENGL)
-    pygame.display.set_caption("XNect 3D Skeleton Detection Server")
-
-    # Enable the z-buffer.
-    glEnable(GL_DEPTH_TEST)
-    glDepthFunc(GL_LESS)
-
-    # Construct the camera controller.
-    camera_controller = KeyboardCameraController(
-        SimpleCamera([0, 0, 0], [0, 0, 1], [0, -1, 0]), canonical_angular_speed=0.05, canonical_linear_speed=0.1
+    # Parse any command-line arguments.
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--display_rate", type=float,
+        help="the maximum rate (in Hz) at which to update the display (if not specified, as fast as possible)"
+    )
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="whether to run without a display (the detection times are still printed)"
+    )
+    parser.add_argument(
+        "--inference_interval", type=int, default=1,
+        help="the interval (in frames) at which to run XNect (the skeletons for other frames are extrapolated)"
     )
+    parser.add_argument(
+        "--latency_budget", type=float,
+        help="an average per-frame latency budget (in seconds) that determines which frames XNect is run on"
+    )
+    args = vars(parser.parse_args())  # type: Dict[str, Any]
+
+    # Construct the presenter via which the detection results will be passed to the display loop.
+    presenter = ResultPresenter(max_rate=args["display_rate"])
 
     # Construct the mapping server.
     with MappingServer(
@@ -50,21 +62,113 @@ def main() -> None:
         client_id = 0  # type: int
         image_size = None  # type: Optional[Tuple[int, int]]
         intrinsics = None  # type: Optional[Tuple[float, float, float, float]]
+        newest_frame_idx = -1  # type: int
+        newest_result_lock = threading.Lock()
         receiver = RGBDFrameReceiver()
         skeletons_3d = []  # type: List[Skeleton3D]
 
-        # Construct the skeleton detector.
-        skeleton_detector = SkeletonDetector()
+        def on_detection_finished(future: Future, start: float) -> None:
+            """
+            Publish the result of detecting skeletons in a frame for display (if it's the newest one so far).
+
+            .. note::
+                This is called on the detector's worker thread.
+
+            :param future:  The future for the detection.
+            :param start:   The time at which the frame was submitted for detection.
+            """
+            nonlocal newest_frame_idx
+            if not future.cancelled() and future.exception() is None:
+                result = future.result()  # type: SkeletonDetectionResult
+                with newest_result_lock:
+                    if result.frame_idx > newest_frame_idx:
+                        newest_frame_idx = result.frame_idx
+                        presenter.publish(result)
+                        print("Skeleton Detection Time (incl. Queueing): {}s".format(timer() - start))
+
+        def submit_frames() -> None:
+            """
+            Repeatedly submit the newest frame from the client (if any) for skeleton detection.
+
+            .. note::
+                Each frame is consumed from the server's queue when it's fetched (skipping any older frames that are
+                still waiting), so it's only ever submitted once. To avoid fetching frames that would just be dropped,
+                we wait for the detector to finish with the previous frame before fetching another one.
+            """
+            nonlocal image_size, intrinsics
+            while True:
+                # If the server doesn't yet have a frame from the client that has not yet been processed, wait briefly
+                # before checking again (this is a cheap check that doesn't touch the frames themselves).
+                if not server.has_frames_now(client_id):
+                    time.sleep(0.001)
+                    continue
+
+                # Get the camera parameters from the server.
+                height, width, _ = server.get_image_shapes(client_id)[0]
+                image_size = (width, height)
+                intrinsics = server.get_intrinsics(client_id)[0]
+
+                # Get the newest frame from the server, consuming any older ones along the way.
+                while server.has_frames_now(client_id):
+                    server.get_frame(client_id, receiver)
+                colour_image = receiver.get_rgb_image()  # type: np.ndarray
+                tracker_w_t_c = receiver.get_pose()  # type: np.ndarray
+
+                # Submit the colour image to XNect for 3D skeleton detection. Note that we copy the image and pose,
+                # since the receiver may reuse their memory for the next frame.
+                future = skeleton_detector.submit(
+                    colour_image.copy(), tracker_w_t_c.copy(), visualise=not args["headless"]
+                )  # type: Future
+                future.add_done_callback(lambda f, start=timer(): on_detection_finished(f, start))
+
+                # Wait for the detector to finish with the frame before fetching the next one.
+                wait([future])
+
+        # Construct the skeleton detector, which runs on its own thread so that detection can overlap with
+        # receiving frames and rendering. If frames arrive faster than they can be processed, only the newest
+        # frame waiting to be processed is kept. If requested, XNect itself is only run on some of the frames, and
+        # the skeletons for the others are extrapolated, so that the skeletons are updated more smoothly.
+        skeleton_detector = AsyncSkeletonDetector(
+            detector_factory=lambda: SkeletonDetector(
+                inference_interval=args["inference_interval"], latency_budget=args["latency_budget"]
+            ),
+            drop_policy=AsyncSkeletonDetector.DP_LATEST_WINS
+        )
 
         # Start the server.
         server.start()
 
+        # If we're running headless, just submit frames for detection on the main thread.
+        if args["headless"]:
+            submit_frames()
+            return
+
+        # Otherwise, submit frames on their own thread, so that detection proceeds at the full inference rate, and
+        # run the display loop on the main thread (which owns the windows).
+        threading.Thread(target=submit_frames, daemon=True).start()
+
+        # Initialise PyGame and create the window.
+        pygame.init()
+        window_size = (640, 480)  # type: Tuple[int, int]
+        pygame.display.set_mode(window_size, pygame.DOUBLEBUF | pygame.OPENGL)
+        pygame.display.set_caption("XNect 3D Skeleton Detection Server")
+
+        # Enable the z-buffer.
+        glEnable(GL_DEPTH_TEST)
+        glDepthFunc(GL_LESS)
+
+        # Construct the camera controller.
+        camera_controller = KeyboardCameraController(
+            SimpleCamera([0, 0, 0], [0, 0, 1], [0, -1, 0]), canonical_angular_speed=0.05, canonical_linear_speed=0.1
+        )
+
         while True:
             # Process any PyGame events.
             for event in pygame.event.get():
                 # If the user wants us to quit:
                 if event.type == pygame.QUIT:
-                    # Shut down pygame, and destroy any OpenCV windows.
+                    # Shut down the skeleton detector and pygame, and destroy any OpenCV windows.
+                    skeleton_detector.terminate()
                     pygame.quit()
                     cv2.destroyAllWindows()
 
@@ -72,28 +176,14 @@ def main() -> None:
                     # noinspection PyProtectedMember
                     os._exit(0)
 
-            # If the server has a frame from the client that has not yet been processed:
-            if server.has_frames_now(client_id):
-                # Get the camera parameters from the server.
-                height, width, _ = server.get_image_shapes(client_id)[0]
-                image_size = (width, height)
-                intrinsics = server.get_intrinsics(client_id)[0]
-
-                # Get the newest frame from the server.
-                server.peek_newest_frame(client_id, receiver)
-                colour_image = receiver.get_rgb_image()  # type: np.ndarray
-                tracker_w_t_c = receiver.get_pose()  # type: np.ndarray
-
-                # Use XNect to detect 3D skeletons in the colour image.
-                start = timer()
-                skeletons_3d, visualisation = skeleton_detector.detect_skeletons(
-                    colour_image, tracker_w_t_c, visualise=True
-                )
-                end = timer()
-                print("Skeleton Detection Time: {}s".format(end - start))
+            # If a newer detection result than the one we're currently showing is available, show it (any results
+            # produced since the last one we showed are dropped).
+            result = presenter.take_latest()  # type: Optional[SkeletonDetectionResult]
+            if result is not None:
+                skeletons_3d = result.skeletons
 
                 # Show any visualisation produced during the detection process.
-                cv2.imshow("Output Visualisation", visualisation)
+                cv2.imshow("Output Visualisation", result.visualisation)
                 cv2.waitKey(1)
 
             # Allow the user to control the camera.
@@ -1,21 +1,21 @@
 # noinspection PyPackageRequirements
 import numpy as np
 import os
-
-os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
-# noinspection PyPackageRequirements
-import pygame
+import threading
 
 from argparse import ArgumentParser
 from timeit import default_timer as timer
-from typing import Callable, List, Optional, Tuple
+from typing import Callable, List, Optional, Tuple, Union
 
 from smg.comms.skeletons import SkeletonDetectionService
-from smg.pyxnect import SkeletonDetector
+from smg.pyxnect import DepthScaleCorrector, PeopleMaskRasteriser, SkeletonDetector, SkeletonDetectorPool
+from smg.pyxnect import SkeletonDetectorProcessPool
 from smg.skeletons import Skeleton3D
 
 
-def make_frame_processor(skeleton_detector: SkeletonDetector, *, debug: bool = False, use_xnect_poses: bool) -> \
+def make_frame_processor(skeleton_detector_pool: SkeletonDetectorPool, client_id: int, *, debug: bool = False,
+                         depth_gate_people_masks: bool = False, latency_report_interval: Optional[float] = None,
+                         make_people_masks: bool = False, use_xnect_poses: bool) -> \
         Callable[
             [int, np.ndarray, np.ndarray, np.ndarray, Tuple[float, float, float, float]],
             Tuple[List[Skeleton3D], Optional[np.ndarray]]
@@ -23,11 +23,28 @@ def make_frame_processor(skeleton_detector: SkeletonDetector, *, debug: bool = F
     """
     Make a frame processor for a skeleton detection service that forwards to an XNect skeleton detector.
 
-    :param skeleton_detector:   The XNect skeleton detector.
-    :param debug:               Whether to print debug messages.
-    :param use_xnect_poses:     Whether to use the joint poses produced by XNect.
-    :return:                    The frame processor.
+    .. note::
+        The frame processor uses the detector from the pool that's assigned to the specified client, acquiring
+        one from the pool (and waiting for one to become free if necessary) if the client doesn't yet have one.
+    .. note::
+        If requested, the frame processor also makes a people mask for each frame on the CPU (see
+        SkeletonDetector.make_people_mask), so that the service doesn't need to render one with OpenGL.
+    .. note::
+        The depth image for each frame is always passed to the detector, which uses it to correct the skeletons if
+        it was constructed with a depth scale corrector (and ignores it otherwise).
+
+    :param skeleton_detector_pool:  The pool of XNect skeleton detectors.
+    :param client_id:               The ID of the client whose frames will be processed.
+    :param debug:                   Whether to print debug messages.
+    :param depth_gate_people_masks: Whether to use the depth image to gate the people masks.
+    :param latency_report_interval: The interval (in seconds) at which to print the latency statistics of the
+                                    client's detector (None = never).
+    :param make_people_masks:       Whether to make the people masks on the CPU.
+    :param use_xnect_poses:         Whether to use the joint poses produced by XNect.
+    :return:                        The frame processor.
     """
+    last_latency_report_time = timer()  # type: float
+
     # noinspection PyUnusedLocal
     def detect_skeletons(frame_idx: int, colour_image: np.ndarray, depth_image: np.ndarray,
                          world_from_camera: np.ndarray, intrinsics: Tuple[float, float, float, float]) \
@@ -37,18 +54,34 @@ def make_frame_processor(skeleton_detector: SkeletonDetector, *, debug: bool = F
 
         :param frame_idx:           Passed in by the skeleton detection service, but ignored.
         :param colour_image:        The RGB image.
-        :param depth_image:         Passed in by the skeleton detection service, but ignored.
+        :param depth_image:         The depth image (only used if the skeletons are being depth-corrected or the
+                                    people masks are being depth-gated).
         :param world_from_camera:   The camera pose.
-        :param intrinsics:          Passed in by the skeleton detection service, but ignored (currently).
-        :return:                    The detected 3D skeletons (the people mask will be rendered internally).
+        :param intrinsics:          The camera intrinsics (only used if the people masks are being made).
+        :return:                    The detected 3D skeletons, and the people mask (if we're making it, or None if
+                                    it should be rendered internally by the service).
         """
+        nonlocal last_latency_report_time
+
         if debug:
             start = timer()
 
-        # Detect the skeletons.
-        skeletons, _ = skeleton_detector.detect_skeletons(
-            colour_image, world_from_camera, use_xnect_poses=use_xnect_poses
-        )
+        # Detect the skeletons, and make the people mask if requested.
+        skeleton_detector = skeleton_detector_pool.acquire(client_id)
+        if make_people_masks:
+            batch, _ = skeleton_detector.detect_skeleton_batch(
+                colour_image, world_from_camera, depth_image=depth_image, use_xnect_poses=use_xnect_poses
+            )
+            skeletons = batch.get_skeletons()  # type: List[Skeleton3D]
+            people_mask = skeleton_detector.make_people_mask(
+                batch, world_from_camera, intrinsics, colour_image.shape[:2],
+                depth_image=depth_image if depth_gate_people_masks else None
+            )  # type: Optional[np.ndarray]
+        else:
+            skeletons, _ = skeleton_detector.detect_skeletons(
+                colour_image, world_from_camera, depth_image=depth_image, use_xnect_poses=use_xnect_poses
+            )
+            people_mask = None
 
         # If we're using the computed keypoint orientation information rather than the local rotations provided by
         # XNect, remove it so that it will be recomputed by the client (this is necessary if we want to visualise
@@ -62,7 +95,87 @@ def make_frame_processor(skeleton_detector: SkeletonDetector, *, debug: bool = F
             # noinspection PyUnboundLocalVariable
             print("Detection Time: {}s".format(end - start))
 
-        return skeletons, None
+        # If requested, periodically print the latency statistics of the detector.
+        if latency_report_interval is not None and timer() - last_latency_report_time >= latency_report_interval:
+            last_latency_report_time = timer()
+            print("Latency Statistics (Client {}):\n{}".format(
+                client_id, skeleton_detector.get_latency_monitor().format_statistics()
+            ))
+
+        return skeletons, people_mask
+
+    return detect_skeletons
+
+
+def make_process_pool_frame_processor(skeleton_detector_pool: SkeletonDetectorProcessPool, client_id: int, *,
+                                      debug: bool = False, depth_gate_people_masks: bool = False,
+                                      people_mask_rasteriser: Optional[PeopleMaskRasteriser] = None,
+                                      use_xnect_poses: bool) -> \
+        Callable[
+            [int, np.ndarray, np.ndarray, np.ndarray, Tuple[float, float, float, float]],
+            Tuple[List[Skeleton3D], Optional[np.ndarray]]
+        ]:
+    """
+    Make a frame processor for a skeleton detection service that forwards to an XNect skeleton detector running in
+    another process.
+
+    .. note::
+        The colour image is copied into the pool's shared frame ring, and only the skeletons come back, so the
+        service's own process (which handles the networking and decompresses the frames) never has to wait for
+        the GIL whilst XNect is running. Any people masks are made in the service's own process.
+
+    :param skeleton_detector_pool:  The pool of XNect skeleton detector processes.
+    :param client_id:               The ID of the client whose frames will be processed.
+    :param debug:                   Whether to print debug messages.
+    :param depth_gate_people_masks: Whether to use the depth image to gate the people masks.
+    :param people_mask_rasteriser:  An optional rasteriser with which to make the people masks on the CPU (if None,
+                                    they will be rendered internally by the service).
+    :param use_xnect_poses:         Whether to use the joint poses produced by XNect.
+    :return:                        The frame processor.
+    """
+    # noinspection PyUnusedLocal
+    def detect_skeletons(frame_idx: int, colour_image: np.ndarray, depth_image: np.ndarray,
+                         world_from_camera: np.ndarray, intrinsics: Tuple[float, float, float, float]) \
+            -> Tuple[List[Skeleton3D], Optional[np.ndarray]]:
+        """
+        Detect 3D skeletons in an RGB image using XNect.
+
+        :param frame_idx:           Passed in by the skeleton detection service, but ignored.
+        :param colour_image:        The RGB image.
+        :param depth_image:         The depth image (only used if the people masks are being depth-gated).
+        :param world_from_camera:   The camera pose.
+        :param intrinsics:          The camera intrinsics (only used if the people masks are being made).
+        :return:                    The detected 3D skeletons, and the people mask (if we're making it, or None if
+                                    it should be rendered internally by the service).
+        """
+        if debug:
+            start = timer()
+
+        # Detect the skeletons, waiting for the detector process to finish with the frame.
+        batch = skeleton_detector_pool.submit(
+            client_id, colour_image, world_from_camera, use_xnect_poses=use_xnect_poses
+        ).result()
+        skeletons = batch.get_skeletons()  # type: List[Skeleton3D]
+
+        # If requested, make the people mask.
+        people_mask = None  # type: Optional[np.ndarray]
+        if people_mask_rasteriser is not None:
+            people_mask = people_mask_rasteriser.make_mask(
+                batch, world_from_camera, intrinsics, colour_image.shape[:2],
+                depth_image=depth_image if depth_gate_people_masks else None
+            )
+
+        # As above, strip the keypoint orientation information if we're not using XNect's local rotations.
+        if not use_xnect_poses:
+            skeletons = [s.make_bare() for s in skeletons]
+
+        if debug:
+            end = timer()
+
+            # noinspection PyUnboundLocalVariable
+            print("Detection Time: {}s".format(end - start))
+
+        return skeletons, people_mask
 
     return detect_skeletons
 
@@ -70,9 +183,41 @@ def make_frame_processor(skeleton_detector: SkeletonDetector, *, debug: bool = F
 def main() -> None:
     # Parse any command-line arguments.
     parser = ArgumentParser()
+    parser.add_argument(
+        "--cpu_people_masks", action="store_true",
+        help="whether to make the people masks on the CPU (this avoids the need for an OpenGL context)"
+    )
+    parser.add_argument(
+        "--depth_correct_skeletons", action="store_true",
+        help="whether to use the depth images to correct the sizes and distances of the detected skeletons"
+    )
+    parser.add_argument(
+        "--depth_gate_people_masks", action="store_true",
+        help="whether to use the depth images to gate the people masks made on the CPU"
+    )
+    parser.add_argument(
+        "--people_mask_scale", type=float, default=0.25,
+        help="the factor by which to scale the image size to get the resolution at which to make CPU people masks"
+    )
     parser.add_argument(
         "--port", "-p", type=int, default=7852,
-        help="the port on which the service should listen for a connection"
+        help="the port on which the (first) service should listen for a connection"
+    )
+    parser.add_argument(
+        "--latency_report_interval", type=float,
+        help="the interval (in seconds) at which to print per-stage latency statistics (if not specified, never)"
+    )
+    parser.add_argument(
+        "--num_detectors", type=int, default=1,
+        help="the number of warm XNect instances to share between the services"
+    )
+    parser.add_argument(
+        "--num_services", type=int, default=1,
+        help="the number of services to run (each listens on its own port, starting from the specified one)"
+    )
+    parser.add_argument(
+        "--use_detector_processes", action="store_true",
+        help="whether to run each XNect instance in its own process (frames are passed to them via shared memory)"
     )
     parser.add_argument(
         "--use_xnect_poses", action="store_true",
@@ -80,20 +225,64 @@ def main() -> None:
     )
     args = vars(parser.parse_args())  # type: dict
 
-    # Initialise PyGame and create a hidden window so that we can use OpenGL.
-    pygame.init()
-    window_size = (1, 1)  # type: Tuple[int, int]
-    pygame.display.set_mode(window_size, pygame.DOUBLEBUF | pygame.HIDDEN | pygame.OPENGL)
+    # The detector processes only get the colour images, so they can't correct the skeletons using the depth images.
+    if args["depth_correct_skeletons"] and args["use_detector_processes"]:
+        parser.error("--depth_correct_skeletons cannot currently be combined with --use_detector_processes")
 
-    # Construct the skeleton detector.
-    skeleton_detector = SkeletonDetector()
+    # Construct the pool of skeleton detectors. If requested, each detector runs in its own process, so that
+    # inference doesn't compete for the GIL with the networking and frame decompression done by the services. Note that
+    # the pool is constructed before PyGame is initialised, so that the detector processes don't inherit its state.
+    if args["use_detector_processes"]:
+        skeleton_detector_pool = SkeletonDetectorProcessPool(
+            args["num_detectors"]
+        )  # type: Union[SkeletonDetectorPool, SkeletonDetectorProcessPool]
+    else:
+        skeleton_detector_pool = SkeletonDetectorPool(args["num_detectors"], detector_factory=lambda: SkeletonDetector(
+            depth_scale_corrector=DepthScaleCorrector() if args["depth_correct_skeletons"] else None,
+            people_mask_rasteriser=PeopleMaskRasteriser(scale=args["people_mask_scale"])
+        ))
 
-    # Run the skeleton detection service.
-    service = SkeletonDetectionService(
-        make_frame_processor(skeleton_detector, use_xnect_poses=args["use_xnect_poses"]), args["port"],
-        post_client_hook=skeleton_detector.restart
-    )
-    service.run()
+    # Unless we're making the people masks on the CPU, initialise PyGame and create a hidden window so that the
+    # services can use OpenGL to render them.
+    if not args["cpu_people_masks"]:
+        os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
+        # noinspection PyPackageRequirements
+        import pygame
+
+        pygame.init()
+        window_size = (1, 1)  # type: Tuple[int, int]
+        pygame.display.set_mode(window_size, pygame.DOUBLEBUF | pygame.HIDDEN | pygame.OPENGL)
+
+    # Make the skeleton detection services. Each service serves a single client at a time, and releases the
+    # client's detector back into the pool (after resetting its state) once the client disconnects.
+    services = []  # type: List[SkeletonDetectionService]
+    for client_id in range(args["num_services"]):
+        if args["use_detector_processes"]:
+            frame_processor = make_process_pool_frame_processor(
+                skeleton_detector_pool, client_id, depth_gate_people_masks=args["depth_gate_people_masks"],
+                people_mask_rasteriser=PeopleMaskRasteriser(
+                    scale=args["people_mask_scale"]
+                ) if args["cpu_people_masks"] else None,
+                use_xnect_poses=args["use_xnect_poses"]
+            )
+        else:
+            frame_processor = make_frame_processor(
+                skeleton_detector_pool, client_id, depth_gate_people_masks=args["depth_gate_people_masks"],
+                latency_report_interval=args["latency_report_interval"], make_people_masks=args["cpu_people_masks"],
+                use_xnect_poses=args["use_xnect_poses"]
+            )
+
+        services.append(SkeletonDetectionService(
+            frame_processor,
+            args["port"] + client_id,
+            post_client_hook=lambda client_id=client_id: skeleton_detector_pool.release(client_id)
+        ))
+
+    # Run any additional services on their own threads, and the first service on the main thread.
+    for service in services[1:]:
+        threading.Thread(target=service.run, daemon=True).start()
+
+    services[0].run()
 
 
 if __name__ == "__main__":
@@ -7,44 +7,91 @@ import os
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
 # noinspection PyPackageRequirements
 import pygame
+import threading
 
 # noinspection PyPackageRequirements
 from OpenGL.GL import *
+from argparse import ArgumentParser
 from timeit import default_timer as timer
-from typing import Tuple
+from typing import Any, Dict, List, Tuple
 
 from smg.opengl import OpenGLMatrixContext, OpenGLUtil
 from smg.openni import OpenNICamera
-from smg.pyxnect import SkeletonDetector
+from smg.pyxnect import ResultPresenter, SkeletonDetector
 from smg.rigging.cameras import SimpleCamera
 from smg.rigging.controllers import KeyboardCameraController
 from smg.rigging.helpers import CameraPoseConverter
-from smg.skeletons import SkeletonRenderer
+from smg.skeletons import Skeleton3D, SkeletonRenderer
 
 
 def main() -> None:
     np.set_printoptions(suppress=True)
 
-    # Initialise PyGame and create the window.
-    pygame.init()
-    window_size = (640, 480)  # type: Tuple[int, int]
-    pygame.display.set_mode(window_size, pygame.DOUBLEBUF | pygame.OPENGL)
-    pygame.display.set_caption("XNect 3D Skeleton Detector")
-
-    # Enable the z-buffer.
-    glEnable(GL_DEPTH_TEST)
-    glDepthFunc(GL_LESS)
-
-    # Construct the camera controller.
-    camera_controller = KeyboardCameraController(
-        SimpleCamera([0, 0, 0], [0, 0, 1], [0, -1, 0]), canonical_angular_speed=0.05, canonical_linear_speed=0.1
+    # Parse any command-line arguments.
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--display_rate", type=float,
+        help="the maximum rate (in Hz) at which to update the display (if not specified, as fast as possible)"
     )
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="whether to run without a display (the detection times are still printed)"
+    )
+    args = vars(parser.parse_args())  # type: Dict[str, Any]
 
     # Construct the skeleton detector.
     skeleton_detector = SkeletonDetector()
 
+    # Construct the presenter via which the detection results will be passed to the display loop.
+    presenter = ResultPresenter(max_rate=args["display_rate"])
+
     # Construct the camera.
     with OpenNICamera(mirror_images=True) as camera:
+        def run_detection() -> None:
+            """Repeatedly detect skeletons in the images from the camera, and publish the results for display."""
+            while True:
+                # Get a colour image from the camera.
+                colour_image, _ = camera.get_images()
+
+                # Detect any 3D skeletons in the image.
+                start = timer()
+                skeletons, visualisation = skeleton_detector.detect_skeletons(
+                    colour_image, np.eye(4), visualise=not args["headless"]
+                )
+                end = timer()
+                print("Skeleton Detection Time: {}s".format(end - start))
+
+                # Publish the result for display (this never blocks, so the display can't slow detection down).
+                if not args["headless"]:
+                    presenter.publish((skeletons, visualisation))
+
+        # If we're running headless, just run detection on the main thread.
+        if args["headless"]:
+            run_detection()
+            return
+
+        # Otherwise, run detection on its own thread, so that it proceeds at the full inference rate, and run the
+        # display loop on the main thread (which owns the windows).
+        intrinsics = camera.get_colour_intrinsics()  # type: Tuple[float, float, float, float]
+        threading.Thread(target=run_detection, daemon=True).start()
+
+        # Initialise PyGame and create the window.
+        pygame.init()
+        window_size = (640, 480)  # type: Tuple[int, int]
+        pygame.display.set_mode(window_size, pygame.DOUBLEBUF | pygame.OPENGL)
+        pygame.display.set_caption("XNect 3D Skeleton Detector")
+
+        # Enable the z-buffer.
+        glEnable(GL_DEPTH_TEST)
+        glDepthFunc(GL_LESS)
+
+        # Construct the camera controller.
+        camera_controller = KeyboardCameraController(
+            SimpleCamera([0, 0, 0], [0, 0, 1], [0, -1, 0]), canonical_angular_speed=0.05, canonical_linear_speed=0.1
+        )
+
+        skeletons = []  # type: List[Skeleton3D]
+
         # Repeatedly:
         while True:
             # Process any PyGame events.
@@ -59,18 +106,13 @@ def main() -> None:
                     # noinspection PyProtectedMember
                     os._exit(0)
 
-            # Get a colour image from the camera.
-            colour_image, _ = camera.get_images()
-
-            # Detect any 3D skeletons in the image.
-            start = timer()
-            skeletons, visualisation = skeleton_detector.detect_skeletons(colour_image, np.eye(4), visualise=True)
-            end = timer()
-            print("Skeleton Detection Time: {}s".format(end - start))
-
-            # Show any visualisation produced during the detection process.
-            cv2.imshow("Output Visualisation", visualisation)
-            cv2.waitKey(1)
+            # If a new detection result is available, show its visualisation, and keep its skeletons for rendering
+            # (any results produced since the last one we showed are dropped).
+            result = presenter.take_latest()
+            if result is not None:
+                skeletons, visualisation = result
+                cv2.imshow("Output Visualisation", visualisation)
+                cv2.waitKey(1)
 
             # Allow the user to control the camera.
             camera_controller.update(pygame.key.get_pressed(), timer() * 1000)
@@ -81,7 +123,7 @@ def main() -> None:
 
             # Set the projection matrix.
             with OpenGLMatrixContext(GL_PROJECTION, lambda: OpenGLUtil.set_projection_matrix(
-                camera.get_colour_intrinsics(), *window_size
+                intrinsics, *window_size
             )):
                 # Set the model-view matrix.
                 with OpenGLMatrixContext(GL_MODELVIEW, lambda: OpenGLUtil.load_matrix(
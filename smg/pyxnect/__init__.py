@@ -1,2 +1,71 @@
-from .cpp.pyxnect import *
-from .python.skeleton_detector import SkeletonDetector
+import importlib
+import sys
+import types
+
+from typing import Any, Dict, List
+
+
+# Note: Everything in this package is loaded lazily, on first access. This makes "import smg.pyxnect" cheap, and means
+#       that the native XNect library (and its CUDA, OpenCV and Caffe dependencies) is only loaded if something that
+#       actually needs it (e.g. XNect or SkeletonDetector) is used. PEP 562's module-level __getattr__ would be the
+#       natural way to do this, but it requires Python 3.7, so we swap in a module subclass instead.
+
+# The names exported by the package, together with the modules (relative to the package) in which they're defined.
+_LAZY_EXPORTS = {
+    "AsyncSkeletonDetector": ".python.async_skeleton_detector",
+    "DepthScaleCorrector": ".python.depth_scale_corrector",
+    "ImagePreprocessor": ".python.image_preprocessor",
+    "LatencyMonitor": ".python.latency_monitor",
+    "PeopleMaskRasteriser": ".python.people_mask_rasteriser",
+    "ReplayXNect": ".python.replay_xnect",
+    "ResultPresenter": ".python.result_presenter",
+    "SharedFrameRing": ".python.shared_frame_ring",
+    "SkeletonBatch": ".python.skeleton_batch",
+    "SkeletonDetectionResult": ".python.async_skeleton_detector",
+    "SkeletonDetector": ".python.skeleton_detector",
+    "SkeletonDetectorPool": ".python.skeleton_detector_pool",
+    "SkeletonDetectorProcessPool": ".python.skeleton_detector_process_pool",
+    "SkeletonExtrapolator": ".python.skeleton_extrapolator",
+    "SkeletonTracker": ".python.skeleton_tracker",
+    "SkeletonVisualiser": ".python.skeleton_visualiser",
+    "SyntheticXNect": ".python.synthetic_xnect",
+    "XNect": ".cpp.pyxnect",
+    "XNectBackend": ".python.xnect_backend",
+    "XNectRecorder": ".python.xnect_recorder"
+}  # type: Dict[str, str]
+
+__all__ = sorted(_LAZY_EXPORTS.keys())  # type: List[str]
+
+
+class _LazyModule(types.ModuleType):
+    """A module that imports each of its exports on first access."""
+
+    # SPECIAL METHODS
+
+    def __dir__(self) -> List[str]:
+        """
+        Get the names of the module's attributes, including ones that have not yet been loaded.
+
+        :return:    The names of the module's attributes, including ones that have not yet been loaded.
+        """
+        return sorted(set(super().__dir__()) | set(_LAZY_EXPORTS.keys()))
+
+    def __getattr__(self, name: str) -> Any:
+        """
+        Import and return one of the module's exports (this is only called if the export has not yet been loaded).
+
+        :param name:    The name of the export.
+        :return:        The export.
+        """
+        module_name = _LAZY_EXPORTS.get(name)
+        if module_name is None:
+            raise AttributeError("module '{}' has no attribute '{}'".format(self.__name__, name))
+
+        value = getattr(importlib.import_module(module_name, self.__name__), name)
+
+        # Cache the export on the module, so that future accesses to it don't go through this function.
+        setattr(self, name, value)
+        return value
+
+
+sys.modules[__name__].__class__ = _LazyModule
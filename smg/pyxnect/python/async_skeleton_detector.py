@@ -0,0 +1,280 @@
+import asyncio
+import numpy as np
+import threading
+
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from smg.skeletons import Skeleton3D
+
+from .skeleton_detector import SkeletonDetector
+
+
+# The result of detecting skeletons in a single frame, tagged with the index and pose of the frame concerned.
+SkeletonDetectionResult = NamedTuple("SkeletonDetectionResult", [
+    ("frame_idx", int),
+    ("world_from_camera", np.ndarray),
+    ("skeletons", List[Skeleton3D]),
+    ("visualisation", Optional[np.ndarray])
+])
+
+
+class AsyncSkeletonDetector:
+    """
+    An asynchronous wrapper around an XNect-based 3D skeleton detector.
+
+    .. note::
+        The underlying skeleton detector is constructed and used exclusively on a dedicated worker thread. Frames are
+        passed to the worker via a bounded queue, and the result for each frame is returned via a future. If a frame
+        is submitted whilst the queue is full, what happens depends on the drop policy (see below). The futures of any
+        frames that get dropped are cancelled.
+    """
+
+    # DROP POLICIES
+
+    # Block the submitting thread until there is space in the queue.
+    DP_BLOCK = "block"  # type: str
+
+    # Drop the oldest frame in the queue to make space for the new one.
+    DP_DROP_OLDEST = "drop_oldest"  # type: str
+
+    # Drop all of the frames in the queue, so that only the newest frame will be processed.
+    DP_LATEST_WINS = "latest_wins"  # type: str
+
+    # CONSTRUCTOR
+
+    def __init__(self, *, detector_factory: Callable[[], SkeletonDetector] = SkeletonDetector,
+                 drop_policy: str = DP_LATEST_WINS, max_queue_size: int = 1):
+        """
+        Construct an asynchronous 3D skeleton detector.
+
+        :param detector_factory:    A function that can be used to construct the underlying skeleton detector (this
+                                    will be called on the worker thread).
+        :param drop_policy:         What to do when a frame is submitted whilst the queue is full.
+        :param max_queue_size:      The maximum number of frames that can be waiting to be processed at any one time.
+        """
+        if drop_policy not in (AsyncSkeletonDetector.DP_BLOCK, AsyncSkeletonDetector.DP_DROP_OLDEST,
+                               AsyncSkeletonDetector.DP_LATEST_WINS):
+            raise ValueError("Unknown drop policy: {}".format(drop_policy))
+        if max_queue_size < 1:
+            raise ValueError("The maximum queue size must be at least 1")
+
+        self.__detector_factory = detector_factory  # type: Callable[[], SkeletonDetector]
+        self.__drop_policy = drop_policy            # type: str
+        self.__dropped_frame_count = 0              # type: int
+        self.__max_queue_size = max_queue_size      # type: int
+        self.__next_frame_idx = 0                   # type: int
+        self.__queue = deque()                      # type: deque
+        self.__should_terminate = False             # type: bool
+
+        # Set up the synchronisation primitives.
+        self.__lock = threading.Lock()
+        self.__queue_changed = threading.Condition(self.__lock)
+
+        # Start the worker thread, and wait for it to construct the underlying skeleton detector.
+        self.__detector_ready = threading.Event()
+        self.__detector_error = None  # type: Optional[BaseException]
+        self.__worker_thread = threading.Thread(target=self.__run_worker, daemon=True)
+        self.__worker_thread.start()
+        self.__detector_ready.wait()
+
+        if self.__detector_error is not None:
+            raise self.__detector_error
+
+    # SPECIAL METHODS
+
+    def __enter__(self):
+        """No-op (needed to allow the detector's lifetime to be managed by a with statement)."""
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        """Destroy the detector at the end of the with statement that's used to manage its lifetime."""
+        self.terminate()
+
+    # PUBLIC METHODS
+
+    async def detect_skeletons_async(self, image: np.ndarray, world_from_camera: np.ndarray, *,
+                                     frame_idx: Optional[int] = None, timestamp: Optional[float] = None,
+                                     use_xnect_poses: bool = False, visualise: bool = False) \
+            -> SkeletonDetectionResult:
+        """
+        Asynchronously detect 3D skeletons in an RGB image, in a way that can be awaited from asyncio code.
+
+        .. note::
+            If the frame gets dropped before it can be processed, awaiting this will raise asyncio.CancelledError.
+
+        :param image:               The RGB image.
+        :param world_from_camera:   The camera pose.
+        :param frame_idx:           An optional index for the frame (if None, one will be allocated automatically).
+        :param timestamp:           An optional time (in seconds) at which the frame was captured (see
+                                    SkeletonDetector.detect_skeletons).
+        :param use_xnect_poses:     Whether to use the joint poses produced by XNect.
+        :param visualise:           Whether to make the output visualisation.
+        :return:                    The result of detecting skeletons in the frame.
+        """
+        return await asyncio.wrap_future(self.submit(
+            image, world_from_camera, frame_idx=frame_idx, timestamp=timestamp, use_xnect_poses=use_xnect_poses,
+            visualise=visualise
+        ))
+
+    def get_dropped_frame_count(self) -> int:
+        """
+        Get the number of frames that have been dropped so far because the queue was full.
+
+        :return:    The number of frames that have been dropped so far because the queue was full.
+        """
+        with self.__lock:
+            return self.__dropped_frame_count
+
+    def restart(self) -> Future:
+        """
+        Asynchronously restart the underlying skeleton detector.
+
+        .. note::
+            Any frames still waiting in the queue are dropped, since they belong to the old sequence.
+
+        :return:    A future that will be completed once the restart has happened.
+        """
+        future = Future()  # type: Future
+        with self.__lock:
+            self.__drop_frames(len(self.__queue))
+            self.__queue.append((future, None))
+            self.__queue_changed.notify_all()
+        return future
+
+    def submit(self, image: np.ndarray, world_from_camera: np.ndarray, *, frame_idx: Optional[int] = None,
+               timestamp: Optional[float] = None, use_xnect_poses: bool = False, visualise: bool = False) -> Future:
+        """
+        Submit a frame to be processed by the worker thread.
+
+        .. note::
+            The image is not copied, so the caller must not modify it until the frame has been processed.
+
+        :param image:               The RGB image.
+        :param world_from_camera:   The camera pose.
+        :param frame_idx:           An optional index for the frame (if None, one will be allocated automatically).
+        :param timestamp:           An optional time (in seconds) at which the frame was captured (see
+                                    SkeletonDetector.detect_skeletons).
+        :param use_xnect_poses:     Whether to use the joint poses produced by XNect.
+        :param visualise:           Whether to make the output visualisation.
+        :return:                    A future that will hold the result of detecting skeletons in the frame.
+        """
+        future = Future()  # type: Future
+
+        with self.__lock:
+            if self.__should_terminate:
+                raise RuntimeError("Cannot submit a frame to a detector that has been terminated")
+
+            # Allocate an index for the frame if necessary.
+            if frame_idx is None:
+                frame_idx = self.__next_frame_idx
+            self.__next_frame_idx = frame_idx + 1
+
+            # If the queue is full, make space in it for the new frame as per the drop policy.
+            if self.__drop_policy == AsyncSkeletonDetector.DP_BLOCK:
+                while len(self.__queue) >= self.__max_queue_size and not self.__should_terminate:
+                    self.__queue_changed.wait()
+                if self.__should_terminate:
+                    raise RuntimeError("The detector was terminated whilst waiting to submit a frame")
+            elif self.__drop_policy == AsyncSkeletonDetector.DP_DROP_OLDEST:
+                self.__drop_frames(len(self.__queue) - self.__max_queue_size + 1)
+            elif len(self.__queue) >= self.__max_queue_size:
+                self.__drop_frames(len(self.__queue))
+
+            # Add the new frame to the queue, and wake up the worker thread.
+            self.__queue.append((future, (frame_idx, image, world_from_camera, timestamp, use_xnect_poses, visualise)))
+            self.__queue_changed.notify_all()
+
+        return future
+
+    def terminate(self) -> None:
+        """
+        Tell the worker thread to terminate, cancelling any frames that have not yet been processed.
+
+        .. note::
+            This waits for the worker thread to finish, unless it's called on the worker thread itself (e.g. from
+            a callback added to one of the futures), in which case the worker finishes once the callback returns.
+        """
+        with self.__lock:
+            if self.__should_terminate:
+                return
+
+            self.__should_terminate = True
+            for future, _ in self.__queue:
+                future.cancel()
+            self.__queue.clear()
+            self.__queue_changed.notify_all()
+
+        if threading.current_thread() is not self.__worker_thread:
+            self.__worker_thread.join()
+
+    # PRIVATE METHODS
+
+    def __drop_frames(self, count: int) -> None:
+        """
+        Drop up to the specified number of frames from the front of the queue.
+
+        .. note::
+            The lock must be held when calling this.
+        .. note::
+            Restart requests are never dropped, since the caller relies on them happening. Instead, they're skipped
+            over (and kept in their original order), so that any frames queued behind them can still be dropped.
+
+        :param count:   The maximum number of frames to drop.
+        """
+        restarts = []  # type: List[Any]
+        while count > 0 and len(self.__queue) > 0:
+            future, item = self.__queue.popleft()  # type: Future, Any
+            if item is None:
+                restarts.append((future, item))
+            else:
+                future.cancel()
+                self.__dropped_frame_count += 1
+                count -= 1
+
+        self.__queue.extendleft(reversed(restarts))
+
+    def __run_worker(self) -> None:
+        """Run the worker thread."""
+        # Construct the underlying skeleton detector, and let the constructing thread know when it's ready.
+        try:
+            detector = self.__detector_factory()  # type: SkeletonDetector
+        except BaseException as e:
+            self.__detector_error = e
+            return
+        finally:
+            self.__detector_ready.set()
+
+        while True:
+            # Wait for a frame or restart request to appear in the queue, and then pop it.
+            with self.__lock:
+                while len(self.__queue) == 0 and not self.__should_terminate:
+                    self.__queue_changed.wait()
+
+                if self.__should_terminate:
+                    return
+
+                future, item = self.__queue.popleft()  # type: Future, Any
+
+                # Wake up any submitting threads that are blocked waiting for space in the queue.
+                self.__queue_changed.notify_all()
+
+                # If the frame has already been cancelled by the caller, skip it.
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+            # Process the frame or restart request.
+            try:
+                if item is None:
+                    detector.restart()
+                    future.set_result(None)
+                else:
+                    frame_idx, image, world_from_camera, timestamp, use_xnect_poses, visualise = item
+                    skeletons, visualisation = detector.detect_skeletons(
+                        image, world_from_camera, timestamp=timestamp, use_xnect_poses=use_xnect_poses,
+                        visualise=visualise
+                    )
+                    future.set_result(SkeletonDetectionResult(frame_idx, world_from_camera, skeletons, visualisation))
+            except BaseException as e:
+                future.set_exception(e)
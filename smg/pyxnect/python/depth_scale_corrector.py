@@ -0,0 +1,189 @@
+import numpy as np
+
+from typing import Tuple
+
+
+class DepthScaleCorrector:
+    """
+    Corrects the sizes and distances of the people detected by XNect using a registered depth image.
+
+    .. note::
+        XNect estimates each person's 3D pose from a single colour image, so their absolute size and distance from
+        the camera are only as good as its prior on body size. Given a depth image, each person can be corrected
+        by sampling the depth at the projection of each of their joints, and fitting a scale about their root
+        joint, together with a movement of the root along its viewing ray (as in ImagePreprocessor, this keeps
+        the root's projection in the image fixed). For each person, this is a 2-parameter linear least-squares
+        problem, so it's solved in closed form, for all of the people at once.
+    .. note::
+        The depth at each joint is the median of the valid depths in a small window around its projection, which
+        makes it robust to holes and edges in the depth image. Since the depth camera sees the surface of the body
+        rather than the joints inside it, a fixed offset is added to each sampled depth. Joints whose depths are
+        inconsistent with those of the rest of the person (e.g. because they're occluded) are rejected, and people
+        with too few remaining joints are left unchanged.
+    .. note::
+        If all of a person's joints are at roughly the same depth, their scale about the root is only weakly
+        constrained by the depths, so it's regularised towards the scale that would keep the projections of all
+        of their joints fixed (i.e. towards scaling the whole person about the camera centre).
+    """
+
+    # CONSTRUCTOR
+
+    def __init__(self, *, max_correction: float = 2.0, min_joint_count: int = 4, outlier_threshold: float = 0.2,
+                 regularisation_weight: float = 1.0, surface_offset: float = 0.05, window_radius: int = 2):
+        """
+        Construct a depth scale corrector.
+
+        :param max_correction:          The maximum factor by which a person's scale or distance may be changed
+                                        (in either direction).
+        :param min_joint_count:         The minimum number of joints with valid, consistent depths that a person
+                                        must have to be corrected.
+        :param outlier_threshold:       The maximum distance (in metres) between the sampled depth of a joint and
+                                        the depth implied by the rest of the person for the joint to be used.
+        :param regularisation_weight:   The weight of the term that regularises each person's scale about their
+                                        root towards the change in the distance of their root (relative to the
+                                        total weight of their joints).
+        :param surface_offset:          The distance (in metres) by which the joints are assumed to lie behind the
+                                        surface of the body seen by the depth camera.
+        :param window_radius:           The radius (in depth pixels) of the window in which to sample the depth
+                                        around each joint.
+        """
+        if max_correction < 1.0:
+            raise ValueError("The maximum correction must be at least 1")
+        if min_joint_count < 2:
+            raise ValueError("At least two joints are needed to correct a person")
+        if window_radius < 0:
+            raise ValueError("The window radius must be non-negative")
+
+        self.__max_correction = max_correction                  # type: float
+        self.__min_joint_count = min_joint_count                # type: int
+        self.__outlier_threshold = outlier_threshold            # type: float
+        self.__regularisation_weight = regularisation_weight    # type: float
+        self.__surface_offset = surface_offset                  # type: float
+
+        # Precompute the offsets of the pixels in the sampling window.
+        dy, dx = np.mgrid[-window_radius:window_radius + 1, -window_radius:window_radius + 1]
+        self.__window_offsets = (dy.ravel(), dx.ravel())  # type: Tuple[np.ndarray, np.ndarray]
+
+    # PUBLIC METHODS
+
+    def correct(self, positions: np.ndarray, joints_2d: np.ndarray, depth_image: np.ndarray,
+                image_shape: Tuple[int, int], root_idx: int) -> None:
+        """
+        Correct the sizes and distances of a set of people in place.
+
+        :param positions:   The camera-space positions (in metres) of the people's joints, as a P*J*3 array
+                            (modified in place).
+        :param joints_2d:   The projections of the people's joints into the colour image, as a P*J*2 array.
+        :param depth_image: The depth image (in metres, with 0 denoting invalid depths), which must be registered
+                            with the colour image (but need not be the same size).
+        :param image_shape: The shape of the colour image, as (height, width).
+        :param root_idx:    The index of the root joint.
+        """
+        people_count, joint_count = positions.shape[:2]
+        if people_count == 0:
+            return
+
+        # Sample the depth around the projection of each joint of each person in one go.
+        depths = self.__sample_depths(joints_2d.reshape(-1, 2), depth_image, image_shape).reshape(
+            people_count, joint_count
+        ) + self.__surface_offset  # type: np.ndarray
+
+        # Reject any joints whose depths are inconsistent with the median ratio between the sampled and estimated
+        # depths for the person as a whole.
+        z = positions[..., 2]  # type: np.ndarray
+        valid = np.isfinite(depths) & (z > 1e-6)  # type: np.ndarray
+        depths = np.where(valid, depths, 0.0)
+        ratios, _ = DepthScaleCorrector.__row_medians(np.where(valid, depths / np.where(valid, z, 1.0), np.nan))
+        ratios = np.where(np.isnan(ratios), 0.0, ratios)
+        valid &= np.abs(depths - ratios[:, np.newaxis] * z) <= self.__outlier_threshold
+        weights = valid.astype(float)  # type: np.ndarray
+
+        # For each person, find the scale about the root (a) and the factor by which to scale the distance of the
+        # root (b) that best explain the sampled depths, i.e. that minimise the sum over the joints of
+        # (a * (z - root_z) + b * root_z - depth)^2, plus a term that penalises the difference between a and b.
+        roots = positions[:, root_idx, :].copy()  # type: np.ndarray
+        root_z = roots[:, 2]  # type: np.ndarray
+        u = z - root_z[:, np.newaxis]  # type: np.ndarray
+        total_weights = np.sum(weights, axis=1)  # type: np.ndarray
+        prior = self.__regularisation_weight * total_weights * root_z * root_z  # type: np.ndarray
+
+        a11 = np.sum(weights * u * u, axis=1) + prior  # type: np.ndarray
+        a12 = root_z * np.sum(weights * u, axis=1) - prior  # type: np.ndarray
+        a22 = root_z * root_z * total_weights + prior  # type: np.ndarray
+        b1 = np.sum(weights * u * depths, axis=1)  # type: np.ndarray
+        b2 = root_z * np.sum(weights * depths, axis=1)  # type: np.ndarray
+        det = a11 * a22 - a12 * a12  # type: np.ndarray
+
+        # Solve the 2x2 normal equations for all of the people at once, leaving anyone for whom there were too few
+        # usable joints (or whose solution is degenerate or implausible) unchanged.
+        solvable = (total_weights >= self.__min_joint_count) & (root_z > 1e-6) & (np.abs(det) > 1e-12)
+        safe_det = np.where(solvable, det, 1.0)  # type: np.ndarray
+        a = (b1 * a22 - a12 * b2) / safe_det  # type: np.ndarray
+        b = (a11 * b2 - a12 * b1) / safe_det  # type: np.ndarray
+        plausible = solvable & \
+            (a >= 1 / self.__max_correction) & (a <= self.__max_correction) & \
+            (b >= 1 / self.__max_correction) & (b <= self.__max_correction)  # type: np.ndarray
+        a = np.where(plausible, a, 1.0)
+        b = np.where(plausible, b, 1.0)
+        if not np.any(plausible):
+            return
+
+        # Scale each person about their root, and move the root along its viewing ray.
+        positions -= roots[:, np.newaxis, :]
+        positions *= a[:, np.newaxis, np.newaxis]
+        positions += (b[:, np.newaxis] * roots)[:, np.newaxis, :]
+
+    # PRIVATE METHODS
+
+    def __sample_depths(self, points: np.ndarray, depth_image: np.ndarray, image_shape: Tuple[int, int]) \
+            -> np.ndarray:
+        """
+        Robustly sample the depth image around a set of points in the colour image.
+
+        :param points:      The points (in colour image coordinates), as an N*2 array.
+        :param depth_image: The depth image (in metres, with 0 denoting invalid depths).
+        :param image_shape: The shape of the colour image, as (height, width).
+        :return:            The median of the valid depths in the window around each point, as an N-element
+                            array (NaN for any point without valid depths in its window).
+        """
+        height, width = depth_image.shape[:2]
+        image_height, image_width = image_shape
+
+        # Map the points into the depth image, and gather the depths in the windows around them in one go.
+        x = np.round((points[:, 0] + 0.5) * width / image_width - 0.5).astype(int)  # type: np.ndarray
+        y = np.round((points[:, 1] + 0.5) * height / image_height - 0.5).astype(int)  # type: np.ndarray
+        dy, dx = self.__window_offsets
+        samples = depth_image[
+            np.clip(y[:, np.newaxis] + dy, 0, height - 1), np.clip(x[:, np.newaxis] + dx, 0, width - 1)
+        ].astype(float)  # type: np.ndarray
+
+        # Mark any invalid depths, and treat any points that are off the image as having no valid depths.
+        samples[~np.isfinite(samples)] = 0.0
+        samples[samples <= 0.0] = np.nan
+        samples[(x < 0) | (x >= width) | (y < 0) | (y >= height)] = np.nan
+        medians, _ = DepthScaleCorrector.__row_medians(samples)
+        return medians
+
+    # PRIVATE STATIC METHODS
+
+    @staticmethod
+    def __row_medians(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compute the median of the valid (i.e. non-NaN) values in each row of a 2D array.
+
+        .. note::
+            np.nanmedian is much slower than this for the small arrays we deal with. Instead, each row is sorted
+            with its invalid values at the end, and the median is then read off by indexing, based on the number
+            of valid values in the row.
+
+        :param values:  The values, as an N*K array (with NaN denoting invalid values).
+        :return:        A tuple consisting of the medians of the rows (NaN for rows without valid values) and the
+                        numbers of valid values in the rows.
+        """
+        counts = np.count_nonzero(~np.isnan(values), axis=1)  # type: np.ndarray
+        ordered = np.sort(np.where(np.isnan(values), np.inf, values), axis=1)  # type: np.ndarray
+        rows = np.arange(len(values))  # type: np.ndarray
+        lower = ordered[rows, np.maximum(counts - 1, 0) // 2]  # type: np.ndarray
+        upper = ordered[rows, np.minimum(counts // 2, values.shape[1] - 1)]  # type: np.ndarray
+        medians = np.where(counts > 0, (lower + upper) / 2, np.nan)  # type: np.ndarray
+        return medians, counts
@@ -0,0 +1,217 @@
+import numpy as np
+
+from typing import Optional, Tuple
+
+
+class ImagePreprocessor:
+    """
+    Reduces the number of pixels XNect has to process. It crops each image to a region of interest (ROI) around the
+    people detected in the previous frame, and/or downscales it to a working resolution.
+
+    .. note::
+        Cropping or downscaling the image changes how the people in it appear to XNect, which assumes that it's
+        seeing a full-resolution image with its configured camera intrinsics. To map the results for each person
+        back to the full-resolution image, we project their root joint into the processed image using those
+        intrinsics, map the projection back into the full-resolution image to find the true viewing ray, and
+        correct the depth for the downscaling (downscaled people look smaller, so XNect places them further away).
+        We then move the whole skeleton so that its root lies at the corrected position. The local and global
+        rotations are left unchanged, which ignores the small change in viewing direction.
+    .. note::
+        XNect resizes every image it's given to the processing size configured in its params file (ProcessWidth
+        and ProcessHeight), and its intrinsics are those of an image of that size. If the processing size is known,
+        the full frame is taken as the reference: each ROI is expanded to the aspect ratio of the full frame (so
+        that it isn't stretched any differently from the full frame) and then resized to the processing size here,
+        and the results are mapped back relative to the way in which the full frame itself would have been resized.
+        In that case, the cost of running XNect is fixed by its processing size, so downscaling the images here
+        would just lose detail, and is disallowed (to cut the cost, use a smaller processing size instead).
+    .. note::
+        To make sure that people who have just entered the scene are found, the full frame is processed
+        periodically, and whenever nobody was detected in the previous frame.
+    """
+
+    # CONSTRUCTOR
+
+    def __init__(self, *, process_size: Optional[Tuple[int, int]] = None, roi_padding: Optional[float] = None,
+                 roi_refresh_interval: int = 30, working_scale: float = 1.0):
+        """
+        Construct an image preprocessor.
+
+        :param process_size:            The size, as (width, height), to which XNect resizes the images it's given,
+                                        if known (None = assume that XNect processes the images at their own size).
+        :param roi_padding:             The amount by which to pad the bounding box of the people detected in the
+                                        previous frame on each side to make the ROI, as a fraction of the box's size
+                                        (None = don't crop to an ROI).
+        :param roi_refresh_interval:    The interval (in frames) at which to process the full frame when cropping.
+        :param working_scale:           The factor by which to scale the (possibly cropped) image before passing it
+                                        to XNect (must be 1 if the processing size is specified).
+        """
+        if roi_padding is not None and roi_padding < 0.0:
+            raise ValueError("The ROI padding must be non-negative")
+        if roi_refresh_interval < 1:
+            raise ValueError("The ROI refresh interval must be at least 1")
+        if not 0.0 < working_scale <= 1.0:
+            raise ValueError("The working scale must be in (0,1]")
+        if process_size is not None and working_scale != 1.0:
+            raise ValueError(
+                "XNect resizes its input to its processing size, so downscaling the images wouldn't reduce its cost "
+                "(reduce ProcessWidth/ProcessHeight and FirstNetWidth/FirstNetHeight in its params file instead)"
+            )
+
+        self.__process_size = process_size                  # type: Optional[Tuple[int, int]]
+        self.__roi_padding = roi_padding                    # type: Optional[float]
+        self.__roi_refresh_interval = roi_refresh_interval  # type: int
+        self.__working_scale = working_scale                # type: float
+
+        self.reset()
+
+    # PUBLIC METHODS
+
+    def map_to_full_frame(self, active: np.ndarray, positions: np.ndarray, joints_2d: np.ndarray,
+                          intrinsics: Tuple[float, float, float, float], root_idx: int) \
+            -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Map XNect's results for the most recently preprocessed image back to the full-resolution image.
+
+        :param active:      XNect's P-element person activity mask.
+        :param positions:   XNect's P*J*3 array of joint positions (in the XNect coordinate system).
+        :param joints_2d:   XNect's P*J*2 array of projected 2D joint positions (in the preprocessed image).
+        :param intrinsics:  The camera intrinsics (fx, fy, cx, cy) that XNect uses.
+        :param root_idx:    The index of the root joint of XNect's skeleton.
+        :return:            The joint positions and projected 2D joint positions, mapped back to the full image.
+        """
+        ox, oy = self.__offset
+        sx, sy = self.__scale
+        rx, ry = self.__reference_scale
+        if sx == rx and sy == ry and ox == oy == 0:
+            # If the full frame was processed, the positions are already correct, and the 2D joint positions
+            # only need to be mapped back if XNect resized the image.
+            if rx == ry == 1.0:
+                return positions, joints_2d
+
+            joints_2d = joints_2d.copy()
+            joints_2d[active] /= np.array([rx, ry])
+            return positions, joints_2d
+
+        fx, fy, cx, cy = intrinsics
+
+        # Find where the root of each person projects in the preprocessed image, map that to the full image, and
+        # then to where it would have been in the full frame after XNect had resized it (the image to which the
+        # intrinsics correspond).
+        old_roots = positions[active, root_idx]  # type: np.ndarray
+        u = ((fx * old_roots[:, 0] / old_roots[:, 2] + cx) / sx + ox) * rx  # type: np.ndarray
+        v = ((fy * old_roots[:, 1] / old_roots[:, 2] + cy) / sy + oy) * ry  # type: np.ndarray
+
+        # Correct the depth of each root for the scaling relative to the full frame, and back-project it along the
+        # ray through its true position.
+        z = old_roots[:, 2] * np.sqrt((sx / rx) * (sy / ry))  # type: np.ndarray
+        new_roots = np.stack([(u - cx) / fx * z, (v - cy) / fy * z, z], axis=1)  # type: np.ndarray
+
+        # Move each person's skeleton so that its root is in the right place.
+        positions = positions.copy()
+        positions[active] += (new_roots - old_roots)[:, np.newaxis]
+
+        # Map the 2D joint positions back to the full image.
+        joints_2d = joints_2d.copy()
+        joints_2d[active] = joints_2d[active] / np.array([sx, sy]) + np.array([ox, oy])
+
+        return positions, joints_2d
+
+    def preprocess(self, image: np.ndarray) -> np.ndarray:
+        """
+        Crop and/or downscale an image before passing it to XNect.
+
+        :param image:   The full-resolution image (a uint8 array of shape HxWx3, which need not be contiguous).
+        :return:        The preprocessed image (which will be C-contiguous).
+        """
+        height, width = image.shape[:2]
+
+        # Decide whether to crop the image to the ROI, or to process the full frame.
+        roi = self.__roi  # type: Optional[Tuple[int, int, int, int]]
+        if self.__frame_count % self.__roi_refresh_interval == 0:
+            roi = None
+        self.__frame_count += 1
+
+        x0, y0, x1, y1 = self.__fit_roi(roi, width, height) if roi is not None else (0, 0, width, height)
+        self.__offset = (x0, y0)
+        image = image[y0:y1, x0:x1]
+
+        # Work out the size to which to resize the image: either XNect's processing size (if known), so that the
+        # way in which it's resized is under our control, or the working resolution. Note that the actual scales
+        # are computed from the integer sizes of the images, so that the results can be mapped back exactly.
+        if self.__process_size is not None:
+            size = self.__process_size  # type: Tuple[int, int]
+        else:
+            size = (
+                max(int(round((x1 - x0) * self.__working_scale)), 1),
+                max(int(round((y1 - y0) * self.__working_scale)), 1)
+            )
+
+        self.__reference_scale = (size[0] / width, size[1] / height) if self.__process_size is not None else (1.0, 1.0)
+        self.__scale = (size[0] / (x1 - x0), size[1] / (y1 - y0))
+
+        if size != (x1 - x0, y1 - y0):
+            import cv2
+            interpolation = cv2.INTER_AREA if size[0] < x1 - x0 else cv2.INTER_LINEAR  # type: int
+            return cv2.resize(np.ascontiguousarray(image), size, interpolation=interpolation)
+        else:
+            return np.ascontiguousarray(image)
+
+    def reset(self) -> None:
+        """Reset the preprocessor (e.g. when changing from one sequence of images to another)."""
+        self.__frame_count = 0                   # type: int
+        self.__offset = (0, 0)                   # type: Tuple[int, int]
+        self.__reference_scale = (1.0, 1.0)      # type: Tuple[float, float]
+        self.__roi = None                        # type: Optional[Tuple[int, int, int, int]]
+        self.__scale = (1.0, 1.0)                # type: Tuple[float, float]
+
+    def update(self, active: np.ndarray, joints_2d: np.ndarray) -> None:
+        """
+        Update the ROI to use for the next frame, based on the people detected in the current one.
+
+        :param active:      XNect's P-element person activity mask.
+        :param joints_2d:   The P*J*2 array of projected 2D joint positions (in the full image).
+        """
+        if self.__roi_padding is None or not np.any(active):
+            self.__roi = None
+            return
+
+        points = joints_2d[active].reshape(-1, 2)  # type: np.ndarray
+        lower, upper = points.min(axis=0), points.max(axis=0)
+        padding = (upper - lower) * self.__roi_padding  # type: np.ndarray
+        x0, y0 = np.floor(lower - padding).astype(int)
+        x1, y1 = np.ceil(upper + padding).astype(int)
+        self.__roi = (int(x0), int(y0), int(x1), int(y1))
+
+    # PRIVATE METHODS
+
+    def __fit_roi(self, roi: Tuple[int, int, int, int], width: int, height: int) -> Tuple[int, int, int, int]:
+        """
+        Fit an ROI to an image, falling back to the full frame if it can't be used.
+
+        .. note::
+            If XNect's processing size is known, the ROI is also expanded (about its centre) to the aspect ratio
+            of the image, and then shifted to lie within the image if necessary.
+
+        :param roi:     The ROI, as (x0, y0, x1, y1).
+        :param width:   The width of the image.
+        :param height:  The height of the image.
+        :return:        The fitted ROI, as (x0, y0, x1, y1).
+        """
+        x0, y0, x1, y1 = roi
+        x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, width), min(y1, height)
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return 0, 0, width, height
+
+        if self.__process_size is not None:
+            # Expand the ROI to the aspect ratio of the image.
+            roi_width = max(x1 - x0, int(np.ceil((y1 - y0) * width / height)))    # type: int
+            roi_height = max(y1 - y0, int(np.ceil((x1 - x0) * height / width)))   # type: int
+            if roi_width >= width or roi_height >= height:
+                return 0, 0, width, height
+
+            # Centre it on the original ROI, and then shift it to lie within the image.
+            x0 = min(max((x0 + x1 - roi_width) // 2, 0), width - roi_width)
+            y0 = min(max((y0 + y1 - roi_height) // 2, 0), height - roi_height)
+            x1, y1 = x0 + roi_width, y0 + roi_height
+
+        return x0, y0, x1, y1
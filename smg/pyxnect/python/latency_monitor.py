@@ -0,0 +1,149 @@
+import numpy as np
+import threading
+
+from timeit import default_timer as timer
+from typing import Dict, List, Optional
+
+
+class LatencyMonitor:
+    """
+    A lightweight monitor that keeps rolling windows of per-stage latencies for a multi-stage, per-frame pipeline.
+
+    .. note::
+        For each stage, only the most recent latencies (up to the window size) are kept, in a preallocated ring
+        buffer, so recording a latency is cheap and the memory used is bounded. Percentiles are only computed when
+        the statistics are actually requested.
+    """
+
+    # CONSTRUCTOR
+
+    def __init__(self, *, window_size: int = 1000):
+        """
+        Construct a latency monitor.
+
+        :param window_size: The maximum number of recent latencies to keep for each stage.
+        """
+        if window_size < 1:
+            raise ValueError("The window size must be at least 1")
+
+        self.__window_size = window_size  # type: int
+
+        self.__frame_times = np.zeros(window_size)  # type: np.ndarray
+        self.__frame_count = 0                      # type: int
+        self.__lock = threading.Lock()
+        self.__stage_counts = {}                    # type: Dict[str, int]
+        self.__stage_latencies = {}                 # type: Dict[str, np.ndarray]
+        self.__stage_names = []                     # type: List[str]
+
+    # PUBLIC METHODS
+
+    def format_statistics(self) -> str:
+        """
+        Format the current statistics as a human-readable table.
+
+        :return:    The current statistics, formatted as a human-readable table.
+        """
+        statistics = self.get_statistics()  # type: Dict[str, Dict[str, float]]
+        lines = ["{:<24}{:>8}{:>12}{:>12}{:>12}{:>12}".format(
+            "Stage", "Count", "Mean (ms)", "p50 (ms)", "p95 (ms)", "p99 (ms)"
+        )]  # type: List[str]
+
+        for stage_name in self.__get_stage_names():
+            stage_statistics = statistics.get(stage_name)  # type: Optional[Dict[str, float]]
+            if stage_statistics is None:
+                continue
+
+            lines.append("{:<24}{:>8}{:>12.3f}{:>12.3f}{:>12.3f}{:>12.3f}".format(
+                stage_name, int(stage_statistics["count"]),
+                *[stage_statistics[key] * 1000 for key in ["mean", "p50", "p95", "p99"]]
+            ))
+
+        fps = self.get_fps()  # type: Optional[float]
+        lines.append("FPS: {}".format("{:.2f}".format(fps) if fps is not None else "N/A"))
+
+        return "\n".join(lines)
+
+    def get_fps(self) -> Optional[float]:
+        """
+        Get the rate at which frames have been recorded over the current window.
+
+        :return:    The rate at which frames have been recorded over the current window, or None if fewer than
+                    two frames have been recorded so far.
+        """
+        with self.__lock:
+            count = min(self.__frame_count, self.__window_size)  # type: int
+            if count < 2:
+                return None
+
+            newest = self.__frame_times[(self.__frame_count - 1) % self.__window_size]  # type: float
+            oldest = self.__frame_times[(self.__frame_count - count) % self.__window_size]  # type: float
+            return (count - 1) / (newest - oldest) if newest > oldest else None
+
+    def get_statistics(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get summary statistics (in seconds) for the latencies of each stage over the current window.
+
+        :return:    A dictionary mapping the name of each stage to a dictionary containing the number of latencies
+                    currently in its window ("count"), together with their mean ("mean"), median ("p50") and
+                    95th and 99th percentiles ("p95" and "p99").
+        """
+        with self.__lock:
+            latencies = {
+                stage_name: self.__stage_latencies[stage_name][:min(count, self.__window_size)].copy()
+                for stage_name, count in self.__stage_counts.items()
+            }  # type: Dict[str, np.ndarray]
+
+        statistics = {}  # type: Dict[str, Dict[str, float]]
+        for stage_name, stage_latencies in latencies.items():
+            p50, p95, p99 = np.percentile(stage_latencies, [50, 95, 99])
+            statistics[stage_name] = {
+                "count": len(stage_latencies),
+                "mean": float(np.mean(stage_latencies)),
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99)
+            }
+
+        return statistics
+
+    def record_frame(self, stage_latencies: Dict[str, float]) -> None:
+        """
+        Record the latencies of the stages of the pipeline for a single frame.
+
+        :param stage_latencies: A dictionary mapping the name of each stage that ran for the frame to its latency
+                                (in seconds).
+        """
+        now = timer()  # type: float
+
+        with self.__lock:
+            for stage_name, latency in stage_latencies.items():
+                buffer = self.__stage_latencies.get(stage_name)  # type: Optional[np.ndarray]
+                if buffer is None:
+                    buffer = self.__stage_latencies[stage_name] = np.zeros(self.__window_size)
+                    self.__stage_counts[stage_name] = 0
+                    self.__stage_names.append(stage_name)
+
+                buffer[self.__stage_counts[stage_name] % self.__window_size] = latency
+                self.__stage_counts[stage_name] += 1
+
+            self.__frame_times[self.__frame_count % self.__window_size] = now
+            self.__frame_count += 1
+
+    def reset(self) -> None:
+        """Clear all of the latencies that have been recorded so far."""
+        with self.__lock:
+            self.__frame_count = 0
+            self.__stage_counts.clear()
+            self.__stage_latencies.clear()
+            self.__stage_names.clear()
+
+    # PRIVATE METHODS
+
+    def __get_stage_names(self) -> List[str]:
+        """
+        Get the names of the stages for which latencies have been recorded, in the order they were first seen.
+
+        :return:    The names of the stages for which latencies have been recorded, in the order they were first seen.
+        """
+        with self.__lock:
+            return list(self.__stage_names)
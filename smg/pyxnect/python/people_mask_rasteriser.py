@@ -0,0 +1,202 @@
+import numpy as np
+
+from typing import Dict, Optional, Sequence, Tuple
+
+from .skeleton_batch import SkeletonBatch
+
+
+class PeopleMaskRasteriser:
+    """
+    Rasterises a mask of the people in a batch of skeletons on the CPU, without needing an OpenGL context.
+
+    .. note::
+        Each bone of each person is modelled as a capsule, i.e. a line segment with a radius. The segments are
+        projected into the image using the camera pose and intrinsics, and the mask is then rasterised by testing
+        every pixel in the region a person covers against all of their segments in one vectorised pass (in chunks
+        of segments, so that the memory used stays bounded). To keep this cheap, the mask is rasterised at a
+        reduced resolution, and then upsampled to the size of the image.
+    .. note::
+        If a depth image is supplied, pixels whose depth is more than a tolerance away from the depth of the
+        bone covering them are excluded, so that occluders in front of (and background behind) the people don't
+        end up in the mask. Pixels without a valid depth are kept.
+    """
+
+    # PRIVATE CLASS CONSTANTS
+
+    # The maximum number of pixel-segment pairs to test at once (this bounds the size of the temporary arrays).
+    __MAX_CHUNK_ELEMENTS = 1 << 22  # type: int
+
+    # CONSTRUCTOR
+
+    def __init__(self, *, bone_radius: float = 0.1, depth_tolerance: float = 0.3, scale: float = 0.25):
+        """
+        Construct a people mask rasteriser.
+
+        :param bone_radius:     The radius (in metres) of the capsule used to model each bone.
+        :param depth_tolerance: The maximum distance (in metres) between the depth of a pixel and that of the bone
+                                covering it for the pixel to be included in the mask (only used if a depth image is
+                                supplied).
+        :param scale:           The factor by which to scale the image size to get the resolution at which to
+                                rasterise the mask.
+        """
+        if bone_radius <= 0.0:
+            raise ValueError("The bone radius must be positive")
+        if not 0.0 < scale <= 1.0:
+            raise ValueError("The scale must be in (0,1]")
+
+        self.__bone_indices = {}                    # type: Dict[tuple, np.ndarray]
+        self.__bone_radius = bone_radius            # type: float
+        self.__depth_tolerance = depth_tolerance    # type: float
+        self.__scale = scale                        # type: float
+
+    # PUBLIC METHODS
+
+    def make_mask(self, batch: SkeletonBatch, world_from_camera: np.ndarray,
+                  intrinsics: Tuple[float, float, float, float], image_shape: Tuple[int, int], *,
+                  depth_image: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Make a mask of the active people in a batch of skeletons.
+
+        :param batch:               The batch of skeletons.
+        :param world_from_camera:   The camera pose.
+        :param intrinsics:          The camera intrinsics (fx, fy, cx, cy).
+        :param image_shape:         The shape of the image for which to make the mask, as (height, width).
+        :param depth_image:         An optional depth image (in metres, with 0 denoting invalid depths) with which
+                                    to gate the mask.
+        :return:                    The mask, as a uint8 array of the specified shape (255 = person, 0 = otherwise).
+        """
+        height, width = image_shape
+        mask_height = max(int(round(height * self.__scale)), 1)  # type: int
+        mask_width = max(int(round(width * self.__scale)), 1)    # type: int
+        sx, sy = mask_width / width, mask_height / height
+        mask = np.zeros((mask_height, mask_width), dtype=np.uint8)  # type: np.ndarray
+
+        # Transform the joints of the active people into camera space.
+        positions = batch.get_positions()[batch.get_active()]  # type: np.ndarray
+        bones = self.__get_bone_indices(batch.get_keypoint_names(), batch.get_keypoint_pairs())  # type: np.ndarray
+        if len(positions) > 0 and len(bones) > 0:
+            points = (positions - world_from_camera[0:3, 3]) @ world_from_camera[0:3, 0:3]  # type: np.ndarray
+
+            # Project them into the mask, and work out the radius (in mask pixels) of the capsules at each joint.
+            fx, fy, cx, cy = intrinsics
+            z = points[..., 2]  # type: np.ndarray
+            safe_z = np.maximum(z, 1e-6)  # type: np.ndarray
+            u = (fx * points[..., 0] / safe_z + cx + 0.5) * sx - 0.5  # type: np.ndarray
+            v = (fy * points[..., 1] / safe_z + cy + 0.5) * sy - 0.5  # type: np.ndarray
+            r = fx * sx * self.__bone_radius / safe_z  # type: np.ndarray
+
+            # Gather the end-points of the bones of each person into arrays of segments.
+            a, b = bones[:, 0], bones[:, 1]
+            ends = [np.stack([arr[:, a], arr[:, b]], axis=1) for arr in (u, v, r, z)]  # each is P*2*B
+            depths = PeopleMaskRasteriser.__sample_depths(depth_image, mask.shape) \
+                if depth_image is not None else None  # type: Optional[np.ndarray]
+
+            # Rasterise the segments of each person in turn (this is done per person rather than for everyone at
+            # once, since people are usually much more compact than the region that everyone covers together),
+            # dropping any segments that are (partly) behind the camera.
+            for i in range(len(positions)):
+                keep = (ends[3][i] > 1e-6).all(axis=0)  # type: np.ndarray
+                if np.any(keep):
+                    self.__rasterise_segments(mask, *(e[i][:, keep] for e in ends), depths)
+
+        # Upsample the mask to the size of the image if necessary.
+        if mask.shape != (height, width):
+            import cv2
+            mask = cv2.resize(mask, (width, height), interpolation=cv2.INTER_NEAREST)
+
+        return mask
+
+    # PRIVATE METHODS
+
+    def __get_bone_indices(self, keypoint_names: Sequence[str], keypoint_pairs: Sequence[Tuple[str, str]]) \
+            -> np.ndarray:
+        """
+        Get the indices of the joints at either end of each bone.
+
+        .. note::
+            The topology is the same for every batch that a detector produces, so the indices are cached.
+
+        :param keypoint_names:  The names of the joints.
+        :param keypoint_pairs:  The pairs of keypoints that are joined to form bones.
+        :return:                The indices of the joints at either end of each bone, as a B*2 array.
+        """
+        key = (tuple(keypoint_names), tuple(keypoint_pairs))  # type: tuple
+        bones = self.__bone_indices.get(key)  # type: Optional[np.ndarray]
+        if bones is None:
+            indices = {name: i for i, name in enumerate(keypoint_names)}  # type: Dict[str, int]
+            bones = self.__bone_indices[key] = np.array([
+                (indices[i], indices[j]) for i, j in keypoint_pairs if i in indices and j in indices
+            ], dtype=int).reshape(-1, 2)
+
+        return bones
+
+    def __rasterise_segments(self, mask: np.ndarray, segment_u: np.ndarray, segment_v: np.ndarray,
+                             segment_r: np.ndarray, segment_z: np.ndarray, depths: Optional[np.ndarray]) -> None:
+        """
+        Rasterise a set of projected capsules into a mask.
+
+        :param mask:        The mask (modified in place).
+        :param segment_u:   The x coordinates (in mask pixels) of the end-points of the segments, as a 2*S array.
+        :param segment_v:   The y coordinates (in mask pixels) of the end-points of the segments, as a 2*S array.
+        :param segment_r:   The radii (in mask pixels) of the capsules at the end-points, as a 2*S array.
+        :param segment_z:   The depths (in metres) of the end-points of the segments, as a 2*S array.
+        :param depths:      An optional depth image (in metres) at the resolution of the mask.
+        """
+        # Restrict the rasterisation to the bounding box of the capsules, clipped to the mask.
+        mask_height, mask_width = mask.shape
+        max_r = segment_r.max(axis=0)  # type: np.ndarray
+        x0 = max(int(np.floor((segment_u.min(axis=0) - max_r).min())), 0)
+        y0 = max(int(np.floor((segment_v.min(axis=0) - max_r).min())), 0)
+        x1 = min(int(np.ceil((segment_u.max(axis=0) + max_r).max())) + 1, mask_width)
+        y1 = min(int(np.ceil((segment_v.max(axis=0) + max_r).max())) + 1, mask_height)
+        if x1 <= x0 or y1 <= y0:
+            return
+
+        px, py = np.meshgrid(np.arange(x0, x1, dtype=float), np.arange(y0, y1, dtype=float))
+        px, py = px.ravel(), py.ravel()
+        covered = np.zeros(len(px), dtype=bool)  # type: np.ndarray
+        pixel_depths = depths[y0:y1, x0:x1].ravel() if depths is not None else None  # type: Optional[np.ndarray]
+
+        # Test every pixel against every segment, a chunk of segments at a time.
+        segment_count = segment_u.shape[1]  # type: int
+        chunk_size = max(PeopleMaskRasteriser.__MAX_CHUNK_ELEMENTS // len(px), 1)  # type: int
+        for start in range(0, segment_count, chunk_size):
+            s = slice(start, start + chunk_size)
+            au, av, ar, az = segment_u[0, s, None], segment_v[0, s, None], segment_r[0, s, None], segment_z[0, s, None]
+            du, dv = segment_u[1, s, None] - au, segment_v[1, s, None] - av
+            length_sq = np.maximum(du * du + dv * dv, 1e-12)  # type: np.ndarray
+
+            # Find the closest point on each segment to each pixel, as a parameter t in [0,1] along the segment.
+            t = np.clip(((px - au) * du + (py - av) * dv) / length_sq, 0.0, 1.0)  # type: np.ndarray
+            radius = ar + t * (segment_r[1, s, None] - ar)  # type: np.ndarray
+            inside = (px - (au + t * du)) ** 2 + (py - (av + t * dv)) ** 2 <= radius * radius  # type: np.ndarray
+
+            # If requested, exclude any pixels whose depths are inconsistent with that of the segment.
+            if pixel_depths is not None:
+                segment_depth = az + t * (segment_z[1, s, None] - az)  # type: np.ndarray
+                inside &= (pixel_depths <= 0) | (np.abs(pixel_depths - segment_depth) <= self.__depth_tolerance)
+
+            covered |= inside.any(axis=0)
+
+        mask[y0:y1, x0:x1][covered.reshape(y1 - y0, x1 - x0)] = 255
+
+    # PRIVATE STATIC METHODS
+
+    @staticmethod
+    def __sample_depths(depth_image: np.ndarray, mask_shape: Tuple[int, int]) -> np.ndarray:
+        """
+        Sample a depth image at the centres of the pixels of a (typically lower-resolution) mask.
+
+        .. note::
+            The depth image is assumed to be registered with the colour image, but it need not be the same size.
+
+        :param depth_image: The depth image (in metres).
+        :param mask_shape:  The shape of the mask, as (height, width).
+        :return:            The sampled depths, at the resolution of the mask (invalid depths are set to 0).
+        """
+        height, width = depth_image.shape[:2]
+        mask_height, mask_width = mask_shape
+        ys = np.clip(np.round((np.arange(mask_height) + 0.5) * height / mask_height - 0.5).astype(int), 0, height - 1)
+        xs = np.clip(np.round((np.arange(mask_width) + 0.5) * width / mask_width - 0.5).astype(int), 0, width - 1)
+        depths = depth_image[ys[:, np.newaxis], xs]  # type: np.ndarray
+        return np.where(np.isfinite(depths), depths, 0.0)
@@ -0,0 +1,305 @@
+import json
+import numpy as np
+import os
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from .xnect_backend import FrameResults, XNectBackend
+from .xnect_recorder import XNectRecorder
+
+
+class ReplayXNect(XNectBackend):
+    """
+    An XNect backend that replays outputs that were previously recorded using an XNectRecorder.
+
+    .. note::
+        Each call to process_image advances to the next recorded frame (the image itself is validated, but otherwise
+        ignored), after which the recorded outputs for that frame are returned by the usual getters. This makes it
+        possible to rerun everything downstream of XNect (e.g. coordinate conversion, tracking and visualisation)
+        on past footage at disk speed, via exactly the same code path as for live data. The chunks of the recording
+        are memory-mapped on first use, so the recording never needs to be loaded into memory as a whole.
+    .. note::
+        Since the camera pose, image size and timestamp of each frame are also recorded, they can be looked up
+        (by frame index) to drive the detector in the same way as it was driven when the recording was made.
+    """
+
+    # CONSTRUCTOR
+
+    def __init__(self, recording_dir: str, *, loop: bool = False):
+        """
+        Construct a replay backend.
+
+        :param recording_dir:   The directory containing the recording.
+        :param loop:            Whether to loop back to the start of the recording once the end is reached.
+        """
+        with open(os.path.join(recording_dir, XNectRecorder.METADATA_FILENAME)) as f:
+            metadata = json.load(f)  # type: Dict[str, Any]
+
+        if metadata["frame_count"] == 0:
+            raise ValueError("The recording in '{}' doesn't contain any frames".format(recording_dir))
+
+        self.__chunk_size = metadata["chunk_size"]                                # type: int
+        self.__chunks = [None] * metadata["chunk_count"]                          # type: List[Optional[dict]]
+        self.__frame_count = metadata["frame_count"]                              # type: int
+        self.__frame_idx = -1                                                     # type: int
+        self.__intrinsics = tuple(metadata["intrinsics"])                         # type: Tuple[float, ...]
+        self.__joint_parents = tuple(metadata["joint_parents"])                   # type: Tuple[int, ...]
+        self.__loop = loop                                                        # type: bool
+        self.__person_colours = np.array(metadata["person_colours"], dtype=int)   # type: np.ndarray
+        self.__recording_dir = recording_dir                                      # type: str
+
+    # PUBLIC METHODS
+
+    def get_frame_count(self) -> int:
+        """
+        Get the number of frames in the recording.
+
+        :return:    The number of frames in the recording.
+        """
+        return self.__frame_count
+
+    def get_frame_field(self, frame_idx: int, name: str) -> np.ndarray:
+        """
+        Get the value of the specified field for the specified frame of the recording.
+
+        :param frame_idx:   The index of the frame.
+        :param name:        The name of the field (see XNectRecorder.FIELDS).
+        :return:            The value of the field for the frame (a read-only, memory-mapped array).
+        """
+        if not 0 <= frame_idx < self.__frame_count:
+            raise IndexError("Frame index {} is out of range".format(frame_idx))
+
+        chunk_idx, offset = divmod(frame_idx, self.__chunk_size)
+        return self.__get_chunk(chunk_idx)[name][offset]
+
+    def get_frame_idx(self) -> int:
+        """
+        Get the index of the frame that will be replayed on the next call to process_image.
+
+        :return:    The index of the frame that will be replayed on the next call to process_image.
+        """
+        return (self.__frame_idx + 1) % self.__frame_count if self.__loop else self.__frame_idx + 1
+
+    def get_frame_results(self, out: Optional[FrameResults] = None) -> FrameResults:
+        """
+        Get all of the results for the most recently replayed frame in one go.
+
+        :param out: An optional set of arrays into which to write the results.
+        :return:    See XNectBackend.get_frame_results.
+        """
+        results = (
+            self.__get_field("active"), self.__get_field("ik_positions"), self.__get_field("local_rotations"),
+            self.__get_field("global_rotations"), self.__get_field("joints_2d")
+        )  # type: FrameResults
+        return XNectBackend.copy_frame_results(results, out) if out is not None else results
+
+    def get_image_size(self, frame_idx: int) -> Tuple[int, int]:
+        """
+        Get the size of the image for the specified frame of the recording.
+
+        :param frame_idx:   The index of the frame.
+        :return:            The size of the image for the frame, as a (height, width) pair.
+        """
+        height, width = self.get_frame_field(frame_idx, "image_size")
+        return int(height), int(width)
+
+    def get_joint_local_rotation(self, p: int, joint: int) -> np.ndarray:
+        """
+        Get the local rotation of the specified joint of the specified person.
+
+        :param p:       The index of the person.
+        :param joint:   The index of the joint.
+        :return:        The local rotation of the joint, as a 3*3 matrix.
+        """
+        return self.__get_field("local_rotations")[p, joint].copy()
+
+    def get_joint3d_ik(self, person: int, joint: int) -> np.ndarray:
+        """
+        Get the position of the specified joint of the specified person, as estimated by the skeleton fitting.
+
+        :param person:  The index of the person.
+        :param joint:   The index of the joint.
+        :return:        The position of the joint.
+        """
+        return self.__get_field("ik_positions")[person, joint].copy()
+
+    def get_joint3d_parent(self, joint: int) -> int:
+        """
+        Get the index of the parent of the specified joint.
+
+        :param joint:   The index of the joint.
+        :return:        The index of the joint's parent, or -1 if it doesn't have one.
+        """
+        return self.__joint_parents[joint]
+
+    def get_joint3d_pred(self, person: int, joint: int) -> np.ndarray:
+        """
+        Get the position of the specified joint of the specified person, as predicted by the network.
+
+        :param person:  The index of the person.
+        :param joint:   The index of the joint.
+        :return:        The position of the joint.
+        """
+        return self.__get_field("pred_positions")[person, joint].copy()
+
+    def get_num_of_3d_joints(self) -> int:
+        """
+        Get the number of joints in each skeleton.
+
+        :return:    The number of joints in each skeleton.
+        """
+        return len(self.__joint_parents)
+
+    def get_num_of_people(self) -> int:
+        """
+        Get the maximum number of people that can be detected (i.e. the number of person slots).
+
+        :return:    The maximum number of people that can be detected.
+        """
+        return len(self.__person_colours)
+
+    def get_person_colour(self, p: int) -> np.ndarray:
+        """
+        Get the colour assigned to the specified person.
+
+        :param p:   The index of the person.
+        :return:    The colour assigned to the person, as a 3-element integer array.
+        """
+        return self.__person_colours[p].copy()
+
+    def get_skeleton_global_position(self, p: int) -> np.ndarray:
+        """
+        Get the global position of the specified person's skeleton.
+
+        :param p:   The index of the person.
+        :return:    The global position of the person's skeleton (i.e. the position of their root joint).
+        """
+        return self.__get_field("ik_positions")[p, self.__joint_parents.index(-1)].copy()
+
+    def get_skeleton_global_rotation(self, p: int) -> np.ndarray:
+        """
+        Get the global rotation of the specified person's skeleton.
+
+        :param p:   The index of the person.
+        :return:    The global rotation of the person's skeleton, as a 3*3 matrix.
+        """
+        return self.__get_field("global_rotations")[p].copy()
+
+    def get_timestamp(self, frame_idx: int) -> float:
+        """
+        Get the time at which the specified frame of the recording was processed.
+
+        :param frame_idx:   The index of the frame.
+        :return:            The time (in seconds) at which the frame was processed.
+        """
+        return float(self.get_frame_field(frame_idx, "timestamp"))
+
+    def get_world_from_camera(self, frame_idx: int) -> np.ndarray:
+        """
+        Get the camera pose for the specified frame of the recording.
+
+        :param frame_idx:   The index of the frame.
+        :return:            The camera pose for the frame.
+        """
+        return np.array(self.get_frame_field(frame_idx, "world_from_camera"))
+
+    def has_more_frames(self) -> bool:
+        """
+        Get whether there are any more frames left to replay.
+
+        :return:    True, if there are any more frames left to replay, or False otherwise.
+        """
+        return self.__loop or self.__frame_idx + 1 < self.__frame_count
+
+    def is_person_active(self, p: int) -> bool:
+        """
+        Get whether a person was detected in the specified slot in the most recently replayed frame.
+
+        :param p:   The index of the person.
+        :return:    True, if a person was detected in the specified slot, or False otherwise.
+        """
+        return bool(self.__get_field("active")[p])
+
+    def process_image(self, img: np.ndarray) -> None:
+        """
+        Advance to the next recorded frame.
+
+        .. note::
+            The image is validated in the same way as by the native binding, but its contents are otherwise ignored.
+
+        :param img: The image (a uint8 array of shape HxWx3).
+        """
+        if img.dtype != np.uint8:
+            raise TypeError("process_image: expected a uint8 image, got dtype {}".format(img.dtype))
+        if img.ndim != 3 or img.shape[2] != 3:
+            raise ValueError("process_image: expected an HxWx3 image, got shape {}".format(img.shape))
+        if not self.has_more_frames():
+            raise EOFError("process_image: there are no more frames to replay")
+
+        self.__frame_idx = self.get_frame_idx()
+
+    def project_with_intrinsics(self, point: np.ndarray) -> np.ndarray:
+        """
+        Project a 3D point in the XNect coordinate system into the image.
+
+        :param point:   The 3D point.
+        :return:        The 2D image position onto which the point projects.
+        """
+        fx, fy, cx, cy = self.__intrinsics
+        x, y, z = np.asarray(point, dtype=float)
+        return np.array([fx * x / z + cx, fy * y / z + cy], dtype=np.float32)
+
+    def reset_tracking(self) -> bool:
+        """
+        Reset the temporal tracking state of the backend.
+
+        .. note::
+            This deliberately doesn't rewind the recording, since the recording itself may consist of several
+            sequences, between which the detector would be restarted. Use seek to rewind the recording.
+
+        :return:    True (since there's no tracking state to reset).
+        """
+        return True
+
+    def seek(self, frame_idx: int) -> None:
+        """
+        Make the specified frame of the recording the one that will be replayed on the next call to process_image.
+
+        :param frame_idx:   The index of the frame.
+        """
+        if not 0 <= frame_idx < self.__frame_count:
+            raise IndexError("Frame index {} is out of range".format(frame_idx))
+
+        self.__frame_idx = frame_idx - 1
+
+    # PRIVATE METHODS
+
+    def __get_chunk(self, chunk_idx: int) -> Dict[str, np.ndarray]:
+        """
+        Get the specified chunk of the recording, memory-mapping it if necessary.
+
+        :param chunk_idx:   The index of the chunk.
+        :return:            A dictionary mapping the name of each field to its memory-mapped array for the chunk.
+        """
+        chunk = self.__chunks[chunk_idx]  # type: Optional[Dict[str, np.ndarray]]
+        if chunk is None:
+            chunk_dir = os.path.join(
+                self.__recording_dir, XNectRecorder.CHUNK_DIR_FORMAT.format(chunk_idx)
+            )  # type: str
+            chunk = self.__chunks[chunk_idx] = {
+                name: np.load(os.path.join(chunk_dir, name + ".npy"), mmap_mode="r") for name in XNectRecorder.FIELDS
+            }
+
+        return chunk
+
+    def __get_field(self, name: str) -> np.ndarray:
+        """
+        Get the value of the specified field for the most recently replayed frame.
+
+        :param name:    The name of the field.
+        :return:        The value of the field for the most recently replayed frame.
+        """
+        if self.__frame_idx < 0:
+            raise RuntimeError("No frame has been replayed yet")
+
+        return self.get_frame_field(self.__frame_idx, name)
@@ -0,0 +1,100 @@
+import threading
+import time
+
+from timeit import default_timer as timer
+from typing import Any, Dict, Optional
+
+
+class ResultPresenter:
+    """
+    Decouples the presentation of results (e.g. displaying them in a window) from the thread that produces them.
+
+    .. note::
+        The producer publishes each result into a single latest-result slot, which never blocks, and the thread that
+        presents the results (usually the main thread, since that's the one that owns the windows) takes the newest
+        result from the slot on its own cadence. Any results that are superseded before they can be taken are
+        dropped, so a slow display (e.g. one that's waiting for vsync) never holds up the producer.
+    .. note::
+        The presentation rate can optionally be throttled, in which case take_latest sleeps until the next
+        presentation is due. This keeps the cost of presentation bounded when running as a live monitor.
+    """
+
+    # CONSTRUCTOR
+
+    def __init__(self, *, max_rate: Optional[float] = None):
+        """
+        Construct a result presenter.
+
+        :param max_rate:    The maximum rate (in Hz) at which to present results (None = as fast as possible).
+        """
+        if max_rate is not None and max_rate <= 0.0:
+            raise ValueError("The maximum presentation rate must be positive")
+
+        self.__dropped_count = 0                # type: int
+        self.__has_new_result = False           # type: bool
+        self.__last_take_time = None            # type: Optional[float]
+        self.__latest_result = None             # type: Any
+        self.__lock = threading.Lock()
+        self.__max_rate = max_rate              # type: Optional[float]
+        self.__presented_count = 0              # type: int
+        self.__published_count = 0              # type: int
+
+    # PUBLIC METHODS
+
+    def get_statistics(self) -> Dict[str, int]:
+        """
+        Get the numbers of results that have been published, presented and dropped so far.
+
+        :return:    A dictionary containing the numbers of results that have been published, presented and dropped.
+        """
+        with self.__lock:
+            return {
+                "dropped": self.__dropped_count,
+                "presented": self.__presented_count,
+                "published": self.__published_count
+            }
+
+    def publish(self, result: Any) -> None:
+        """
+        Publish a new result, replacing any result that has not yet been taken.
+
+        .. note::
+            This never blocks (beyond briefly acquiring a lock), so it's safe to call on the critical path.
+
+        :param result:  The result.
+        """
+        with self.__lock:
+            if self.__has_new_result:
+                self.__dropped_count += 1
+
+            self.__has_new_result = True
+            self.__latest_result = result
+            self.__published_count += 1
+
+    def take_latest(self) -> Optional[Any]:
+        """
+        Take the newest result that has not yet been taken (if any).
+
+        .. note::
+            If the presentation rate is being throttled, this first sleeps until the next presentation is due.
+            The caller should typically call this once per iteration of its display loop, and redraw whatever
+            it's displaying regardless of whether a new result was available.
+
+        :return:    The newest result that has not yet been taken, or None if there isn't one.
+        """
+        if self.__max_rate is not None and self.__last_take_time is not None:
+            delay = self.__last_take_time + 1.0 / self.__max_rate - timer()  # type: float
+            if delay > 0.0:
+                time.sleep(delay)
+
+        self.__last_take_time = timer()
+
+        with self.__lock:
+            if not self.__has_new_result:
+                return None
+
+            result = self.__latest_result  # type: Any
+            self.__has_new_result = False
+            self.__latest_result = None
+            self.__presented_count += 1
+            return result
@@ -0,0 +1,140 @@
+import ctypes
+import multiprocessing
+import numpy as np
+
+from typing import Any, Dict, Tuple
+
+
+class SharedFrameRing:
+    """
+    A ring of preallocated frame slots in shared memory, via which frames can be passed between processes.
+
+    .. note::
+        Each slot holds an image (of up to a maximum size), together with the pose of the camera that captured
+        it. A frame is passed to another process by writing it into a free slot and
+        then sending only the slot's index, so the image data itself is never pickled or copied between processes.
+        Each image is stored contiguously at the start of its slot (whatever its size), so that it can be read
+        back as a contiguous array that can be passed straight to XNect.
+        Keeping track of which slots are free is left to the owner of the ring (see SkeletonDetectorProcessPool).
+    .. note::
+        multiprocessing.shared_memory requires Python 3.8, so the slots are stored in RawArrays instead. These can
+        be passed to child processes when they're started (e.g. as arguments to the Process constructor), but not
+        over queues. No locking is needed, since each slot is only ever accessed by one process at a time.
+    """
+
+    # PRIVATE CLASS CONSTANTS
+
+    # The number of values in the metadata for each slot: the image height and width, and the 4*4 camera pose.
+    __METADATA_SIZE = 18  # type: int
+
+    # CONSTRUCTOR
+
+    def __init__(self, slot_count: int, max_image_shape: Tuple[int, int]):
+        """
+        Construct a shared frame ring.
+
+        :param slot_count:      The number of slots in the ring.
+        :param max_image_shape: The maximum shape of the images that can be stored in the slots, as (height, width).
+        """
+        if slot_count < 1:
+            raise ValueError("A shared frame ring must contain at least one slot")
+
+        height, width = max_image_shape
+        self.__image_buffer = multiprocessing.RawArray(ctypes.c_uint8, slot_count * height * width * 3)
+        self.__metadata_buffer = multiprocessing.RawArray(ctypes.c_double, slot_count * SharedFrameRing.__METADATA_SIZE)
+        self.__max_image_shape = (height, width)  # type: Tuple[int, int]
+        self.__slot_count = slot_count            # type: int
+
+        self.__make_views()
+
+    # SPECIAL METHODS
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """
+        Get the state of the ring that should be pickled when passing it to a child process.
+
+        .. note::
+            The numpy views onto the shared buffers are excluded, and are remade in the child process.
+
+        :return:    The state of the ring that should be pickled.
+        """
+        state = self.__dict__.copy()  # type: Dict[str, Any]
+        del state["_SharedFrameRing__images"]
+        del state["_SharedFrameRing__metadata"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """
+        Restore the state of a ring that has been passed to a child process.
+
+        :param state:   The unpickled state of the ring.
+        """
+        self.__dict__.update(state)
+        self.__make_views()
+
+    # PUBLIC METHODS
+
+    def get_max_image_shape(self) -> Tuple[int, int]:
+        """
+        Get the maximum shape of the images that can be stored in the slots.
+
+        :return:    The maximum shape of the images that can be stored in the slots, as (height, width).
+        """
+        return self.__max_image_shape
+
+    def get_slot_count(self) -> int:
+        """
+        Get the number of slots in the ring.
+
+        :return:    The number of slots in the ring.
+        """
+        return self.__slot_count
+
+    def read_frame(self, slot_idx: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Read the frame in the specified slot.
+
+        .. note::
+            The image is returned as a (contiguous) view onto the slot, so it must not be used once the slot has
+            been reused.
+
+        :param slot_idx:    The index of the slot.
+        :return:            A tuple consisting of the image and the camera pose.
+        """
+        metadata = self.__metadata[slot_idx]  # type: np.ndarray
+        height, width = int(metadata[0]), int(metadata[1])
+        world_from_camera = metadata[2:18].reshape(4, 4).copy()  # type: np.ndarray
+        return self.__images[slot_idx, :height * width * 3].reshape(height, width, 3), world_from_camera
+
+    def write_frame(self, slot_idx: int, image: np.ndarray, world_from_camera: np.ndarray) -> None:
+        """
+        Write a frame into the specified slot.
+
+        :param slot_idx:            The index of the slot.
+        :param image:               The image (a uint8 array of shape HxWx3, no bigger than the maximum size).
+        :param world_from_camera:   The camera pose.
+        """
+        height, width = image.shape[:2]
+        max_height, max_width = self.__max_image_shape
+        if image.ndim != 3 or image.shape[2] != 3 or height > max_height or width > max_width:
+            raise ValueError("Expected an HxWx3 image no bigger than {}x{}, got shape {}".format(
+                max_height, max_width, image.shape
+            ))
+
+        self.__images[slot_idx, :height * width * 3].reshape(height, width, 3)[:] = image
+
+        metadata = self.__metadata[slot_idx]  # type: np.ndarray
+        metadata[0:2] = (height, width)
+        metadata[2:18] = np.asarray(world_from_camera).ravel()
+
+    # PRIVATE METHODS
+
+    def __make_views(self) -> None:
+        """Make the numpy views onto the shared buffers."""
+        height, width = self.__max_image_shape
+        self.__images = np.frombuffer(self.__image_buffer, dtype=np.uint8).reshape(
+            self.__slot_count, height * width * 3
+        )  # type: np.ndarray
+        self.__metadata = np.frombuffer(self.__metadata_buffer, dtype=np.float64).reshape(
+            self.__slot_count, SharedFrameRing.__METADATA_SIZE
+        )  # type: np.ndarray
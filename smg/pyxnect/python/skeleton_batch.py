@@ -0,0 +1,316 @@
+import json
+import numpy as np
+import struct
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from smg.skeletons import Keypoint, Skeleton3D
+
+
+class SkeletonBatch:
+    """
+    The 3D skeletons detected in a single frame, stored as a few contiguous arrays rather than as a graph of objects.
+
+    .. note::
+        Each row of the arrays corresponds to a single person. The active mask indicates which of the people were
+        actually observed in the frame (people can be present but inactive if, for example, they are being
+        tracked but were not detected in this particular frame). The rotations are optional, and are only present
+        if the joint poses produced by XNect are being used.
+    .. note::
+        Skeleton3D objects are only made for the people on demand, and are then cached, so clients that only need
+        the joint arrays never pay for constructing them.
+    """
+
+    __slots__ = (
+        "__active", "__frame_idx", "__global_rotations", "__keypoint_names", "__keypoint_pairs", "__local_rotations",
+        "__person_ids", "__positions", "__skeletons"
+    )
+
+    # PRIVATE CLASS CONSTANTS
+
+    # The boundary (in bytes, relative to the start of a serialised batch) to which each array section is aligned.
+    __ALIGNMENT = 8  # type: int
+
+    # The layout of the fixed-size header at the start of a serialised batch: a magic number, the frame index, the
+    # number of people, the number of joints, whether or not there are rotations, and the size of the topology.
+    __HEADER_FORMAT = "<4sqII?I"  # type: str
+
+    # The magic number at the start of a serialised batch.
+    __MAGIC = b"SKB2"  # type: bytes
+
+    # CONSTRUCTOR
+
+    def __init__(self, frame_idx: int, person_ids: np.ndarray, active: np.ndarray, positions: np.ndarray,
+                 keypoint_names: Sequence[str], keypoint_pairs: Sequence[Tuple[str, str]], *,
+                 global_rotations: Optional[np.ndarray] = None, local_rotations: Optional[np.ndarray] = None):
+        """
+        Construct a skeleton batch.
+
+        :param frame_idx:           The index of the frame in which the skeletons were detected.
+        :param person_ids:          The IDs of the people, as a P-element integer array.
+        :param active:              A P-element boolean mask indicating which people were observed in the frame.
+        :param positions:           The world-space positions of the people's joints, as a P*J*3 array.
+        :param keypoint_names:      The names of the J joints.
+        :param keypoint_pairs:      The pairs of keypoints that are joined to form bones.
+        :param global_rotations:    An optional P*3*3 array of the global rotations of the people's mid-hips.
+        :param local_rotations:     An optional P*J*3*3 array of the local rotations of the people's joints.
+        """
+        if (global_rotations is None) != (local_rotations is None):
+            raise ValueError("Either both or neither of the global and local rotations must be specified")
+        if positions.ndim != 3 or positions.shape[1:] != (len(keypoint_names), 3):
+            raise ValueError("Expected a P*{}*3 array of positions, got shape {}".format(
+                len(keypoint_names), positions.shape
+            ))
+        if len(person_ids) != len(positions) or len(active) != len(positions):
+            raise ValueError("The person IDs, active mask and positions must all have the same length")
+
+        self.__active = active                                  # type: np.ndarray
+        self.__frame_idx = frame_idx                            # type: int
+        self.__global_rotations = global_rotations              # type: Optional[np.ndarray]
+        self.__keypoint_names = tuple(keypoint_names)           # type: Tuple[str, ...]
+        self.__keypoint_pairs = keypoint_pairs                  # type: Sequence[Tuple[str, str]]
+        self.__local_rotations = local_rotations                # type: Optional[np.ndarray]
+        self.__person_ids = person_ids                          # type: np.ndarray
+        self.__positions = positions                            # type: np.ndarray
+        self.__skeletons = [None] * len(positions)              # type: List[Optional[Skeleton3D]]
+
+    # SPECIAL METHODS
+
+    def __len__(self) -> int:
+        """
+        Get the number of people in the batch.
+
+        :return:    The number of people in the batch.
+        """
+        return len(self.__positions)
+
+    # PUBLIC STATIC METHODS
+
+    @staticmethod
+    def from_bytes(data: bytes) -> "SkeletonBatch":
+        """
+        Deserialise a skeleton batch that was serialised using to_bytes.
+
+        .. note::
+            The arrays of the deserialised batch are read-only views onto the specified data, so no copies are made.
+            Since each array section is padded to an 8-byte boundary by to_bytes, the views are properly aligned
+            provided that the data itself starts at an 8-byte boundary (as is the case for a bytes object).
+
+        :param data:    The serialised batch.
+        :return:        The skeleton batch.
+        """
+        header_size = struct.calcsize(SkeletonBatch.__HEADER_FORMAT)  # type: int
+        magic, frame_idx, people_count, joint_count, has_rotations, topology_size = struct.unpack_from(
+            SkeletonBatch.__HEADER_FORMAT, data
+        )
+        if magic != SkeletonBatch.__MAGIC:
+            raise ValueError("The data does not contain a serialised skeleton batch")
+
+        offset = header_size  # type: int
+        topology = json.loads(bytes(data[offset:offset + topology_size]).decode("utf-8"))  # type: Dict[str, list]
+        offset += topology_size
+
+        def read_array(dtype: type, shape: Tuple[int, ...]) -> np.ndarray:
+            nonlocal offset
+            offset = SkeletonBatch.__align(offset)
+            count = int(np.prod(shape))  # type: int
+            arr = np.frombuffer(data, dtype=dtype, count=count, offset=offset).reshape(shape)  # type: np.ndarray
+            offset += arr.nbytes
+            return arr
+
+        person_ids = read_array(np.int64, (people_count,))                                  # type: np.ndarray
+        active = read_array(np.bool_, (people_count,))                                      # type: np.ndarray
+        positions = read_array(np.float64, (people_count, joint_count, 3))                  # type: np.ndarray
+        global_rotations = None                                                             # type: Optional[np.ndarray]
+        local_rotations = None                                                              # type: Optional[np.ndarray]
+        if has_rotations:
+            global_rotations = read_array(np.float64, (people_count, 3, 3))
+            local_rotations = read_array(np.float64, (people_count, joint_count, 3, 3))
+
+        return SkeletonBatch(
+            frame_idx, person_ids, active, positions, tuple(topology["keypoint_names"]),
+            tuple(tuple(pair) for pair in topology["keypoint_pairs"]),
+            global_rotations=global_rotations, local_rotations=local_rotations
+        )
+
+    # PUBLIC METHODS
+
+    def get_active(self) -> np.ndarray:
+        """
+        Get the mask indicating which people were observed in the frame.
+
+        :return:    A P-element boolean mask indicating which people were observed in the frame.
+        """
+        return self.__active
+
+    def get_frame_idx(self) -> int:
+        """
+        Get the index of the frame in which the skeletons were detected.
+
+        :return:    The index of the frame in which the skeletons were detected.
+        """
+        return self.__frame_idx
+
+    def get_global_rotations(self) -> Optional[np.ndarray]:
+        """
+        Get the global rotations of the people's mid-hips (if available).
+
+        :return:    The global rotations of the people's mid-hips, as a P*3*3 array, or None if not available.
+        """
+        return self.__global_rotations
+
+    def get_keypoint_names(self) -> Tuple[str, ...]:
+        """
+        Get the names of the joints.
+
+        :return:    The names of the joints.
+        """
+        return self.__keypoint_names
+
+    def get_keypoint_pairs(self) -> Sequence[Tuple[str, str]]:
+        """
+        Get the pairs of keypoints that are joined to form bones.
+
+        :return:    The pairs of keypoints that are joined to form bones.
+        """
+        return self.__keypoint_pairs
+
+    def get_local_rotations(self) -> Optional[np.ndarray]:
+        """
+        Get the local rotations of the people's joints (if available).
+
+        :return:    The local rotations of the people's joints, as a P*J*3*3 array, or None if not available.
+        """
+        return self.__local_rotations
+
+    def get_person_ids(self) -> np.ndarray:
+        """
+        Get the IDs of the people.
+
+        :return:    The IDs of the people, as a P-element integer array.
+        """
+        return self.__person_ids
+
+    def get_positions(self) -> np.ndarray:
+        """
+        Get the world-space positions of the people's joints.
+
+        :return:    The world-space positions of the people's joints, as a P*J*3 array.
+        """
+        return self.__positions
+
+    def get_skeleton(self, i: int) -> Skeleton3D:
+        """
+        Get the 3D skeleton of the specified person in the batch, making it if necessary.
+
+        :param i:   The index of the person in the batch.
+        :return:    The 3D skeleton of the person.
+        """
+        skeleton = self.__skeletons[i]  # type: Optional[Skeleton3D]
+        if skeleton is None:
+            skeleton = self.__skeletons[i] = self.__make_skeleton(i)
+        return skeleton
+
+    def get_skeletons(self) -> List[Skeleton3D]:
+        """
+        Get the 3D skeletons of all of the active people in the batch, making them if necessary.
+
+        :return:    The 3D skeletons of all of the active people in the batch.
+        """
+        return [self.get_skeleton(i) for i in np.flatnonzero(self.__active)]
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialise the batch into a compact binary form.
+
+        .. note::
+            The serialised form consists of a small fixed-size header, the joint names and bone pairs (as UTF-8
+            encoded JSON), and then the raw contents of each array, so it's much smaller and faster to make than
+            a pickled list of Skeleton3D objects. Each array section is zero-padded so that it starts at an 8-byte
+            boundary, which allows from_bytes to make aligned views onto it.
+
+        :return:    The serialised batch.
+        """
+        topology = json.dumps({
+            "keypoint_names": self.__keypoint_names,
+            "keypoint_pairs": self.__keypoint_pairs
+        }, separators=(",", ":")).encode("utf-8")  # type: bytes
+
+        people_count, joint_count = self.__positions.shape[:2]
+        has_rotations = self.__global_rotations is not None  # type: bool
+        parts = [
+            struct.pack(
+                SkeletonBatch.__HEADER_FORMAT, SkeletonBatch.__MAGIC, self.__frame_idx, people_count, joint_count,
+                has_rotations, len(topology)
+            ),
+            topology
+        ]  # type: List[bytes]
+        size = len(parts[0]) + len(parts[1])  # type: int
+
+        arrays = [
+            np.ascontiguousarray(self.__person_ids, dtype=np.int64),
+            np.ascontiguousarray(self.__active, dtype=np.bool_),
+            np.ascontiguousarray(self.__positions, dtype=np.float64)
+        ]  # type: List[np.ndarray]
+
+        if has_rotations:
+            arrays.append(np.ascontiguousarray(self.__global_rotations, dtype=np.float64))
+            arrays.append(np.ascontiguousarray(self.__local_rotations, dtype=np.float64))
+
+        # Append each array, preceded by enough padding to align it.
+        for arr in arrays:
+            padding = SkeletonBatch.__align(size) - size  # type: int
+            parts.append(bytes(padding))
+            parts.append(arr.tobytes())
+            size += padding + arr.nbytes
+
+        return b"".join(parts)
+
+    # PRIVATE METHODS
+
+    def __make_skeleton(self, i: int) -> Skeleton3D:
+        """
+        Make the 3D skeleton of the specified person in the batch.
+
+        .. note::
+            Since the joint names, positions and rotations are all index-aligned, the dictionaries that Skeleton3D
+            needs can be made by zipping them together, without any per-joint lookups.
+
+        :param i:   The index of the person in the batch.
+        :return:    The 3D skeleton of the person.
+        """
+        keypoint_names = self.__keypoint_names  # type: Tuple[str, ...]
+        positions = self.__positions[i]         # type: np.ndarray
+
+        # Construct the keypoints for the person's skeleton.
+        skeleton_keypoints = dict(zip(
+            keypoint_names, map(Keypoint, keypoint_names, positions)
+        ))  # type: Dict[str, Keypoint]
+
+        # If there are no rotations, make a skeleton with just the keypoints and early out.
+        if self.__global_rotations is None:
+            return Skeleton3D(skeleton_keypoints, self.__keypoint_pairs)
+
+        # Otherwise, record the global pose of the person's mid-hip keypoint.
+        world_from_midhip = np.eye(4)  # type: np.ndarray
+        world_from_midhip[0:3, 0:3] = self.__global_rotations[i]
+        world_from_midhip[0:3, 3] = skeleton_keypoints["MidHip"].position
+        global_keypoint_poses = {"MidHip": world_from_midhip}  # type: Dict[str, np.ndarray]
+
+        # Record the local rotations of the keypoints.
+        local_keypoint_rotations = dict(zip(keypoint_names, self.__local_rotations[i]))  # type: Dict[str, np.ndarray]
+
+        return Skeleton3D(skeleton_keypoints, self.__keypoint_pairs, global_keypoint_poses, local_keypoint_rotations)
+
+    # PRIVATE STATIC METHODS
+
+    @staticmethod
+    def __align(offset: int) -> int:
+        """
+        Round an offset into a serialised batch up to the next multiple of the alignment.
+
+        :param offset:  The offset (in bytes).
+        :return:        The aligned offset (in bytes).
+        """
+        alignment = SkeletonBatch.__ALIGNMENT  # type: int
+        return (offset + alignment - 1) // alignment * alignment
@@ -1,273 +1,960 @@
-import cv2
 import numpy as np
 import os
+import re
+import shutil
+import tempfile
+import threading
+import warnings
 
-from scipy.spatial.transform import Rotation
-from typing import Dict, List, Optional, Tuple
+from timeit import default_timer as timer
+from typing import Callable, Dict, List, Optional, Tuple
 
-from smg.pyxnect import XNect
-from smg.skeletons import Keypoint, Skeleton3D
-from smg.utility import GeometryUtil
+from smg.skeletons import Skeleton3D
+
+from .depth_scale_corrector import DepthScaleCorrector
+from .image_preprocessor import ImagePreprocessor
+from .latency_monitor import LatencyMonitor
+from .people_mask_rasteriser import PeopleMaskRasteriser
+from .skeleton_batch import SkeletonBatch
+from .skeleton_extrapolator import SkeletonExtrapolator
+from .skeleton_tracker import SkeletonTracker
+from .skeleton_visualiser import SkeletonVisualiser
+from .xnect_backend import FrameResults, XNectBackend
+from .xnect_recorder import XNectRecorder
+
+# Note: The native XNect library is only imported when a detector is actually started, and OpenCV is only imported
+#       when a visualisation is actually made, so that importing this module is cheap.
 
 
 class SkeletonDetector:
     """A 3D skeleton detector based on XNect."""
 
+    # PRIVATE CLASS CONSTANTS
+
+    # The signs by which to multiply the columns of the inverse of each global skeleton rotation produced by XNect
+    # (this is equivalent to post-multiplying the inverse by diag(1, -1, -1)).
+    __GLOBAL_ROTATION_FLIP = np.array([1.0, -1.0, -1.0])  # type: np.ndarray
+
+    # The names of the keypoints, in the order in which XNect indexes them (see xnect_implementation.h).
+    __KEYPOINT_NAMES = (
+        "Head Top",
+        "Neck",
+        "RShoulder",
+        "RElbow",
+        "RWrist",
+        "LShoulder",
+        "LElbow",
+        "LWrist",
+        "RHip",
+        "RKnee",
+        "RAnkle",
+        "LHip",
+        "LKnee",
+        "LAnkle",
+        "MidHip",  # XNect calls this "Root", but we use "MidHip" for consistency with other detectors
+        "Spine",
+        "Nose",    # XNect calls this "Head", but we use "Nose" for consistency with other detectors
+        "RHand",
+        "LHand",
+        "RFoot",
+        "LFoot"
+    )  # type: Tuple[str, ...]
+
+    # The pairs of keypoints that are joined to form bones.
+    __KEYPOINT_PAIRS = (
+        ("Head Top", "Nose"), ("Neck", "RShoulder"), ("Neck", "LShoulder"), ("Neck", "MidHip"), ("Neck", "Nose"),
+        ("RShoulder", "RElbow"), ("RElbow", "RWrist"), ("RWrist", "RHand"), ("LShoulder", "LElbow"),
+        ("LElbow", "LWrist"), ("LWrist", "LHand"), ("RHip", "RKnee"), ("RHip", "MidHip"), ("RKnee", "RAnkle"),
+        ("LHip", "LKnee"), ("LHip", "MidHip"), ("LKnee", "LAnkle")
+    )  # type: Tuple[Tuple[str, str], ...]
+
+    # The prefix of the network paths in the stock XNect params files, which are relative to bin/Release.
+    __LEGACY_NETWORK_PATH_PREFIX = "../../data/"  # type: str
+
+    # A regular expression matching the lines of an XNect params file that specify the paths to the networks.
+    __NETWORK_PATH_LINE = re.compile(
+        r"^(?P<key>\s*(?:FirstNet|FirstNetWeights|SecondNet|SecondNetWeights)\s*:\s*)(?P<path>\S.*?)\s*$"
+    )
+
+    # The name of the params file that XNect reads from its config directory.
+    __PARAMS_FILENAME = "XNECT.params"  # type: str
+
+    # A regular expression matching the lines of an XNect params file that specify its processing size.
+    __PROCESS_SIZE_LINE = re.compile(r"^\s*(?P<key>ProcessWidth|ProcessHeight)\s*:\s*(?P<value>\d+)\s*$")
+
+    # The signs by which to multiply the elements of each local keypoint rotation produced by XNect (this is
+    # equivalent to conjugating the rotation by diag(-1, 1, -1)).
+    __LOCAL_ROTATION_MIRROR = np.outer([-1.0, 1.0, -1.0], [-1.0, 1.0, -1.0])  # type: np.ndarray
+
+    # The per-axis factors by which to scale each position produced by XNect (mm -> m, and flip x and y).
+    __POSITION_SCALE = np.array([-0.001, -0.001, 0.001])  # type: np.ndarray
+
     # CONSTRUCTOR
 
-    def __init__(self, *, exe_dir: str = "D:/xnect/bin/Release"):
+    def __init__(self, *, backend_factory: Optional[Callable[[], XNectBackend]] = None,
+                 data_dir: Optional[str] = None, depth_scale_corrector: Optional[DepthScaleCorrector] = None,
+                 exe_dir: Optional[str] = None, inference_interval: int = 1, latency_budget: Optional[float] = None,
+                 people_mask_rasteriser: Optional[PeopleMaskRasteriser] = None,
+                 recorder: Optional[XNectRecorder] = None, reuse_buffers: bool = False,
+                 roi_padding: Optional[float] = None, roi_refresh_interval: int = 30,
+                 tracker_factory: Optional[Callable[[], SkeletonTracker]] = None,
+                 visualisation_interval: int = 1, visualisation_scale: float = 1.0, working_scale: float = 1.0):
         """
         Construct a 3D skeleton detector based on XNect.
 
         .. note::
-            The reason for requiring the directory containing the XNect executable is that the
-            XNect implementers hard-coded the paths (for some reason), so we need to change to
-            this directory before trying to initialise XNect.
-
-        :param exe_dir:     The directory containing the XNect executable.
-        """
-        # Make a note of the directory containing the XNect executable.
-        self.__exe_dir = exe_dir  # type: str
-
-        # Specify the index that XNect uses to refer to the mid-hip keypoint.
-        self.__midhip_keypoint_idx = 14  # type: int
-
-        # Specify the keypoint names (see xnect_implementation.h).
-        self.__keypoint_names = {
-            0: "Head Top",
-            1: "Neck",
-            2: "RShoulder",
-            3: "RElbow",
-            4: "RWrist",
-            5: "LShoulder",
-            6: "LElbow",
-            7: "LWrist",
-            8: "RHip",
-            9: "RKnee",
-            10: "RAnkle",
-            11: "LHip",
-            12: "LKnee",
-            13: "LAnkle",
-            14: "MidHip",  # XNect calls this "Root", but we use "MidHip" for consistency with other detectors
-            15: "Spine",
-            16: "Nose",    # XNect calls this "Head", but we use "Nose" for consistency with other detectors
-            17: "RHand",
-            18: "LHand",
-            19: "RFoot",
-            20: "LFoot"
-        }  # type: Dict[int, str]
-
-        # Specify which keypoints are joined to form bones.
-        self.__keypoint_pairs = [
-            (self.__keypoint_names[i], self.__keypoint_names[j]) for i, j in [
-                (0, 16), (1, 2), (1, 5), (1, 14), (1, 16), (2, 3), (3, 4), (4, 17), (5, 6), (6, 7), (7, 18),
-                (8, 9), (8, 14), (9, 10), (11, 12), (11, 14), (12, 13)
-            ]
-        ]  # type: List[Tuple[str, str]]
+            XNect's default config path is relative to the directory containing the XNect executable, which used
+            to force us to change the process's working directory before initialising it. Instead, we now pass
+            XNect an absolute config path, so that no change of working directory is needed (this makes it safe
+            to initialise several detectors in parallel). Any relative network paths in the params file that XNect
+            reads (FullBodyTracker/XNECT.params, e.g. a copy of config/XNECT-kinect.params) are taken to be relative
+            to the data directory, except that the stock ../../data/ prefix (which is relative to bin/Release) is
+            rebased onto the data directory: before XNect is constructed, they're made absolute in a private,
+            temporary copy of the params file.
+        .. note::
+            If inference can't keep up with the camera, XNect can be run on only some of the frames, either every
+            K frames (see inference_interval) or adaptively, so as to keep the average latency per frame within a
+            budget (see latency_budget). The skeletons for the other frames are extrapolated from the most recent
+            results (see SkeletonExtrapolator).
+        .. note::
+            To reduce the cost of running XNect, the images passed to it can be cropped to a region of interest
+            around the people detected in the previous frame (see roi_padding), and/or downscaled (see
+            working_scale). The results are mapped back to the full-resolution image (see ImagePreprocessor).
+            Note that the native XNect resizes every image it's given to the processing size in its params file
+            (which is read from the config directory), so its cost is fixed by that size: with it, an ROI is
+            resized to the processing size (which lets XNect see the people in more detail, rather than making
+            it cheaper), and working_scale must be 1.
+        .. note::
+            If a recorder is specified, XNect's outputs for every frame on which it's run are recorded (after being
+            mapped back to the full-resolution image), so that they can be replayed later via ReplayXNect. Each
+            restart of the detector starts a new sequence in the recording.
+        .. note::
+            If a depth scale corrector is specified, and a depth image is passed in along with the colour image,
+            the sizes and distances of the people that XNect detects are corrected using the depth image (see
+            DepthScaleCorrector), in camera space, before they're transformed into world space.
+        .. note::
+            If reuse_buffers is True, XNect's results and the detector's outputs (the arrays in each batch, and the
+            visualisation) are written into buffers that are kept from one frame to the next (and only reallocated
+            if the number of people rises), rather than into newly-allocated arrays, to avoid allocator churn (and
+            the resulting latency jitter) in long-running services. The outputs of each call are then only valid
+            until the next call, so clients that need to keep them must copy them. This mode is not thread-safe:
+            __convert_results reads the shared XNect results buffer (__frame_results) outside self.__lock, so a
+            second thread could overwrite it mid-read. Only one thread may use the detector at a time (e.g. wrap it
+            in an AsyncSkeletonDetector). The Skeleton3D objects made by detect_skeletons are still allocated afresh
+            each frame (and may refer to the buffers), so detect_skeleton_batch should be used with this mode.
+
+        :param backend_factory:         An optional function that can be used to construct the XNect backend to
+                                        use (if None, the native XNect class will be used). This makes it possible
+                                        to swap in another backend (e.g. SyntheticXNect) for benchmarking or testing.
+        :param data_dir:                The XNect data directory (the one containing FullBodyTracker, CNNModels,
+                                        etc.). This is only used if no backend factory is specified. If None, the
+                                        data directory will be derived from exe_dir (if specified), or will default
+                                        to D:/xnect/data.
+        :param depth_scale_corrector:   An optional corrector with which to correct the sizes and distances of the
+                                        detected people using the depth images (if any) that are passed in.
+        :param exe_dir:                 Deprecated: the directory containing the XNect executable (bin/Release), from
+                                        which the data directory (../../data) is derived. Use data_dir instead.
+        :param inference_interval:      The interval (in frames) at which to run XNect (on other frames, the
+                                        skeletons are extrapolated). Cannot be combined with a latency budget.
+        :param latency_budget:          An optional budget (in seconds) for the average latency per frame. If
+                                        specified, XNect is only run on as many frames as the budget allows.
+        :param people_mask_rasteriser:  An optional rasteriser with which to make people masks (see make_people_mask).
+                                        If None, a rasteriser with the default settings will be used.
+        :param recorder:                An optional recorder with which to record XNect's outputs.
+        :param reuse_buffers:           Whether to write the outputs into buffers that are reused from frame to frame
+                                        (if True, the detector is not thread-safe).
+        :param roi_padding:             An optional amount by which to pad the bounding box of the people detected in
+                                        the previous frame to make the region of interest to which to crop the next
+                                        image (as a fraction of the box's size). If None, images are not cropped.
+        :param roi_refresh_interval:    The interval (in frames) at which to process the full image when cropping.
+        :param tracker_factory:         An optional function that can be used to construct a tracker with which to
+                                        assign stable IDs to the detected people and smooth their joints (if None,
+                                        no tracking will be performed, and the person IDs will be XNect's slots).
+        :param visualisation_interval:  The interval (in frames) at which to make a new output visualisation (on
+                                        other frames, the most recent visualisation is returned again).
+        :param visualisation_scale:     The factor by which to scale the input image to make the visualisation.
+        :param working_scale:           The factor by which to downscale the (possibly cropped) images passed to XNect
+                                        (must be 1 when using the native XNect, which has a fixed processing size).
+        """
+        if inference_interval < 1:
+            raise ValueError("The inference interval must be at least 1")
+        if latency_budget is not None and inference_interval != 1:
+            raise ValueError("An inference interval and a latency budget cannot both be specified")
+
+        self.__backend_factory = backend_factory                # type: Optional[Callable[[], XNectBackend]]
+        self.__depth_scale_corrector = depth_scale_corrector    # type: Optional[DepthScaleCorrector]
+        self.__inference_interval = inference_interval          # type: int
+        self.__latency_budget = latency_budget                  # type: Optional[float]
+        self.__recorder = recorder                              # type: Optional[XNectRecorder]
+        self.__reuse_buffers = reuse_buffers                    # type: bool
+        self.__tracker_factory = tracker_factory                # type: Optional[Callable[[], SkeletonTracker]]
+        self.__visualisation_interval = visualisation_interval  # type: int
+        self.__visualisation_scale = visualisation_scale        # type: float
+
+        # Make a note of the absolute paths to the XNect data and config directories.
+        if exe_dir is not None:
+            if data_dir is not None:
+                raise ValueError("Only one of data_dir and exe_dir can be specified")
+            warnings.warn("exe_dir is deprecated, use data_dir instead", DeprecationWarning, stacklevel=2)
+            data_dir = os.path.join(exe_dir, "..", "..", "data")
+        elif data_dir is None:
+            data_dir = "D:/xnect/data"
+
+        self.__data_dir = os.path.normpath(os.path.abspath(data_dir))               # type: str
+        self.__config_dir = os.path.join(self.__data_dir, "FullBodyTracker", "")    # type: str
+
+        # Construct the monitor that will record the latencies of the various stages of the detection process.
+        self.__latency_monitor = LatencyMonitor()
+
+        # Since the XNect bindings release the GIL, make sure that only one thread can use XNect at a time.
+        self.__lock = threading.Lock()
+
+        # Construct the preprocessor that will crop and/or downscale the images before they're passed to XNect. If
+        # we're using the native XNect, tell it the size to which XNect will resize the images.
+        process_size = SkeletonDetector.__read_process_size(self.__config_dir) \
+            if backend_factory is None else None  # type: Optional[Tuple[int, int]]
+        self.__preprocessor = ImagePreprocessor(
+            process_size=process_size, roi_padding=roi_padding, roi_refresh_interval=roi_refresh_interval,
+            working_scale=working_scale
+        )
+
+        # Construct the rasteriser that will be used to make any people masks that are requested.
+        if people_mask_rasteriser is None:
+            people_mask_rasteriser = PeopleMaskRasteriser()
+        self.__people_mask_rasteriser = people_mask_rasteriser  # type: PeopleMaskRasteriser
+
+        # Construct the extrapolator that will produce the skeletons for any frames on which XNect isn't run.
+        self.__extrapolator = SkeletonExtrapolator()
+        self.__frames_since_inference = 0  # type: int
+        self.__inference_debt = 0.0        # type: float
 
         # Start XNect.
-        self.__xnect = None  # type: Optional[XNect]
+        self.__frame_idx = 0                        # type: int
+        self.__frame_results = None                 # type: Optional[FrameResults]
+        self.__intrinsics = (1.0, 1.0, 0.0, 0.0)    # type: Tuple[float, float, float, float]
+        self.__joint_count = 0                      # type: int
+        self.__joint_parents = ()                   # type: Tuple[int, ...]
+        self.__keypoint_names = ()                  # type: Tuple[str, ...]
+        self.__last_model_load_time = None          # type: Optional[float]
+        self.__last_state_reset_time = None         # type: Optional[float]
+        self.__output_buffers = ({}, {})            # type: Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]
+        self.__output_set_idx = 0                   # type: int
+        self.__person_colours = {}                  # type: Dict[int, np.ndarray]
+        self.__person_slots = np.zeros(0, dtype=int)  # type: np.ndarray
+        self.__root_joint_idx = 0                   # type: int
+        self.__tracker = None                       # type: Optional[SkeletonTracker]
+        self.__visualiser = None                    # type: Optional[SkeletonVisualiser]
+        self.__xnect = None                         # type: Optional[XNectBackend]
         self.restart()
 
     # PUBLIC METHODS
 
-    def detect_skeletons(self, image: np.ndarray, world_from_camera: np.ndarray, *, use_xnect_poses: bool = False,
-                         visualise: bool = False) -> Tuple[List[Skeleton3D], np.ndarray]:
+    def detect_skeleton_batch(self, image: np.ndarray, world_from_camera: np.ndarray, *,
+                              depth_image: Optional[np.ndarray] = None, timestamp: Optional[float] = None,
+                              use_xnect_poses: bool = False, visualise: bool = False) \
+            -> Tuple[SkeletonBatch, Optional[np.ndarray]]:
+        """
+        Detect 3D skeletons in an RGB image using XNect, and return them as an array-backed batch.
+
+        .. note::
+            This is cheaper than detect_skeletons, since Skeleton3D objects are only made if they're actually
+            requested from the batch.
+
+        :param image:               The RGB image (a uint8 array of shape HxWx3, which need not be contiguous).
+        :param world_from_camera:   The camera pose.
+        :param depth_image:         An optional depth image (in metres, registered with the RGB image) with which to
+                                    correct the detected skeletons (only used if a depth scale corrector was given).
+        :param timestamp:           An optional time (in seconds) at which the frame was captured, used to extrapolate
+                                    and smooth the skeletons over time (if None, the time at which the frame is
+                                    processed will be used instead, which is only suitable for live input).
+        :param use_xnect_poses:     Whether to use the joint poses produced by XNect.
+        :param visualise:           Whether to make the output visualisation.
+        :return:                    A tuple consisting of the batch of detected 3D skeletons and the output
+                                    visualisation (if requested, or None otherwise).
+        """
+        return self.__detect(
+            image, world_from_camera, depth_image=depth_image, make_skeletons=False, timestamp=timestamp,
+            use_xnect_poses=use_xnect_poses, visualise=visualise
+        )
+
+    def detect_skeletons(self, image: np.ndarray, world_from_camera: np.ndarray, *,
+                         depth_image: Optional[np.ndarray] = None, timestamp: Optional[float] = None,
+                         use_xnect_poses: bool = False, visualise: bool = False) \
+            -> Tuple[List[Skeleton3D], Optional[np.ndarray]]:
         """
         Detect 3D skeletons in an RGB image using XNect.
 
-        :param image:               The RGB image.
+        :param image:               The RGB image (a uint8 array of shape HxWx3, which need not be contiguous).
         :param world_from_camera:   The camera pose.
+        :param depth_image:         An optional depth image (in metres, registered with the RGB image) with which to
+                                    correct the detected skeletons (only used if a depth scale corrector was given).
+        :param timestamp:           An optional time (in seconds) at which the frame was captured, used to extrapolate
+                                    and smooth the skeletons over time (if None, the time at which the frame is
+                                    processed will be used instead, which is only suitable for live input).
         :param use_xnect_poses:     Whether to use the joint poses produced by XNect.
         :param visualise:           Whether to make the output visualisation.
         :return:                    A tuple consisting of the detected 3D skeletons and the output visualisation
-                                    (if requested).
-        """
-        # Use XNect to detect any people in the image.
-        # TODO: Figure out whether this copy is actually necessary.
-        self.__xnect.process_image(image.copy())
-
-        # Make the actual skeletons, and also the output visualisation if requested.
-        skeletons = []                # type: List[Skeleton3D]
-        visualisation = image.copy()  # type: np.ndarray
-
-        # For each person index:
-        for person_id in range(self.__xnect.get_num_of_people()):
-            # If a person was detected with this index:
-            if self.__xnect.is_person_active(person_id):
-                # Obtain the global pose of the person's mid-hip keypoint from XNect, and record it.
-                world_from_midhip = np.eye(4)  # type: np.ndarray
-                world_from_midhip[0:3, 0:3] = SkeletonDetector.__from_xnect_global_rotation(
-                    self.__xnect.get_skeleton_global_rotation(person_id)
-                )
-                world_from_midhip[0:3, 3] = SkeletonDetector.__from_xnect_position(
-                    self.__xnect.get_joint3d_ik(person_id, self.__midhip_keypoint_idx), world_from_camera
-                )
-                global_keypoint_poses = {"MidHip": world_from_midhip}  # type: Dict[str, np.ndarray]
-
-                # Construct the keypoints for the person's skeleton and obtain their local rotations from XNect.
-                skeleton_keypoints = {}        # type: Dict[str, Keypoint]
-                local_keypoint_rotations = {}  # type: Dict[str, np.ndarray]
-
-                # For each joint (ignoring the feet, as in the sample code, as they can be unstable):
-                for joint_id in range(self.__xnect.get_num_of_3d_joints() - 2):
-                    # Make a keypoint for the joint and add it to the dictionary.
-                    name = self.__keypoint_names[joint_id]
-                    position = SkeletonDetector.__from_xnect_position(
-                        self.__xnect.get_joint3d_ik(person_id, joint_id), world_from_camera
-                    )
-                    skeleton_keypoints[name] = Keypoint(name, position)
+                                    (if requested, or None otherwise).
+        """
+        batch, visualisation = self.__detect(
+            image, world_from_camera, depth_image=depth_image, make_skeletons=True, timestamp=timestamp,
+            use_xnect_poses=use_xnect_poses, visualise=visualise
+        )
+        return batch.get_skeletons(), visualisation
 
-                    # Obtain the local rotation of the joint from XNect and record it.
-                    local_keypoint_rotations[name] = SkeletonDetector.__from_xnect_local_rotation(
-                        self.__xnect.get_joint_local_rotation(person_id, joint_id)
-                    )
+    def get_latency_monitor(self) -> LatencyMonitor:
+        """
+        Get the monitor that records the latencies of the various stages of the skeleton detection process.
 
-                # Make the skeleton and add it to the list.
-                if use_xnect_poses:
-                    skeletons.append(Skeleton3D(
-                        skeleton_keypoints, self.__keypoint_pairs, global_keypoint_poses, local_keypoint_rotations
-                    ))
-                else:
-                    skeletons.append(Skeleton3D(skeleton_keypoints, self.__keypoint_pairs))
+        .. note::
+            The stages are "input_preparation", "process_image", "result_extraction", "recording" (only when a
+            recorder is in use), "coordinate_conversion", "tracking" (only when a tracker is in use),
+            "skeleton_construction" (only when detect_skeletons is used) and "visualisation", and the latency of
+            each frame as a whole is also recorded (as "total"). On frames on which XNect isn't run,
+            "input_preparation", "process_image", "result_extraction", "recording" and
+            "coordinate_conversion" are replaced by "extrapolation".
+
+        :return:    The monitor that records the latencies of the various stages of the skeleton detection process.
+        """
+        return self.__latency_monitor
+
+    def get_restart_timings(self) -> Dict[str, Optional[float]]:
+        """
+        Get a breakdown of how long the most recent (re)starts of the skeleton detector took.
+
+        .. note::
+            The "model_load" entry is the time (in seconds) taken the last time a new XNect instance had to be
+            constructed (which involves loading the network weights and config from disk). The "state_reset"
+            entry is the time (in seconds) taken the last time an existing XNect instance had its tracking state
+            reset instead. Either entry will be None if the corresponding operation has not yet happened.
+
+        :return:    A breakdown of how long the most recent (re)starts of the skeleton detector took.
+        """
+        with self.__lock:
+            return {"model_load": self.__last_model_load_time, "state_reset": self.__last_state_reset_time}
+
+    def make_people_mask(self, batch: SkeletonBatch, world_from_camera: np.ndarray,
+                         intrinsics: Tuple[float, float, float, float], image_shape: Tuple[int, int], *,
+                         depth_image: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Make a mask of the people in a batch of skeletons detected by the detector, on the CPU.
 
-                # Update the output visualisation if requested.
-                if visualise:
-                    self.__draw_bones(visualisation, person_id)
-                    self.__draw_joints(visualisation, person_id)
+        .. note::
+            This allows masks to be made without an OpenGL context (see PeopleMaskRasteriser). It doesn't touch
+            XNect, so it can safely be called whilst another thread is detecting skeletons.
 
-        return skeletons, visualisation
+        :param batch:               The batch of skeletons.
+        :param world_from_camera:   The camera pose.
+        :param intrinsics:          The camera intrinsics (fx, fy, cx, cy).
+        :param image_shape:         The shape of the image for which to make the mask, as (height, width).
+        :param depth_image:         An optional depth image (in metres) with which to gate the mask.
+        :return:                    The mask, as a uint8 array of the specified shape (255 = person, 0 = otherwise).
+        """
+        return self.__people_mask_rasteriser.make_mask(
+            batch, world_from_camera, intrinsics, image_shape, depth_image=depth_image
+        )
 
-    def restart(self) -> None:
+    def restart(self, *, force_reload: bool = False) -> None:
         """
         Start or restart the skeleton detector.
 
         .. note::
             It's important to call this when changing from one sequence of images to another, since XNect
             tries to achieve temporal consistency and maintains state as part of that.
+        .. note::
+            If XNect has already been initialised, this just resets its tracking state where possible, which is
+            much cheaper than re-constructing it from scratch.
+
+        :param force_reload:    Whether to re-construct XNect from scratch even if its tracking state could be reset.
         """
-        # Change to the XNect executable directory.
-        os.chdir(self.__exe_dir)
+        with self.__lock:
+            # If we're recording XNect's outputs, start a new sequence in the recording.
+            if self.__recorder is not None:
+                self.__recorder.start_sequence()
+
+            # If XNect has already been initialised, try to just reset its tracking state. If that succeeds, early out.
+            if self.__xnect is not None and not force_reload:
+                start = timer()
+                if self.__xnect.reset_tracking():
+                    self.__preprocessor.reset()
+                    self.__reset_frame_skipping()
+                    self.__frame_idx = 0
+                    self.__visualiser.reset()
+                    if self.__tracker is not None:
+                        self.__tracker.reset()
+                    self.__last_state_reset_time = timer() - start
+                    return
+
+            start = timer()
+
+            # Initialise XNect (loading the native library if necessary), or the specified alternative backend.
+            if self.__backend_factory is not None:
+                self.__xnect = self.__backend_factory()
+            else:
+                from smg.pyxnect import XNect
+
+                # XNect reads the network paths from its params file as is, so if any of them are relative,
+                # construct it from a config directory containing a copy of the params file in which they've been
+                # resolved against the data directory (XNect loads everything it needs up-front, so the copy can
+                # then be deleted).
+                resolved_config_dir = SkeletonDetector.__make_resolved_config_dir(
+                    self.__config_dir, self.__data_dir
+                )  # type: Optional[str]
+                try:
+                    self.__xnect = XNect(resolved_config_dir if resolved_config_dir is not None else self.__config_dir)
+                finally:
+                    if resolved_config_dir is not None:
+                        shutil.rmtree(os.path.dirname(os.path.normpath(resolved_config_dir)), ignore_errors=True)
+
+            # Look up the skeleton topology (this is fixed, so we only need to do it once per model load). Note that
+            # we ignore the feet, as in the sample code, as they can be unstable.
+            num_joints = self.__xnect.get_num_of_3d_joints()  # type: int
+            self.__joint_count = num_joints - 2
+            self.__joint_parents = tuple(self.__xnect.get_joint3d_parent(joint_id) for joint_id in range(num_joints))
+            self.__keypoint_names = SkeletonDetector.__KEYPOINT_NAMES[:self.__joint_count]
+            self.__root_joint_idx = self.__joint_parents.index(-1)
+
+            # Make the buffers into which XNect will write its results (if we're reusing buffers), and the array of
+            # person slot indices from which the IDs of the detected people are gathered.
+            num_people = self.__xnect.get_num_of_people()  # type: int
+            self.__frame_results = XNectBackend.make_frame_results(num_people, num_joints) \
+                if self.__reuse_buffers else None
+            self.__person_slots = np.arange(num_people)
+
+            # Recover the camera intrinsics that XNect uses by projecting a couple of points.
+            cx, cy = self.__xnect.project_with_intrinsics(np.array([0.0, 0.0, 1000.0]))
+            u, v = self.__xnect.project_with_intrinsics(np.array([1000.0, 1000.0, 1000.0]))
+            self.__intrinsics = (float(u - cx), float(v - cy), float(cx), float(cy))
+
+            # If we're recording XNect's outputs, record the fixed properties of the backend.
+            if self.__recorder is not None:
+                self.__recorder.set_backend_info(
+                    intrinsics=self.__intrinsics, joint_parents=self.__joint_parents,
+                    person_colours=np.array([self.__xnect.get_person_colour(p) for p in range(num_people)])
+                )
 
-        # Initialise XNect.
-        self.__xnect = XNect()
+            # Make the tracker (if any) and the visualiser, and clear the cache of person colours and the frame index.
+            self.__tracker = self.__tracker_factory() if self.__tracker_factory is not None else None
+            self.__preprocessor.reset()
+            self.__reset_frame_skipping()
+            self.__frame_idx = 0
+            self.__person_colours.clear()
+            self.__visualiser = SkeletonVisualiser(
+                self.__joint_parents, interval=self.__visualisation_interval, reuse_buffer=self.__reuse_buffers,
+                scale=self.__visualisation_scale
+            )
+
+            self.__last_model_load_time = timer() - start
 
     # PRIVATE METHODS
 
-    def __draw_bones(self, image: np.ndarray, person_id: int) -> None:
+    def __detect(self, image: np.ndarray, world_from_camera: np.ndarray, *, depth_image: Optional[np.ndarray],
+                 make_skeletons: bool, timestamp: Optional[float], use_xnect_poses: bool, visualise: bool) \
+            -> Tuple[SkeletonBatch, Optional[np.ndarray]]:
         """
-        Draw the bones for the specified person onto an image the shape of the input image.
+        Detect 3D skeletons in an RGB image using XNect.
 
-        :param image:       The image onto which to draw the bones (must have the same shape as the input image).
-        :param person_id:   The index of the person whose bones are to be drawn.
+        :param image:               The RGB image (a uint8 array of shape HxWx3, which need not be contiguous).
+        :param world_from_camera:   The camera pose.
+        :param depth_image:         An optional depth image with which to correct the detected skeletons.
+        :param make_skeletons:      Whether to make the Skeleton3D objects for the batch up-front (this is done
+                                    here rather than by the caller so that it shows up in the latency statistics).
+        :param timestamp:           An optional time at which the frame was captured (if None, the current time).
+        :param use_xnect_poses:     Whether to use the joint poses produced by XNect.
+        :param visualise:           Whether to make the output visualisation.
+        :return:                    A tuple consisting of the batch of detected 3D skeletons and the output
+                                    visualisation (if requested, or None otherwise).
         """
-        # For each joint (ignoring the feet, as in the sample code, as they can be unstable):
-        for joint_id in range(self.__xnect.get_num_of_3d_joints() - 2):
-            # Try to look up the joint's parent. If it doesn't have one, continue.
-            parent_id = self.__xnect.get_joint3d_parent(joint_id)  # type: int
-            if parent_id == -1:
-                continue
-
-            # Compute the 2D positions of the bone's two endpoints.
-            endpoint_a = self.__get_joint_pos_2d(person_id, joint_id)   # type: Tuple[int, int]
-            endpoint_b = self.__get_joint_pos_2d(person_id, parent_id)  # type: Tuple[int, int]
+        stage_latencies = {}  # type: Dict[str, float]
+        frame_start = stage_start = timer()  # type: float
+        if timestamp is None:
+            timestamp = frame_start
+
+        with self.__lock:
+            frame_idx = self.__frame_idx  # type: int
+            self.__frame_idx += 1
+            run_xnect = self.__should_run_xnect(use_xnect_poses)  # type: bool
+
+            if run_xnect:
+                # Crop and/or downscale the image if requested, and make sure that the result is C-contiguous, so
+                # that XNect can use it in place. If the image is already contiguous and no cropping or downscaling
+                # is needed, this is a no-op (the binding would make it contiguous anyway, but doing it here means
+                # that any time spent on it shows up in the latency statistics).
+                xnect_image = self.__preprocessor.preprocess(image)  # type: np.ndarray
+                stage_start = SkeletonDetector.__end_stage("input_preparation", stage_start, stage_latencies)
+
+                # Use XNect to detect any people in the image (the GIL is released whilst it does so).
+                self.__xnect.process_image(xnect_image)
+                stage_start = SkeletonDetector.__end_stage("process_image", stage_start, stage_latencies)
+
+                # Get all of XNect's results for the frame in one go (writing them into the reused buffers, if any).
+                active, xnect_positions, xnect_local_rotations, xnect_global_rotations, joints_2d = \
+                    self.__xnect.get_frame_results(out=self.__frame_results)
+                stage_start = SkeletonDetector.__end_stage("result_extraction", stage_start, stage_latencies)
+
+                # Map the results back to the full-resolution image (if necessary), and choose the next ROI.
+                xnect_joints_2d = joints_2d  # type: np.ndarray
+                xnect_positions, joints_2d = self.__preprocessor.map_to_full_frame(
+                    active, xnect_positions, xnect_joints_2d, self.__intrinsics, self.__root_joint_idx
+                )
+                self.__preprocessor.update(active, joints_2d)
 
-            # Draw the bone.
-            colour = self.__get_person_colour(person_id)  # type: List[int]
-            cv2.line(image, endpoint_a, endpoint_b, colour, 4)
+                # If we're recording XNect's outputs, record them for this frame.
+                if self.__recorder is not None:
+                    self.__record_frame(
+                        image, world_from_camera, timestamp, active, xnect_positions, xnect_local_rotations,
+                        xnect_global_rotations, xnect_joints_2d, joints_2d
+                    )
+                    stage_start = SkeletonDetector.__end_stage("recording", stage_start, stage_latencies)
+
+        if run_xnect:
+            # Gather the results for the detected people, and convert them into our coordinate system (correcting
+            # them using the depth image if possible).
+            # noinspection PyUnboundLocalVariable
+            person_ids, positions, global_rotations, local_rotations, joints_2d = self.__convert_results(
+                active, xnect_positions, xnect_global_rotations, xnect_local_rotations, joints_2d, world_from_camera,
+                depth_image=depth_image, image_shape=image.shape[:2], use_xnect_poses=use_xnect_poses
+            )
+            people_count = len(person_ids)  # type: int
+
+            # Pass the results to the extrapolator, so that it can extrapolate them to any frames that get skipped.
+            self.__extrapolator.update(
+                timestamp, world_from_camera, person_ids, positions, joints_2d, global_rotations, local_rotations
+            )
+
+            stage_start = SkeletonDetector.__end_stage("coordinate_conversion", stage_start, stage_latencies)
+        else:
+            # Extrapolate the skeletons from the most recent frame on which XNect was run.
+            person_ids, positions, global_rotations, local_rotations, joints_2d = self.__extrapolator.extrapolate(
+                timestamp, world_from_camera
+            )
+            people_count = len(person_ids)
+            if not use_xnect_poses:
+                global_rotations = local_rotations = None
+
+            stage_start = SkeletonDetector.__end_stage("extrapolation", stage_start, stage_latencies)
+
+        # Package the results up into a batch, and make the actual skeletons from it if requested.
+        batch_active = self.__make_output_array("active", (people_count,), bool)  # type: np.ndarray
+        batch_active.fill(True)
+        batch = SkeletonBatch(
+            frame_idx, person_ids, batch_active, positions, self.__keypoint_names,
+            SkeletonDetector.__KEYPOINT_PAIRS, global_rotations=global_rotations, local_rotations=local_rotations
+        )  # type: SkeletonBatch
+
+        # If we're tracking people, update the tracks, and use them in place of the raw detections.
+        if self.__tracker is not None:
+            batch = self.__tracker.update(batch, timestamp)
+            stage_start = SkeletonDetector.__end_stage("tracking", stage_start, stage_latencies)
+
+        if make_skeletons:
+            batch.get_skeletons()
+            stage_start = SkeletonDetector.__end_stage("skeleton_construction", stage_start, stage_latencies)
+
+        # Make the output visualisation if requested.
+        visualisation = None  # type: Optional[np.ndarray]
+        if visualise:
+            visualisation = self.__visualiser.visualise(image, joints_2d, self.__get_person_colours(person_ids))
+
+        SkeletonDetector.__end_stage("visualisation", stage_start, stage_latencies)
+
+        # Record the latencies of the various stages, and of the frame as a whole.
+        stage_latencies["total"] = timer() - frame_start
+        self.__latency_monitor.record_frame(stage_latencies)
+
+        # If we're working to a latency budget and XNect was run on this frame, charge its cost against the budget.
+        if run_xnect and self.__latency_budget is not None:
+            with self.__lock:
+                self.__inference_debt += stage_latencies["total"]
+
+        return batch, visualisation
+
+    def __convert_results(self, active: np.ndarray, xnect_positions: np.ndarray, xnect_global_rotations: np.ndarray,
+                          xnect_local_rotations: np.ndarray, xnect_joints_2d: np.ndarray,
+                          world_from_camera: np.ndarray, *, depth_image: Optional[np.ndarray],
+                          image_shape: Tuple[int, int], use_xnect_poses: bool) \
+            -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray], Optional[np.ndarray], np.ndarray]:
+        """
+        Gather XNect's results for the people detected in the current frame, and convert them into our coordinate
+        system (in the case of the joint positions, into world space).
 
-    def __draw_joints(self, image: np.ndarray, person_id: int) -> None:
+        .. note::
+            The results for all of the people are converted in one go, and every step writes into an array made
+            by __make_output_array, so if buffers are being reused, no new arrays need to be allocated.
+
+        :param active:                  XNect's P-element person activity mask.
+        :param xnect_positions:         XNect's P*J*3 array of IK joint positions.
+        :param xnect_global_rotations:  XNect's P*3*3 array of global skeleton rotations.
+        :param xnect_local_rotations:   XNect's P*J*3*3 array of local joint rotations.
+        :param xnect_joints_2d:         XNect's P*J*2 array of projected 2D joint positions.
+        :param world_from_camera:       The camera pose.
+        :param depth_image:             An optional depth image with which to correct the people's joint positions.
+        :param image_shape:             The shape of the RGB image, as (height, width).
+        :param use_xnect_poses:         Whether to convert the joint poses produced by XNect.
+        :return:                        A tuple consisting of the IDs (XNect slots) of the detected people, their
+                                        world-space joint positions, their global rotations and local joint rotations
+                                        (if requested, or None otherwise), and their projected 2D joint positions.
+        """
+        joint_count = self.__joint_count                    # type: int
+        people_count = int(np.count_nonzero(active))        # type: int
+        position_shape = (people_count, joint_count, 3)     # type: Tuple[int, int, int]
+
+        # Switch to the other set of output buffers. Alternating between two sets means that the results for the
+        # previous frame on which XNect was run (which the extrapolator still needs) are never overwritten.
+        self.__output_set_idx = 1 - self.__output_set_idx
+
+        person_ids = np.compress(
+            active, self.__person_slots, out=self.__make_output_array("person_ids", (people_count,), int)
+        )  # type: np.ndarray
+
+        joints_2d = np.compress(
+            active, xnect_joints_2d[:, :joint_count], axis=0,
+            out=self.__make_output_array("joints_2d", (people_count, joint_count, 2))
+        )  # type: np.ndarray
+
+        # Convert the joint positions of all of the detected people into our camera space in one go.
+        camera_positions = np.compress(
+            active, xnect_positions[:, :joint_count], axis=0,
+            out=self.__make_output_array("camera_positions", position_shape)
+        ).reshape(-1, 3)  # type: np.ndarray
+        SkeletonDetector.__from_xnect_positions(camera_positions, out=camera_positions)
+
+        # If possible, correct the sizes and distances of the people using the depth image, and then transform
+        # their joint positions into world space.
+        if depth_image is not None and self.__depth_scale_corrector is not None:
+            self.__depth_scale_corrector.correct(
+                camera_positions.reshape(position_shape), joints_2d, depth_image, image_shape, self.__root_joint_idx
+            )
+
+        positions = self.__make_output_array("positions", position_shape)  # type: np.ndarray
+        SkeletonDetector.__camera_to_world(camera_positions, world_from_camera, out=positions.reshape(-1, 3))
+
+        # If we're using the joint poses produced by XNect, also convert all of the rotations in one go.
+        global_rotations = None  # type: Optional[np.ndarray]
+        local_rotations = None   # type: Optional[np.ndarray]
+        if use_xnect_poses:
+            global_rotations = SkeletonDetector.__from_xnect_global_rotations(
+                np.compress(
+                    active, xnect_global_rotations, axis=0,
+                    out=self.__make_output_array("xnect_global_rotations", (people_count, 3, 3))
+                ),
+                out=self.__make_output_array("global_rotations", (people_count, 3, 3))
+            )
+            local_rotations = np.compress(
+                active, xnect_local_rotations[:, :joint_count], axis=0,
+                out=self.__make_output_array("local_rotations", (people_count, joint_count, 3, 3))
+            )
+            SkeletonDetector.__from_xnect_local_rotations(local_rotations, out=local_rotations)
+
+        return person_ids, positions, global_rotations, local_rotations, joints_2d
+
+    def __get_person_colours(self, person_ids: np.ndarray) -> np.ndarray:
         """
-        Draw the joints for the specified person onto an image the shape of the input image.
+        Get the colours assigned to the specified people.
 
-        :param image:       The image onto which to draw the joints (must have the same shape as the input image).
-        :param person_id:   The index of the person whose joints are to be drawn.
+        .. note::
+            XNect assigns colours to person slots rather than to people per se, so the colours are cached.
+
+        :param person_ids:  The indices of the people whose assigned colours we want to get.
+        :return:            The colours assigned to the people, as a P*3 array.
         """
-        # Specify the parameters to pass to cv2.circle when drawing the joints.
-        radius = 6      # type: int
-        thickness = -1  # type: int
+        colours = np.zeros((len(person_ids), 3), dtype=int)  # type: np.ndarray
+        for i, person_id in enumerate(person_ids):
+            colour = self.__person_colours.get(person_id)  # type: Optional[np.ndarray]
+            if colour is None:
+                colour = self.__person_colours[person_id] = self.__xnect.get_person_colour(int(person_id))
+            colours[i] = colour
 
-        # For each joint (ignoring the feet, as in the sample code, as they can be unstable):
-        for joint_id in range(self.__xnect.get_num_of_3d_joints() - 2):
-            # Compute the 2D position of the joint.
-            pos = self.__get_joint_pos_2d(person_id, joint_id)  # type: Tuple[int, int]
+        return colours
 
-            # Draw the joint.
-            colour = self.__get_person_colour(person_id)  # type: List[int]
-            cv2.circle(image, pos, radius, colour, thickness)
+    def __make_output_array(self, name: str, shape: Tuple[int, ...], dtype: type = float) -> np.ndarray:
+        """
+        Make an array into which to write one of the outputs for the current frame.
 
-    def __get_joint_pos_2d(self, person_id: int, joint_id: int) -> Tuple[int, int]:
+        .. note::
+            If buffers are being reused, this returns a view onto the first shape[0] rows of the specified buffer
+            in the current set, which is only reallocated if it has too few rows (e.g. because the number of people
+            has risen) or the wrong shape. Otherwise, it just returns a new array.
+
+        :param name:    The name of the output.
+        :param shape:   The shape of the array.
+        :param dtype:   The type of the elements of the array.
+        :return:        The array (its contents are undefined).
         """
-        Get the position of the specified joint for the specified detected person.
+        if not self.__reuse_buffers:
+            return np.empty(shape, dtype=dtype)
+
+        buffers = self.__output_buffers[self.__output_set_idx]  # type: Dict[str, np.ndarray]
+        buffer = buffers.get(name)  # type: Optional[np.ndarray]
+        if buffer is None or len(buffer) < shape[0] or buffer.shape[1:] != shape[1:] or buffer.dtype != dtype:
+            buffer = buffers[name] = np.empty(shape, dtype=dtype)
+
+        return buffer[:shape[0]]
 
-        :param person_id:   The index of the person.
-        :param joint_id:    The index of the joint.
-        :return:            The position of the specified joint for the specified detected person.
+    def __record_frame(self, image: np.ndarray, world_from_camera: np.ndarray, timestamp: float, active: np.ndarray,
+                       positions: np.ndarray, local_rotations: np.ndarray, global_rotations: np.ndarray,
+                       xnect_joints_2d: np.ndarray, joints_2d: np.ndarray) -> None:
         """
-        pos3d = self.__xnect.get_joint3d_ik(person_id, joint_id)  # type: np.ndarray
-        pos2d = self.__xnect.project_with_intrinsics(pos3d)       # type: np.ndarray
-        return tuple(np.round(pos2d).astype(int))
+        Record XNect's outputs for the current frame.
 
-    def __get_person_colour(self, person_id: int) -> List[int]:
+        .. note::
+            This must be called with the lock held, just after XNect has processed the frame. The joint positions
+            predicted by the network aren't returned by get_frame_results, so they're fetched one joint at a time
+            (only for the active people), and are then mapped back to the full-resolution image in the same way as
+            the IK positions.
+
+        :param image:               The full-resolution RGB image.
+        :param world_from_camera:   The camera pose.
+        :param timestamp:           The time (in seconds) at which the frame was captured (or processed, if unknown).
+        :param active:              XNect's P-element person activity mask.
+        :param positions:           The P*J*3 array of IK joint positions (mapped back to the full image).
+        :param local_rotations:     XNect's P*J*3*3 array of local joint rotations.
+        :param global_rotations:    XNect's P*3*3 array of global skeleton rotations.
+        :param xnect_joints_2d:     XNect's P*J*2 array of projected 2D joint positions (in the preprocessed image).
+        :param joints_2d:           The P*J*2 array of projected 2D joint positions (mapped back to the full image).
         """
-        Get the colour assigned to the specified person.
+        pred_positions = np.zeros_like(positions)  # type: np.ndarray
+        for p in np.flatnonzero(active):
+            for joint in range(positions.shape[1]):
+                pred_positions[p, joint] = self.__xnect.get_joint3d_pred(int(p), joint)
+
+        pred_positions, _ = self.__preprocessor.map_to_full_frame(
+            active, pred_positions, xnect_joints_2d, self.__intrinsics, self.__root_joint_idx
+        )
+
+        self.__recorder.record_frame(
+            active=active, global_rotations=global_rotations, ik_positions=positions, image_size=image.shape[:2],
+            joints_2d=joints_2d, local_rotations=local_rotations, pred_positions=pred_positions,
+            timestamp=timestamp, world_from_camera=world_from_camera
+        )
+
+    def __reset_frame_skipping(self) -> None:
+        """Reset the state used to choose which frames to run XNect on, and to extrapolate skeletons for the rest."""
+        self.__extrapolator.reset()
+        self.__frames_since_inference = 0
+        self.__inference_debt = 0.0
+
+    def __should_run_xnect(self, use_xnect_poses: bool) -> bool:
+        """
+        Decide whether or not to run XNect on the current frame.
 
         .. note::
-            This gets the person's colour from XNect, and converts it into a representation that can be used by OpenCV.
+            When working to a latency budget, each frame earns the budget, and each frame on which XNect is run
+            is charged its actual latency. XNect is run whenever the balance allows it, so that on average, the
+            latency per frame stays within the budget. The credit that can be built up is capped at a single
+            frame's budget, so that a run of cheap frames can't be followed by a long stretch of running XNect
+            on every frame once it gets more expensive.
+        .. note::
+            XNect must always be run if the skeletons can't be extrapolated (e.g. there are no results yet).
 
-        :param person_id:   The person whose assigned colour we want to get.
-        :return:            The colour assigned to the person, as a list of integers.
+        :param use_xnect_poses: Whether we need the joint poses produced by XNect.
+        :return:                True, if XNect should be run on the current frame, or False otherwise.
         """
-        return [int(_) for _ in self.__xnect.get_person_colour(person_id)]
+        self.__frames_since_inference += 1
+
+        if self.__latency_budget is not None:
+            self.__inference_debt = max(self.__inference_debt - self.__latency_budget, -self.__latency_budget)
+            due = self.__inference_debt <= 0.0  # type: bool
+        else:
+            due = self.__frames_since_inference >= self.__inference_interval
+
+        if due or not self.__extrapolator.can_extrapolate(use_xnect_poses):
+            self.__frames_since_inference = 0
+            return True
+        else:
+            return False
 
     # PRIVATE STATIC METHODS
 
     @staticmethod
-    def __from_xnect_global_rotation(rot: np.ndarray) -> np.ndarray:
+    def __camera_to_world(points: np.ndarray, world_from_camera: np.ndarray, *,
+                          out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Transform a set of points from camera space to world space.
+
+        :param points:              The points in camera space, as an N*3 array.
+        :param world_from_camera:   The camera pose, as a transformation from camera space to world space.
+        :param out:                 An optional N*3 array into which to write the result (must not alias points).
+        :return:                    The points in world space, as an N*3 array.
+        """
+        out = np.matmul(points, world_from_camera[0:3, 0:3].T, out=out)
+        out += world_from_camera[0:3, 3]
+        return out
+
+    @staticmethod
+    def __end_stage(stage_name: str, stage_start: float, stage_latencies: Dict[str, float]) -> float:
+        """
+        Record the latency of a stage of the skeleton detection process that has just ended.
+
+        :param stage_name:      The name of the stage.
+        :param stage_start:     The time at which the stage started.
+        :param stage_latencies: The dictionary in which to record the latency of the stage.
+        :return:                The time at which the stage ended (and thus at which the next stage starts).
+        """
+        stage_end = timer()  # type: float
+        stage_latencies[stage_name] = stage_end - stage_start
+        return stage_end
+
+    @staticmethod
+    def __from_xnect_global_rotations(rots: np.ndarray, *, out: Optional[np.ndarray] = None) -> np.ndarray:
         """
-        Transform the global skeleton rotation from the XNect coordinate system to our one.
+        Transform a set of global skeleton rotations from the XNect coordinate system to our one.
 
         .. note::
             This was derived a bit empirically to be honest, but it seems to work.
+        .. note::
+            The rotations are inverted by transposing them, which is exact for rotation matrices and much
+            cheaper than a general matrix inversion.
 
-        :param rot: The global skeleton rotation in the XNect coordinate system.
-        :return:    The equivalent rotation in our coordinate system.
+        :param rots:    The global skeleton rotations in the XNect coordinate system, as an N*3*3 array.
+        :param out:     An optional N*3*3 array into which to write the result (must not alias rots).
+        :return:        The equivalent rotations in our coordinate system, as an N*3*3 array.
         """
-        return np.linalg.inv(rot) @ np.array([
-            [1, 0, 0],
-            [0, -1, 0],
-            [0, 0, -1]
-        ])
+        return np.multiply(np.transpose(rots, (0, 2, 1)), SkeletonDetector.__GLOBAL_ROTATION_FLIP, out=out)
 
     @staticmethod
-    def __from_xnect_local_rotation(rot: np.ndarray) -> np.ndarray:
+    def __from_xnect_local_rotations(rots: np.ndarray, *, out: Optional[np.ndarray] = None) -> np.ndarray:
         """
-        Transform a local keypoint rotation from the XNect coordinate system to our one.
+        Transform a set of local keypoint rotations from the XNect coordinate system to our one.
 
         .. note::
-            This was derived a bit empirically to be honest, but it seems to work.
+            This was derived a bit empirically to be honest, but it seems to work. It negates the x and z
+            components of the axis-angle form of each rotation, which is equivalent to conjugating the
+            rotation matrix by diag(-1, 1, -1), so there's no need to go via axis-angle form at all. In turn,
+            conjugating by a diagonal sign matrix just flips the signs of some of the elements, so it can be
+            done element-wise (and in place).
+
+        :param rots:    The local keypoint rotations in the XNect coordinate system, as an ...*3*3 array.
+        :param out:     An optional array of the same shape into which to write the result (may be rots itself).
+        :return:        The equivalent rotations in our coordinate system, as an ...*3*3 array.
+        """
+        return np.multiply(rots, SkeletonDetector.__LOCAL_ROTATION_MIRROR, out=out)
+
+    @staticmethod
+    def __from_xnect_positions(positions: np.ndarray, *, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Transform a set of positions from the XNect coordinate system to our camera space.
+
+        .. note::
+            This was derived a bit empirically to be honest, but it seems to work. It converts from millimetres
+            to metres, and flips the x and y axes.
 
-        :param rot: The local keypoint rotation in the XNect coordinate system.
-        :return:    The equivalent rotation in our coordinate system.
+        :param positions:   The positions in the XNect coordinate system, as an N*3 array.
+        :param out:         An optional N*3 array into which to write the result (may be positions itself).
+        :return:            The equivalent positions in our camera space, as an N*3 array.
         """
-        result = Rotation.from_matrix(rot).as_rotvec()  # type: np.ndarray
-        result[0] *= -1
-        result[2] *= -1
-        return Rotation.from_rotvec(result).as_matrix()
+        return np.multiply(positions, SkeletonDetector.__POSITION_SCALE, out=out)
 
     @staticmethod
-    def __from_xnect_position(pos: np.ndarray, world_from_camera: np.ndarray) -> np.ndarray:
+    def __link_or_copy(source: str, target: str) -> None:
         """
-        Transform a position from the XNect coordinate system to our one.
+        Make a symbolic link to a file or directory, falling back to copying it if links can't be made (e.g. on
+        Windows without the necessary privileges).
+
+        :param source:  The path to the file or directory.
+        :param target:  The path at which to make the link or copy.
+        """
+        try:
+            os.symlink(source, target, target_is_directory=os.path.isdir(source))
+        except (NotImplementedError, OSError):
+            if os.path.isdir(source):
+                shutil.copytree(source, target)
+            else:
+                shutil.copy2(source, target)
+
+    @staticmethod
+    def __make_resolved_config_dir(config_dir: str, data_dir: str) -> Optional[str]:
+        """
+        If any of the network paths in the params file that XNect reads from a config directory are relative, make
+        a temporary config directory containing a copy of the params file in which they've been resolved against
+        the data directory.
 
         .. note::
-            This was derived a bit empirically to be honest, but it seems to work.
+            The other entries in the config directory are linked into the temporary directory (or copied, if they
+            can't be linked), so that XNect can still find them. The temporary directory is made inside a new
+            temporary directory, which the caller is responsible for deleting.
+
+        :param config_dir:  The XNect config directory.
+        :param data_dir:    The XNect data directory.
+        :return:            The path to the temporary config directory (ending with a separator), or None if none
+                            of the network paths needed to be resolved.
+        :raises RuntimeError:  If any of the network files don't exist.
+        """
+        params_filename = os.path.join(config_dir, SkeletonDetector.__PARAMS_FILENAME)  # type: str
+        if not os.path.isfile(params_filename):
+            raise RuntimeError("Could not find the XNect params file '{}'".format(params_filename))
+
+        def resolve_line(line: str) -> str:
+            match = SkeletonDetector.__NETWORK_PATH_LINE.match(line)
+            if match is None:
+                return line
+
+            # Resolve the network path against the data directory (rebasing the stock prefix if necessary), and
+            # check that it exists, since otherwise XNect would only fail deep inside Caffe.
+            path = match.group("path").replace("\\", "/")  # type: str
+            if path.startswith(SkeletonDetector.__LEGACY_NETWORK_PATH_PREFIX):
+                path = path[len(SkeletonDetector.__LEGACY_NETWORK_PATH_PREFIX):]
+            path = os.path.normpath(os.path.join(data_dir, path))
+            if not os.path.isfile(path):
+                raise RuntimeError("The XNect network file '{}' (specified as '{}' in '{}') does not exist".format(
+                    path, match.group("path"), params_filename
+                ))
+
+            return match.group("key") + path.replace("\\", "/") + "\n"
+
+        with open(params_filename) as f:
+            lines = f.readlines()  # type: List[str]
+        resolved_lines = [resolve_line(line) for line in lines]  # type: List[str]
+        if resolved_lines == lines:
+            return None
+
+        # Make the temporary config directory, write the resolved params file into it, and link in everything else.
+        resolved_config_dir = os.path.join(tempfile.mkdtemp(prefix="xnect-config-"), "FullBodyTracker")  # type: str
+        os.mkdir(resolved_config_dir)
+        with open(os.path.join(resolved_config_dir, SkeletonDetector.__PARAMS_FILENAME), "w") as f:
+            f.writelines(resolved_lines)
+
+        for name in os.listdir(config_dir):
+            if name != SkeletonDetector.__PARAMS_FILENAME:
+                SkeletonDetector.__link_or_copy(os.path.join(config_dir, name), os.path.join(resolved_config_dir, name))
+
+        return os.path.join(resolved_config_dir, "")
 
-        :param pos:                 The position in the XNect coordinate system.
-        :param world_from_camera:   The camera pose, as a transformation from camera space to world space.
-        :return:                    The equivalent position in our coordinate system.
+    @staticmethod
+    def __read_process_size(config_dir: str) -> Optional[Tuple[int, int]]:
+        """
+        Try to read the size to which XNect resizes the images it's given from the params file that it reads from
+        its config directory.
+
+        :param config_dir:  The XNect config directory.
+        :return:            The processing size, as (width, height), or None if it couldn't be found.
         """
-        result = pos / 1000  # type: np.ndarray
-        result[0] *= -1
-        result[1] *= -1
-        return GeometryUtil.apply_rigid_transform(world_from_camera, result)
+        params_filename = os.path.join(config_dir, SkeletonDetector.__PARAMS_FILENAME)  # type: str
+        if not os.path.isfile(params_filename):
+            return None
+
+        values = {}  # type: Dict[str, int]
+        with open(params_filename) as f:
+            for line in f:
+                match = SkeletonDetector.__PROCESS_SIZE_LINE.match(line)
+                if match is not None:
+                    values[match.group("key")] = int(match.group("value"))
+
+        if "ProcessWidth" in values and "ProcessHeight" in values:
+            return values["ProcessWidth"], values["ProcessHeight"]
+
+        return None
+
+        for filename in sorted(os.listdir(config_dir)):
+            if filename.endswith(".params"):
+                values = {}  # type: Dict[str, int]
+                with open(os.path.join(config_dir, filename)) as f:
+                    for line in f:
+                        match = SkeletonDetector.__PROCESS_SIZE_LINE.match(line)
+                        if match is not None:
+                            values[match.group("key")] = int(match.group("value"))
+
+                if "ProcessWidth" in values and "ProcessHeight" in values:
+                    return values["ProcessWidth"], values["ProcessHeight"]
+
+        return None
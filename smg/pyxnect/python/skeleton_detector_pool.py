@@ -0,0 +1,111 @@
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Optional
+
+from .skeleton_detector import SkeletonDetector
+
+
+class SkeletonDetectorPool:
+    """
+    A pool of warm XNect-based 3D skeleton detectors that can be shared between several client streams.
+
+    .. note::
+        XNect maintains per-sequence state to achieve temporal consistency, so each client stream is pinned to a
+        single detector from the moment it acquires one until the moment it releases it. When a detector is
+        released, it is restarted (to clear its state) and returned to the pool for use by another stream.
+    """
+
+    # CONSTRUCTOR
+
+    def __init__(self, size: int, *, detector_factory: Callable[[], SkeletonDetector] = SkeletonDetector):
+        """
+        Construct a pool of 3D skeleton detectors.
+
+        :param size:                The number of detectors in the pool.
+        :param detector_factory:    A function that can be used to construct each detector.
+        """
+        if size < 1:
+            raise ValueError("A skeleton detector pool must contain at least one detector")
+
+        # Construct the detectors up-front (and in parallel, since doing so doesn't touch any process-wide state),
+        # so that they're warm by the time any clients need them.
+        with ThreadPoolExecutor(max_workers=size) as executor:
+            self.__detectors = list(executor.map(
+                lambda _: detector_factory(), range(size)
+            ))  # type: List[SkeletonDetector]
+
+        self.__assigned_detectors = {}                  # type: Dict[Hashable, SkeletonDetector]
+        self.__free_detectors = list(self.__detectors)  # type: List[SkeletonDetector]
+
+        self.__lock = threading.Lock()
+        self.__detector_freed = threading.Condition(self.__lock)
+
+    # PUBLIC METHODS
+
+    def acquire(self, client_id: Hashable, *, timeout: Optional[float] = None) -> SkeletonDetector:
+        """
+        Get the detector that is assigned to the specified client, assigning it a free one if necessary.
+
+        .. note::
+            If no detector is currently free, this will block until one is released (or the timeout expires).
+
+        :param client_id:   The ID of the client.
+        :param timeout:     The maximum time (in seconds) to wait for a detector to become free (None = forever).
+        :return:            The detector that is assigned to the client.
+        :raises TimeoutError: If no detector became free before the timeout expired.
+        """
+        with self.__lock:
+            # If the client already has a detector assigned to it, return that.
+            detector = self.__assigned_detectors.get(client_id)  # type: Optional[SkeletonDetector]
+            if detector is not None:
+                return detector
+
+            # Otherwise, wait for a detector to become free, and then assign it to the client.
+            if not self.__detector_freed.wait_for(lambda: len(self.__free_detectors) > 0, timeout):
+                raise TimeoutError("Timed out waiting for a free skeleton detector")
+
+            detector = self.__free_detectors.pop()
+            self.__assigned_detectors[client_id] = detector
+            return detector
+
+    def get_free_detector_count(self) -> int:
+        """
+        Get the number of detectors in the pool that are not currently assigned to any client.
+
+        :return:    The number of detectors in the pool that are not currently assigned to any client.
+        """
+        with self.__lock:
+            return len(self.__free_detectors)
+
+    def get_size(self) -> int:
+        """
+        Get the number of detectors in the pool.
+
+        :return:    The number of detectors in the pool.
+        """
+        return len(self.__detectors)
+
+    def release(self, client_id: Hashable) -> None:
+        """
+        Release the detector (if any) that is assigned to the specified client, and return it to the pool.
+
+        .. note::
+            The detector is restarted before being returned to the pool, so that the next client to acquire it
+            doesn't inherit any of the temporal state from the previous client's sequence.
+
+        :param client_id:   The ID of the client.
+        """
+        with self.__lock:
+            detector = self.__assigned_detectors.pop(client_id, None)  # type: Optional[SkeletonDetector]
+
+        if detector is None:
+            return
+
+        # Note: The restart is done without the lock held, since it may take a while.
+        try:
+            detector.restart()
+        finally:
+            with self.__lock:
+                self.__free_detectors.append(detector)
+                self.__detector_freed.notify()
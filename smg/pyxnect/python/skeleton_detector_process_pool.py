@@ -0,0 +1,397 @@
+import multiprocessing
+import numpy as np
+import queue
+import threading
+
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from .shared_frame_ring import SharedFrameRing
+from .skeleton_batch import SkeletonBatch
+from .skeleton_detector import SkeletonDetector
+
+
+class SkeletonDetectorProcessPool:
+    """
+    A pool of XNect-based 3D skeleton detectors, each of which runs in its own process.
+
+    .. note::
+        This has the same client-pinning semantics as SkeletonDetectorPool, but since each detector runs in its own
+        process, inference no longer competes for the GIL with whatever the calling process is doing (e.g. handling
+        sockets and decompressing frames). Frames are passed to the detector processes via a shared frame ring, so
+        only slot indices are sent over the (per-process) request queues, and the results come back as serialised
+        skeleton batches (see SkeletonBatch.to_bytes), which are small.
+    .. note::
+        Submitting a frame blocks until a slot in the ring is free, which bounds the number of frames in flight.
+        A slot is returned to the ring once the result for the frame it holds has been received.
+    .. note::
+        On platforms that start child processes by spawning them (e.g. Windows), the detector factory must be
+        picklable (e.g. SkeletonDetector itself, or a functools.partial of it, but not a lambda).
+    """
+
+    # CONSTRUCTOR
+
+    def __init__(self, size: int, *, detector_factory: Callable[[], SkeletonDetector] = SkeletonDetector,
+                 max_image_shape: Tuple[int, int] = (1080, 1920), slot_count: Optional[int] = None):
+        """
+        Construct a pool of 3D skeleton detector processes.
+
+        :param size:                The number of detector processes in the pool.
+        :param detector_factory:    A function that can be used to construct each detector (this will be called in
+                                    the detector's process).
+        :param max_image_shape:     The maximum shape of the images that can be submitted, as (height, width).
+        :param slot_count:          The number of slots in the shared frame ring (None = twice the pool size, which
+                                    allows each detector to have one frame queued whilst processing another).
+        """
+        if size < 1:
+            raise ValueError("A skeleton detector process pool must contain at least one detector")
+
+        self.__frame_ring = SharedFrameRing(slot_count if slot_count is not None else 2 * size, max_image_shape)
+        self.__request_queues = [multiprocessing.Queue() for _ in range(size)]  # type: List[multiprocessing.Queue]
+        self.__result_queue = multiprocessing.Queue()                           # type: multiprocessing.Queue
+
+        # Start the detector processes, and wait for all of them to construct their detectors (the processes are
+        # all started before waiting, so that the detectors are constructed in parallel).
+        self.__processes = [
+            multiprocessing.Process(
+                target=_run_detector_process,
+                args=(i, detector_factory, self.__frame_ring, self.__request_queues[i], self.__result_queue),
+                daemon=True
+            ) for i in range(size)
+        ]  # type: List[multiprocessing.Process]
+
+        for process in self.__processes:
+            process.start()
+
+        errors = self.__wait_for_detectors()  # type: List[str]
+
+        if len(errors) > 0:
+            self.__stop_processes()
+            raise RuntimeError("Could not construct the skeleton detectors:\n{}".format("\n".join(errors)))
+
+        self.__assigned_workers = {}                                            # type: Dict[Hashable, int]
+        self.__free_slots = deque(range(self.__frame_ring.get_slot_count()))    # type: deque
+        self.__free_workers = list(range(size))                                 # type: List[int]
+        self.__next_request_id = 0                                              # type: int
+        self.__pending_requests = {}                                            # type: Dict[int, tuple]
+        self.__should_terminate = False                                         # type: bool
+
+        # Set up the synchronisation primitives.
+        self.__lock = threading.Lock()
+        self.__slot_freed = threading.Condition(self.__lock)
+        self.__worker_freed = threading.Condition(self.__lock)
+
+        # Start the thread that will receive the results from the detector processes.
+        self.__result_thread = threading.Thread(target=self.__receive_results, daemon=True)
+        self.__result_thread.start()
+
+    # SPECIAL METHODS
+
+    def __enter__(self):
+        """No-op (needed to allow the pool's lifetime to be managed by a with statement)."""
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        """Destroy the pool at the end of the with statement that's used to manage its lifetime."""
+        self.terminate()
+
+    # PUBLIC METHODS
+
+    def acquire(self, client_id: Hashable, *, timeout: Optional[float] = None) -> int:
+        """
+        Get the index of the detector process that is assigned to the specified client, assigning it a free one if
+        necessary.
+
+        .. note::
+            If no detector process is currently free, this will block until one is released (or the timeout expires).
+
+        :param client_id:   The ID of the client.
+        :param timeout:     The maximum time (in seconds) to wait for a detector to become free (None = forever).
+        :return:            The index of the detector process that is assigned to the client.
+        :raises TimeoutError: If no detector became free before the timeout expired.
+        """
+        with self.__lock:
+            worker_idx = self.__assigned_workers.get(client_id)  # type: Optional[int]
+            if worker_idx is not None:
+                return worker_idx
+
+            if not self.__worker_freed.wait_for(lambda: len(self.__free_workers) > 0, timeout):
+                raise TimeoutError("Timed out waiting for a free skeleton detector")
+
+            worker_idx = self.__free_workers.pop()
+            self.__assigned_workers[client_id] = worker_idx
+            return worker_idx
+
+    def get_free_detector_count(self) -> int:
+        """
+        Get the number of detector processes in the pool that are not currently assigned to any client.
+
+        :return:    The number of detector processes in the pool that are not currently assigned to any client.
+        """
+        with self.__lock:
+            return len(self.__free_workers)
+
+    def get_size(self) -> int:
+        """
+        Get the number of detector processes in the pool.
+
+        :return:    The number of detector processes in the pool.
+        """
+        return len(self.__processes)
+
+    def release(self, client_id: Hashable) -> Optional[Future]:
+        """
+        Release the detector process (if any) that is assigned to the specified client, and return it to the pool.
+
+        .. note::
+            The detector is restarted before processing any frames from the next client to acquire it, so that the
+            next client doesn't inherit any of the temporal state from the previous client's sequence. The restart
+            is queued behind any of the previous client's frames that are still in flight, so this doesn't block.
+
+        :param client_id:   The ID of the client.
+        :return:            A future that will be completed once the restart has happened, or None if the client
+                            didn't have a detector assigned to it.
+        """
+        with self.__lock:
+            worker_idx = self.__assigned_workers.pop(client_id, None)  # type: Optional[int]
+            if worker_idx is None:
+                return None
+
+            future = self.__send_request(worker_idx, None, False)  # type: Future
+            self.__free_workers.append(worker_idx)
+            self.__worker_freed.notify()
+            return future
+
+    def submit(self, client_id: Hashable, image: np.ndarray, world_from_camera: np.ndarray, *,
+               timeout: Optional[float] = None, use_xnect_poses: bool = False) -> Future:
+        """
+        Submit a frame to be processed by the detector process that is assigned to the specified client.
+
+        .. note::
+            The image is copied into a slot of the shared frame ring, so the caller is free to reuse it as soon as
+            this returns.
+
+        :param client_id:           The ID of the client (a detector will be assigned to it if necessary).
+        :param image:               The RGB image (a uint8 array of shape HxWx3).
+        :param world_from_camera:   The camera pose.
+        :param timeout:             The maximum time (in seconds) to wait for a detector and a free slot.
+        :param use_xnect_poses:     Whether to use the joint poses produced by XNect.
+        :return:                    A future that will hold the batch of skeletons detected in the frame.
+        :raises TimeoutError:       If no detector or slot became free before the timeout expired.
+        """
+        worker_idx = self.acquire(client_id, timeout=timeout)  # type: int
+
+        # Wait for a free slot in the ring.
+        with self.__lock:
+            if self.__should_terminate:
+                raise RuntimeError("Cannot submit a frame to a pool that has been terminated")
+            if not self.__slot_freed.wait_for(lambda: len(self.__free_slots) > 0 or self.__should_terminate, timeout):
+                raise TimeoutError("Timed out waiting for a free frame slot")
+            if self.__should_terminate:
+                raise RuntimeError("The pool was terminated whilst waiting to submit a frame")
+
+            slot_idx = self.__free_slots.popleft()  # type: int
+
+        # Copy the frame into the slot (without the lock held, since nobody else can be using the slot).
+        try:
+            self.__frame_ring.write_frame(slot_idx, image, world_from_camera)
+        except BaseException:
+            with self.__lock:
+                self.__free_slots.append(slot_idx)
+                self.__slot_freed.notify()
+            raise
+
+        # Send the slot index to the detector process.
+        with self.__lock:
+            return self.__send_request(worker_idx, slot_idx, use_xnect_poses)
+
+    def terminate(self) -> None:
+        """
+        Tell the detector processes to terminate, failing any requests that have not yet been completed.
+
+        .. note::
+            The futures of any such requests are already running (see __send_request), so they can't be cancelled.
+            Instead, they're completed with a RuntimeError, so that anyone waiting on them is woken up.
+        """
+        with self.__lock:
+            if self.__should_terminate:
+                return
+
+            self.__should_terminate = True
+            for future, _, _ in self.__pending_requests.values():
+                future.set_exception(RuntimeError("The skeleton detector process pool was terminated"))
+            self.__pending_requests.clear()
+            self.__slot_freed.notify_all()
+
+        self.__stop_processes()
+        self.__result_thread.join()
+
+    # PRIVATE METHODS
+
+    def __free_slot(self, slot_idx: Optional[int]) -> None:
+        """
+        Return the specified slot (if any) to the ring.
+
+        .. note::
+            The lock must be held when calling this.
+
+        :param slot_idx:    The index of the slot (None for requests that don't use a slot, e.g. restarts).
+        """
+        if slot_idx is not None:
+            self.__free_slots.append(slot_idx)
+            self.__slot_freed.notify()
+
+    def __receive_results(self) -> None:
+        """Receive the results from the detector processes, and complete the corresponding futures."""
+        while True:
+            try:
+                request_id, payload, error = self.__result_queue.get(timeout=0.1)
+            except queue.Empty:
+                with self.__lock:
+                    if self.__should_terminate:
+                        return
+
+                    # If any of the detector processes have died, fail the requests that were sent to them.
+                    for dead_request_id, (future, worker_idx, slot_idx) in list(self.__pending_requests.items()):
+                        if not self.__processes[worker_idx].is_alive():
+                            del self.__pending_requests[dead_request_id]
+                            future.set_exception(RuntimeError("Detector process {} died".format(worker_idx)))
+                            self.__free_slot(slot_idx)
+
+                continue
+
+            with self.__lock:
+                entry = self.__pending_requests.pop(request_id, None)  # type: Optional[tuple]
+                if entry is None:
+                    continue
+
+                future, _, slot_idx = entry
+                self.__free_slot(slot_idx)
+
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(SkeletonBatch.from_bytes(payload) if payload is not None else None)
+
+    def __send_request(self, worker_idx: int, slot_idx: Optional[int], use_xnect_poses: bool) -> Future:
+        """
+        Send a request to the specified detector process.
+
+        .. note::
+            The lock must be held when calling this.
+
+        :param worker_idx:      The index of the detector process.
+        :param slot_idx:        The index of the slot containing the frame to process (None = restart the detector).
+        :param use_xnect_poses: Whether to use the joint poses produced by XNect.
+        :return:                A future that will hold the result of the request.
+        """
+        future = Future()  # type: Future
+        future.set_running_or_notify_cancel()
+
+        request_id = self.__next_request_id  # type: int
+        self.__next_request_id += 1
+        self.__pending_requests[request_id] = (future, worker_idx, slot_idx)
+        self.__request_queues[worker_idx].put((request_id, slot_idx, use_xnect_poses))
+        return future
+
+    def __stop_processes(self) -> None:
+        """Tell the detector processes to stop, and wait for them to do so."""
+        for request_queue in self.__request_queues:
+            request_queue.put(None)
+
+        for process in self.__processes:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+
+    def __wait_for_detectors(self) -> List[str]:
+        """
+        Wait for all of the detector processes to report whether they managed to construct their detectors.
+
+        .. note::
+            The result queue is polled with a timeout, so that a process that dies without reporting back (e.g. due
+            to a native crash whilst XNect is being constructed) is noticed, rather than being waited for forever.
+
+        :return:    The errors (if any) that occurred whilst constructing the detectors.
+        """
+        errors = []                                             # type: List[str]
+        pending_workers = set(range(len(self.__processes)))     # type: Set[int]
+
+        def receive(timeout: Optional[float]) -> bool:
+            try:
+                _, worker_idx, error = self.__result_queue.get(timeout=timeout) \
+                    if timeout is not None else self.__result_queue.get_nowait()
+            except queue.Empty:
+                return False
+
+            pending_workers.discard(worker_idx)
+            if error is not None:
+                errors.append("Detector {}: {}".format(worker_idx, error))
+            return True
+
+        while len(pending_workers) > 0:
+            if receive(0.1):
+                continue
+
+            # If any of the processes we're still waiting for have died, first receive any messages that they sent
+            # before dying (a process's messages are flushed before it exits), and then give up on the rest.
+            dead_workers = [i for i in pending_workers if not self.__processes[i].is_alive()]  # type: List[int]
+            if len(dead_workers) > 0:
+                while receive(None):
+                    pass
+
+                for worker_idx in dead_workers:
+                    if worker_idx in pending_workers:
+                        pending_workers.discard(worker_idx)
+                        errors.append("Detector {}: The process died (exit code {})".format(
+                            worker_idx, self.__processes[worker_idx].exitcode
+                        ))
+
+        return errors
+
+
+def _run_detector_process(worker_idx: int, detector_factory: Callable[[], SkeletonDetector],
+                          frame_ring: SharedFrameRing, request_queue: multiprocessing.Queue,
+                          result_queue: multiprocessing.Queue) -> None:
+    """
+    Run a detector process.
+
+    .. note::
+        This is a module-level function (rather than a method of SkeletonDetectorProcessPool) so that it can be
+        pickled when child processes are spawned.
+
+    :param worker_idx:          The index of the detector process.
+    :param detector_factory:    A function that can be used to construct the detector.
+    :param frame_ring:          The shared frame ring via which frames are passed to the process.
+    :param request_queue:       The queue on which the process receives requests.
+    :param result_queue:        The queue on which the process sends results.
+    """
+    # Construct the detector, and let the pool know when it's ready.
+    try:
+        detector = detector_factory()  # type: SkeletonDetector
+    except BaseException as e:
+        result_queue.put((None, worker_idx, "{}: {}".format(type(e).__name__, e)))
+        return
+
+    result_queue.put((None, worker_idx, None))
+
+    while True:
+        request = request_queue.get()  # type: Optional[Tuple[int, Optional[int], bool]]
+        if request is None:
+            return
+
+        request_id, slot_idx, use_xnect_poses = request
+        try:
+            if slot_idx is None:
+                detector.restart()
+                payload = None  # type: Any
+            else:
+                # Note: The image is a view onto the slot, so no copy of it is made.
+                image, world_from_camera = frame_ring.read_frame(slot_idx)
+                batch, _ = detector.detect_skeleton_batch(image, world_from_camera, use_xnect_poses=use_xnect_poses)
+                payload = batch.to_bytes()
+
+            result_queue.put((request_id, payload, None))
+        except Exception as e:
+            result_queue.put((request_id, None, "{}: {}".format(type(e).__name__, e)))
@@ -0,0 +1,169 @@
+import numpy as np
+
+from typing import Optional, Tuple
+
+
+class SkeletonExtrapolator:
+    """
+    Extrapolates the skeletons detected in the most recent frame on which XNect was run to later frames.
+
+    .. note::
+        This makes it possible to run XNect on only some of the frames, and still produce skeletons for the frames
+        in between. The joint positions are kept in world space, and are extrapolated linearly using per-joint
+        velocities estimated from the two most recent sets of results. Since the velocities are also in world space,
+        any motion of the camera between frames is accounted for automatically. To allow the extrapolated skeletons
+        to be visualised, the joints are projected into the current frame using its camera pose and a set of camera
+        intrinsics that are estimated from XNect's own 2D projections.
+    """
+
+    # CONSTRUCTOR
+
+    def __init__(self, *, max_extrapolation_time: float = 0.25):
+        """
+        Construct a skeleton extrapolator.
+
+        :param max_extrapolation_time:  The maximum time (in seconds) over which to extrapolate the joint positions
+                                        (beyond this, they are held fixed, to avoid them drifting off indefinitely).
+        """
+        self.__max_extrapolation_time = max_extrapolation_time  # type: float
+        self.reset()
+
+    # PUBLIC METHODS
+
+    def can_extrapolate(self, use_xnect_poses: bool) -> bool:
+        """
+        Get whether the extrapolator has results from which it can extrapolate skeletons of the required kind.
+
+        :param use_xnect_poses: Whether the extrapolated skeletons need to include XNect's joint poses.
+        :return:                True, if the extrapolator can extrapolate the required skeletons, or False otherwise.
+        """
+        return self.__timestamp is not None and (not use_xnect_poses or self.__global_rotations is not None)
+
+    def extrapolate(self, timestamp: float, world_from_camera: np.ndarray) \
+            -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray], Optional[np.ndarray], np.ndarray]:
+        """
+        Extrapolate the most recent skeletons to the specified time.
+
+        :param timestamp:           The time (in seconds) to which to extrapolate the skeletons.
+        :param world_from_camera:   The camera pose at that time.
+        :return:                    A tuple consisting of the person IDs (P), joint positions (P*J*3), global
+                                    rotations (P*3*3, if available), local joint rotations (P*J*3*3, if available)
+                                    and projected 2D joint positions (P*J*2) of the extrapolated skeletons.
+        """
+        dt = min(max(timestamp - self.__timestamp, 0.0), self.__max_extrapolation_time)  # type: float
+        positions = self.__positions + self.__velocities * dt  # type: np.ndarray
+        return (
+            self.__person_ids, positions, self.__global_rotations, self.__local_rotations,
+            self.__project(positions, world_from_camera)
+        )
+
+    def reset(self) -> None:
+        """Discard the most recent results (e.g. when changing from one sequence of images to another)."""
+        self.__global_rotations = None               # type: Optional[np.ndarray]
+        self.__intrinsics = None                     # type: Optional[Tuple[float, float, float, float]]
+        self.__local_rotations = None                # type: Optional[np.ndarray]
+        self.__person_ids = np.zeros(0, dtype=int)   # type: np.ndarray
+        self.__positions = np.zeros((0, 0, 3))       # type: np.ndarray
+        self.__timestamp = None                      # type: Optional[float]
+        self.__velocities = np.zeros((0, 0, 3))      # type: np.ndarray
+
+    def update(self, timestamp: float, world_from_camera: np.ndarray, person_ids: np.ndarray, positions: np.ndarray,
+               joints_2d: np.ndarray, global_rotations: Optional[np.ndarray],
+               local_rotations: Optional[np.ndarray]) -> None:
+        """
+        Update the extrapolator with the results of running XNect on a new frame.
+
+        :param timestamp:           The time (in seconds) at which the frame was captured.
+        :param world_from_camera:   The camera pose for the frame.
+        :param person_ids:          The IDs (XNect slots) of the people detected in the frame (P).
+        :param positions:           The world-space joint positions of the people (P*J*3).
+        :param joints_2d:           XNect's 2D projections of the people's joints (P*J*2).
+        :param global_rotations:    The global rotations of the people (P*3*3), if available.
+        :param local_rotations:     The local joint rotations of the people (P*J*3*3), if available.
+        """
+        # Estimate the velocity of each joint of each person who was also detected in the previous results.
+        velocities = np.zeros_like(positions)  # type: np.ndarray
+        if self.__timestamp is not None and timestamp > self.__timestamp and len(self.__person_ids) > 0 \
+                and self.__positions.shape[1:] == positions.shape[1:]:
+            previous_indices = np.full(np.concatenate([self.__person_ids, person_ids]).max() + 1, -1)
+            previous_indices[self.__person_ids] = np.arange(len(self.__person_ids))
+            matches = previous_indices[person_ids]  # type: np.ndarray
+            found = matches >= 0  # type: np.ndarray
+            velocities[found] = (positions[found] - self.__positions[matches[found]]) / (timestamp - self.__timestamp)
+
+        # Re-estimate the camera intrinsics from XNect's own 2D projections of the joints.
+        intrinsics = SkeletonExtrapolator.__estimate_intrinsics(
+            SkeletonExtrapolator.__world_to_camera(positions.reshape(-1, 3), world_from_camera),
+            joints_2d.reshape(-1, 2)
+        )  # type: Optional[Tuple[float, float, float, float]]
+        if intrinsics is not None:
+            self.__intrinsics = intrinsics
+
+        self.__global_rotations = global_rotations
+        self.__local_rotations = local_rotations
+        self.__person_ids = person_ids
+        self.__positions = positions
+        self.__timestamp = timestamp
+        self.__velocities = velocities
+
+    # PRIVATE METHODS
+
+    def __project(self, positions: np.ndarray, world_from_camera: np.ndarray) -> np.ndarray:
+        """
+        Project a set of world-space joint positions into the frame with the specified camera pose.
+
+        :param positions:           The world-space joint positions (P*J*3).
+        :param world_from_camera:   The camera pose.
+        :return:                    The projected 2D joint positions (P*J*2).
+        """
+        if self.__intrinsics is None:
+            return np.zeros(positions.shape[:-1] + (2,))
+
+        fx, fy, cx, cy = self.__intrinsics
+        points = SkeletonExtrapolator.__world_to_camera(positions.reshape(-1, 3), world_from_camera)  # type: np.ndarray
+        z = np.maximum(points[:, 2], 1e-6)  # type: np.ndarray
+        return np.stack([
+            fx * points[:, 0] / z + cx, fy * points[:, 1] / z + cy
+        ], axis=1).reshape(positions.shape[:-1] + (2,))
+
+    # PRIVATE STATIC METHODS
+
+    @staticmethod
+    def __estimate_intrinsics(points: np.ndarray, projections: np.ndarray) \
+            -> Optional[Tuple[float, float, float, float]]:
+        """
+        Estimate the pinhole camera intrinsics that best explain a set of projections of camera-space points.
+
+        .. note::
+            Each image axis is fitted independently by linear least squares (u = fx * x / z + cx, and similarly
+            for v).
+
+        :param points:      The camera-space points (N*3).
+        :param projections: The 2D projections of the points (N*2).
+        :return:            The estimated intrinsics (fx, fy, cx, cy), or None if they cannot be estimated.
+        """
+        valid = points[:, 2] > 1e-6  # type: np.ndarray
+        if np.count_nonzero(valid) < 2:
+            return None
+
+        normalised = points[valid, :2] / points[valid, 2:]  # type: np.ndarray
+        projections = projections[valid]
+        intrinsics = []
+        for axis in range(2):
+            a = np.stack([normalised[:, axis], np.ones(len(normalised))], axis=1)  # type: np.ndarray
+            if np.linalg.matrix_rank(a) < 2:
+                return None
+            intrinsics.append(np.linalg.lstsq(a, projections[:, axis], rcond=None)[0])
+
+        return intrinsics[0][0], intrinsics[1][0], intrinsics[0][1], intrinsics[1][1]
+
+    @staticmethod
+    def __world_to_camera(points: np.ndarray, world_from_camera: np.ndarray) -> np.ndarray:
+        """
+        Transform a set of points from world space to camera space.
+
+        :param points:              The points in world space, as an N*3 array.
+        :param world_from_camera:   The camera pose, as a transformation from camera space to world space.
+        :return:                    The points in camera space, as an N*3 array.
+        """
+        return (points - world_from_camera[0:3, 3]) @ world_from_camera[0:3, 0:3]
@@ -0,0 +1,330 @@
+import numpy as np
+
+from typing import Optional, Tuple
+
+from .skeleton_batch import SkeletonBatch
+
+# Note: SciPy is only imported when people actually need to be matched to tracks, so that importing this module is
+#       cheap.
+
+
+class SkeletonTracker:
+    """
+    Tracks people over time, assigning them stable IDs and smoothing their joint positions and rotations.
+
+    .. note::
+        XNect's person indices are slot indices, which are not guaranteed to stay attached to the same person from
+        one frame to the next. This tracker associates the people detected in each frame with its existing tracks
+        by solving an assignment problem (using the Hungarian algorithm) on the distances between their mid-hips,
+        starts a new track for each person who can't be associated with an existing track, and ends any track that
+        has gone unobserved for too many frames in a row.
+    .. note::
+        The joint positions and rotations of each track are smoothed using either a One-Euro filter or a
+        constant-velocity Kalman filter. All of the tracks are filtered together, treating each component of
+        each position and rotation matrix independently. The filtered rotation matrices are projected back onto
+        the nearest rotations afterwards.
+    """
+
+    # FILTER TYPES
+
+    # Use a constant-velocity Kalman filter.
+    FT_KALMAN = "kalman"  # type: str
+
+    # Don't smooth the joints at all (just track the people).
+    FT_NONE = "none"  # type: str
+
+    # Use a One-Euro filter.
+    FT_ONE_EURO = "one_euro"  # type: str
+
+    # CONSTRUCTOR
+
+    def __init__(self, *, beta: float = 0.5, derivative_cutoff: float = 1.0, filter_type: str = FT_ONE_EURO,
+                 max_distance: float = 0.5, max_missed_frames: int = 5, measurement_noise: float = 1e-4,
+                 min_cutoff: float = 1.0, process_noise: float = 1.0):
+        """
+        Construct a skeleton tracker.
+
+        :param beta:                The speed coefficient of the One-Euro filter (higher = less lag when moving).
+        :param derivative_cutoff:   The cutoff frequency (in Hz) used to smooth the derivatives in the One-Euro filter.
+        :param filter_type:         The type of filter with which to smooth the joints.
+        :param max_distance:        The maximum distance (in m) between the mid-hips of a person and a track for the
+                                    two to be associated.
+        :param max_missed_frames:   The maximum number of frames in a row for which a track can go unobserved before
+                                    it is ended.
+        :param measurement_noise:   The measurement noise variance for the Kalman filter.
+        :param min_cutoff:          The minimum cutoff frequency (in Hz) of the One-Euro filter (lower = smoother).
+        :param process_noise:       The process noise (acceleration) variance for the Kalman filter.
+        """
+        if filter_type not in (SkeletonTracker.FT_KALMAN, SkeletonTracker.FT_NONE, SkeletonTracker.FT_ONE_EURO):
+            raise ValueError("Unknown filter type: {}".format(filter_type))
+        if max_missed_frames < 0:
+            raise ValueError("The maximum number of missed frames must be non-negative")
+
+        self.__beta = beta                              # type: float
+        self.__derivative_cutoff = derivative_cutoff    # type: float
+        self.__filter_type = filter_type                # type: str
+        self.__max_distance = max_distance              # type: float
+        self.__max_missed_frames = max_missed_frames    # type: int
+        self.__measurement_noise = measurement_noise    # type: float
+        self.__min_cutoff = min_cutoff                  # type: float
+        self.__process_noise = process_noise            # type: float
+
+        self.reset()
+
+    # PUBLIC METHODS
+
+    def reset(self) -> None:
+        """Clear all of the tracks (e.g. when changing from one sequence of images to another)."""
+        self.__covariances = np.zeros((0, 0, 3))          # type: np.ndarray
+        self.__derivatives = np.zeros((0, 0))             # type: np.ndarray
+        self.__feature_layout = None                      # type: Optional[Tuple[int, bool]]
+        self.__last_times = np.zeros(0)                   # type: np.ndarray
+        self.__missed_frames = np.zeros(0, dtype=int)     # type: np.ndarray
+        self.__next_track_id = 0                          # type: int
+        self.__track_ids = np.zeros(0, dtype=np.int64)    # type: np.ndarray
+        self.__values = np.zeros((0, 0))                  # type: np.ndarray
+
+    def update(self, batch: SkeletonBatch, timestamp: float) -> SkeletonBatch:
+        """
+        Update the tracks with the people detected in a new frame.
+
+        :param batch:       The people detected in the frame.
+        :param timestamp:   The time (in seconds) at which the frame was captured.
+        :return:            A batch containing all of the current tracks. The person IDs are the track IDs, and the
+                            tracks that were not observed in this frame are marked as inactive.
+        """
+        active = batch.get_active()                         # type: np.ndarray
+        global_rotations = batch.get_global_rotations()     # type: Optional[np.ndarray]
+        keypoint_names = batch.get_keypoint_names()         # type: Tuple[str, ...]
+        measurements = SkeletonTracker.__pack_features(
+            batch.get_positions()[active],
+            global_rotations[active] if global_rotations is not None else None,
+            batch.get_local_rotations()[active] if global_rotations is not None else None
+        )  # type: np.ndarray
+        joint_count = len(keypoint_names)  # type: int
+
+        # If the joints being tracked have changed (e.g. because XNect's joint poses have been switched on or off),
+        # the existing tracks are no longer compatible, so start again from scratch.
+        feature_layout = (joint_count, global_rotations is not None)  # type: Tuple[int, bool]
+        if feature_layout != self.__feature_layout:
+            next_track_id = self.__next_track_id  # type: int
+            self.reset()
+            self.__feature_layout = feature_layout
+            self.__next_track_id = next_track_id
+            self.__values = np.zeros((0, measurements.shape[1]))
+            self.__derivatives = np.zeros((0, measurements.shape[1]))
+            self.__covariances = np.zeros((0, measurements.shape[1], 3))
+
+        # Predict where the existing tracks will be now (this is only non-trivial for the Kalman filter).
+        dts = np.maximum(timestamp - self.__last_times, 1e-6)  # type: np.ndarray
+        if self.__filter_type == SkeletonTracker.FT_KALMAN:
+            self.__predict_kalman(dts)
+
+        # Associate the detected people with the existing tracks.
+        midhip_idx = 3 * keypoint_names.index("MidHip")  # type: int
+        track_indices, detection_indices = self.__associate(
+            self.__values[:, midhip_idx:midhip_idx + 3], measurements[:, midhip_idx:midhip_idx + 3]
+        )
+
+        # Update the tracks that were associated with detected people.
+        if self.__filter_type == SkeletonTracker.FT_KALMAN:
+            self.__update_kalman(track_indices, measurements[detection_indices])
+        elif self.__filter_type == SkeletonTracker.FT_ONE_EURO:
+            self.__update_one_euro(track_indices, measurements[detection_indices], dts[track_indices])
+        else:
+            self.__values[track_indices] = measurements[detection_indices]
+
+        self.__last_times[track_indices] = timestamp
+        self.__missed_frames += 1
+        self.__missed_frames[track_indices] = 0
+        observed = np.zeros(len(self.__track_ids), dtype=bool)  # type: np.ndarray
+        observed[track_indices] = True
+
+        # End any tracks that have gone unobserved for too long.
+        alive = self.__missed_frames <= self.__max_missed_frames  # type: np.ndarray
+        self.__select_tracks(alive)
+        observed = observed[alive]
+
+        # Start new tracks for any detected people who weren't associated with existing tracks.
+        unassociated = np.ones(len(measurements), dtype=bool)  # type: np.ndarray
+        unassociated[detection_indices] = False
+        births = measurements[unassociated]  # type: np.ndarray
+        birth_count = len(births)  # type: int
+        feature_count = measurements.shape[1]  # type: int
+
+        initial_covariances = np.zeros((birth_count, feature_count, 3))  # type: np.ndarray
+        initial_covariances[:, :, 0] = self.__measurement_noise
+        initial_covariances[:, :, 2] = self.__process_noise
+
+        self.__covariances = np.concatenate([self.__covariances, initial_covariances])
+        self.__derivatives = np.concatenate([self.__derivatives, np.zeros((birth_count, feature_count))])
+        self.__last_times = np.concatenate([self.__last_times, np.full(birth_count, timestamp)])
+        self.__missed_frames = np.concatenate([self.__missed_frames, np.zeros(birth_count, dtype=int)])
+        self.__track_ids = np.concatenate([
+            self.__track_ids, np.arange(self.__next_track_id, self.__next_track_id + birth_count, dtype=np.int64)
+        ])
+        self.__values = np.concatenate([self.__values, births])
+        self.__next_track_id += birth_count
+        observed = np.concatenate([observed, np.ones(birth_count, dtype=bool)])
+
+        # Make the output batch from a copy of the current state of the tracks (the arrays of the batch are views
+        # onto the values passed in, and the state is updated in place when the next frame is tracked).
+        positions, global_rotations, local_rotations = SkeletonTracker.__unpack_features(
+            self.__values.copy(), joint_count, global_rotations is not None
+        )
+
+        return SkeletonBatch(
+            batch.get_frame_idx(), self.__track_ids.copy(), observed, positions, keypoint_names,
+            batch.get_keypoint_pairs(), global_rotations=global_rotations, local_rotations=local_rotations
+        )
+
+    # PRIVATE METHODS
+
+    def __associate(self, track_midhips: np.ndarray, detection_midhips: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Associate detected people with existing tracks, based on the distances between their mid-hips.
+
+        :param track_midhips:       The mid-hip positions of the tracks, as a T*3 array.
+        :param detection_midhips:   The mid-hip positions of the detected people, as a D*3 array.
+        :return:                    A pair of equal-length arrays containing the indices of the associated tracks
+                                    and the indices of the detected people with which they are associated.
+        """
+        if len(track_midhips) == 0 or len(detection_midhips) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+        from scipy.optimize import linear_sum_assignment
+
+        costs = np.linalg.norm(track_midhips[:, np.newaxis] - detection_midhips[np.newaxis], axis=2)  # type: np.ndarray
+        track_indices, detection_indices = linear_sum_assignment(costs)
+        close_enough = costs[track_indices, detection_indices] <= self.__max_distance  # type: np.ndarray
+        return track_indices[close_enough], detection_indices[close_enough]
+
+    def __predict_kalman(self, dts: np.ndarray) -> None:
+        """
+        Predict the current states of all of the tracks using their constant-velocity Kalman filters.
+
+        :param dts: The time (in seconds) since each track was last updated.
+        """
+        dt = dts[:, np.newaxis]  # type: np.ndarray
+        p00, p01, p11 = self.__covariances[:, :, 0], self.__covariances[:, :, 1], self.__covariances[:, :, 2]
+        q = self.__process_noise  # type: float
+
+        self.__values += self.__derivatives * dt
+        self.__covariances = np.stack([
+            p00 + 2 * dt * p01 + dt * dt * p11 + q * dt ** 4 / 4,
+            p01 + dt * p11 + q * dt ** 3 / 2,
+            p11 + q * dt * dt
+        ], axis=2)
+
+        # Since we've predicted forwards to the current time, make sure we don't predict forwards again next time.
+        self.__last_times += dts
+
+    def __select_tracks(self, mask: np.ndarray) -> None:
+        """
+        Keep only the specified tracks.
+
+        :param mask:    A boolean mask indicating which tracks to keep.
+        """
+        self.__covariances = self.__covariances[mask]
+        self.__derivatives = self.__derivatives[mask]
+        self.__last_times = self.__last_times[mask]
+        self.__missed_frames = self.__missed_frames[mask]
+        self.__track_ids = self.__track_ids[mask]
+        self.__values = self.__values[mask]
+
+    def __update_kalman(self, track_indices: np.ndarray, measurements: np.ndarray) -> None:
+        """
+        Update the constant-velocity Kalman filters of the specified tracks with new measurements.
+
+        :param track_indices:   The indices of the tracks to update.
+        :param measurements:    The new measurements for the tracks.
+        """
+        covariances = self.__covariances[track_indices]  # type: np.ndarray
+        p00, p01, p11 = covariances[:, :, 0], covariances[:, :, 1], covariances[:, :, 2]
+        s = p00 + self.__measurement_noise  # type: np.ndarray
+        k0, k1 = p00 / s, p01 / s
+        innovations = measurements - self.__values[track_indices]  # type: np.ndarray
+
+        self.__values[track_indices] += k0 * innovations
+        self.__derivatives[track_indices] += k1 * innovations
+        self.__covariances[track_indices] = np.stack([(1 - k0) * p00, (1 - k0) * p01, p11 - k1 * p01], axis=2)
+
+    def __update_one_euro(self, track_indices: np.ndarray, measurements: np.ndarray, dts: np.ndarray) -> None:
+        """
+        Update the One-Euro filters of the specified tracks with new measurements.
+
+        :param track_indices:   The indices of the tracks to update.
+        :param measurements:    The new measurements for the tracks.
+        :param dts:             The time (in seconds) since each track was last updated.
+        """
+        def smoothing_factor(cutoff: np.ndarray) -> np.ndarray:
+            r = 2 * np.pi * cutoff * dts[:, np.newaxis]
+            return r / (r + 1)
+
+        values = self.__values[track_indices]  # type: np.ndarray
+
+        # Smooth the derivatives, and use them to adapt the cutoff frequencies.
+        derivative_alpha = smoothing_factor(np.full(1, self.__derivative_cutoff))  # type: np.ndarray
+        derivatives = derivative_alpha * (measurements - values) / dts[:, np.newaxis] + \
+            (1 - derivative_alpha) * self.__derivatives[track_indices]  # type: np.ndarray
+        alpha = smoothing_factor(self.__min_cutoff + self.__beta * np.abs(derivatives))  # type: np.ndarray
+
+        self.__derivatives[track_indices] = derivatives
+        self.__values[track_indices] = alpha * measurements + (1 - alpha) * values
+
+    # PRIVATE STATIC METHODS
+
+    @staticmethod
+    def __orthonormalise(rots: np.ndarray) -> np.ndarray:
+        """
+        Project a set of 3*3 matrices onto the nearest rotation matrices.
+
+        :param rots:    The matrices, as an N*3*3 array.
+        :return:        The nearest rotation matrices, as an N*3*3 array.
+        """
+        if len(rots) == 0:
+            return rots
+
+        u, _, vt = np.linalg.svd(rots)
+        u[:, :, 2] *= np.sign(np.linalg.det(u @ vt))[:, np.newaxis]
+        return u @ vt
+
+    @staticmethod
+    def __pack_features(positions: np.ndarray, global_rotations: Optional[np.ndarray],
+                        local_rotations: Optional[np.ndarray]) -> np.ndarray:
+        """
+        Pack the joint positions and rotations of a set of people into a single feature vector per person.
+
+        :param positions:           The joint positions of the people, as a P*J*3 array.
+        :param global_rotations:    An optional P*3*3 array of the global rotations of the people.
+        :param local_rotations:     An optional P*J*3*3 array of the local rotations of the people's joints.
+        :return:                    The feature vectors of the people, as a P*F array.
+        """
+        people_count = len(positions)  # type: int
+        parts = [positions.reshape(people_count, -1)]
+        if global_rotations is not None:
+            parts.append(global_rotations.reshape(people_count, -1))
+            parts.append(local_rotations.reshape(people_count, -1))
+        return np.concatenate(parts, axis=1)
+
+    @staticmethod
+    def __unpack_features(features: np.ndarray, joint_count: int, has_rotations: bool) \
+            -> Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        Unpack the feature vectors of a set of tracks into joint positions and rotations.
+
+        :param features:        The feature vectors of the tracks, as a T*F array.
+        :param joint_count:     The number of joints (J).
+        :param has_rotations:   Whether the feature vectors contain rotations.
+        :return:                A tuple consisting of the joint positions (T*J*3), and, if available, the global
+                                rotations (T*3*3) and local joint rotations (T*J*3*3) of the tracks.
+        """
+        track_count = len(features)  # type: int
+        positions = features[:, :joint_count * 3].reshape(track_count, joint_count, 3)  # type: np.ndarray
+        if not has_rotations:
+            return positions, None, None
+
+        rotations = SkeletonTracker.__orthonormalise(
+            features[:, joint_count * 3:].reshape(-1, 3, 3)
+        ).reshape(track_count, joint_count + 1, 3, 3)  # type: np.ndarray
+        return positions, rotations[:, 0], rotations[:, 1:]
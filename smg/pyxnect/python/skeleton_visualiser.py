@@ -0,0 +1,104 @@
+import numpy as np
+
+from typing import List, Optional, Sequence
+
+
+class SkeletonVisualiser:
+    """
+    Draws the 2D skeletons of detected people over an image, with all of the people's bones drawn in a single pass.
+
+    .. note::
+        To reduce the cost of visualisation, it can optionally be drawn at a reduced resolution, and/or only every
+        N frames (on other frames, the most recent visualisation is returned again).
+    .. note::
+        If requested, each visualisation is drawn into the same buffer (which is only reallocated if the size of
+        the images changes), rather than into a newly-allocated copy of the image, so each visualisation is only
+        valid until the next one is made.
+    """
+
+    # CONSTRUCTOR
+
+    def __init__(self, joint_parents: Sequence[int], *, bone_thickness: int = 4, interval: int = 1,
+                 joint_radius: int = 6, reuse_buffer: bool = False, scale: float = 1.0):
+        """
+        Construct a skeleton visualiser.
+
+        :param joint_parents:   The parent of each joint (-1 for joints without a parent).
+        :param bone_thickness:  The thickness (in pixels, at full resolution) with which to draw the bones.
+        :param interval:        The interval (in frames) at which to actually make a new visualisation.
+        :param joint_radius:    The radius (in pixels, at full resolution) with which to draw the joints.
+        :param reuse_buffer:    Whether to draw each visualisation into the same buffer.
+        :param scale:           The factor by which to scale the input image to make the visualisation.
+        """
+        if interval < 1:
+            raise ValueError("The visualisation interval must be at least 1")
+        if scale <= 0.0:
+            raise ValueError("The visualisation scale must be positive")
+
+        self.__bone_thickness = max(int(round(bone_thickness * scale)), 1)  # type: int
+        self.__frame_count = 0                                               # type: int
+        self.__interval = interval                                           # type: int
+        self.__joint_parents = np.array(joint_parents, dtype=int)            # type: np.ndarray
+        self.__joint_radius = max(int(round(joint_radius * scale)), 1)       # type: int
+        self.__last_visualisation = None                                     # type: Optional[np.ndarray]
+        self.__reuse_buffer = reuse_buffer                                   # type: bool
+        self.__scale = scale                                                 # type: float
+
+    # PUBLIC METHODS
+
+    def reset(self) -> None:
+        """Reset the visualiser (e.g. when changing from one sequence of images to another)."""
+        self.__frame_count = 0
+        self.__last_visualisation = None
+
+    def visualise(self, image: np.ndarray, joints_2d: np.ndarray, colours: np.ndarray) -> np.ndarray:
+        """
+        Make a visualisation of the specified people's skeletons over an image.
+
+        :param image:       The image.
+        :param joints_2d:   The 2D positions of the joints of the people, as a P*J*2 array (in full-resolution
+                            image coordinates).
+        :param colours:     The colours assigned to the people, as a P*3 array.
+        :return:            The visualisation (this will be the previous visualisation if this frame is skipped).
+        """
+        import cv2
+
+        frame_idx = self.__frame_count  # type: int
+        self.__frame_count += 1
+
+        # If this frame should be skipped, return the previous visualisation (if there is one).
+        if frame_idx % self.__interval != 0 and self.__last_visualisation is not None:
+            return self.__last_visualisation
+
+        # Copy (and if necessary rescale) the image, into the previous visualisation if we're reusing it. (Note
+        # that cv2.resize only writes into the buffer if it's of the right size, and otherwise reallocates it.)
+        buffer = self.__last_visualisation if self.__reuse_buffer else None  # type: Optional[np.ndarray]
+        if self.__scale != 1.0:
+            visualisation = cv2.resize(
+                np.ascontiguousarray(image), None, dst=buffer, fx=self.__scale, fy=self.__scale,
+                interpolation=cv2.INTER_AREA
+            )  # type: np.ndarray
+        elif buffer is not None and buffer.shape == image.shape and buffer.dtype == image.dtype:
+            np.copyto(buffer, image)
+            visualisation = buffer
+        else:
+            visualisation = image.copy()
+
+        # Round the joint positions of all of the people to the (scaled) pixel grid in one go.
+        joint_count = joints_2d.shape[1]  # type: int
+        pixels = np.round(joints_2d * self.__scale).astype(np.int32)  # type: np.ndarray
+
+        # Make the line segments for all of the bones of all of the people in one go.
+        parents = self.__joint_parents[:joint_count]  # type: np.ndarray
+        children = np.flatnonzero(parents != -1)       # type: np.ndarray
+        segments = np.stack([pixels[:, children], pixels[:, parents[children]]], axis=2)  # type: np.ndarray
+
+        # Draw the bones of each person in a single call, followed by their joints.
+        for i in range(len(pixels)):
+            colour = [int(c) for c in colours[i]]  # type: List[int]
+            cv2.polylines(visualisation, list(segments[i]), False, colour, self.__bone_thickness)
+            for x, y in pixels[i]:
+                cv2.circle(visualisation, (int(x), int(y)), self.__joint_radius, colour, -1)
+
+        self.__last_visualisation = visualisation
+        return visualisation
@@ -0,0 +1,322 @@
+import numpy as np
+import time
+
+from timeit import default_timer as timer
+from typing import List, Optional, Sequence, Tuple
+
+from .xnect_backend import FrameResults, XNectBackend
+
+
+class SyntheticXNect(XNectBackend):
+    """
+    A deterministic, CPU-only stand-in for XNect that either generates or replays multi-person skeleton data.
+
+    .. note::
+        This makes it possible to benchmark and test everything downstream of the native XNect class (e.g. result
+        extraction, coordinate conversion, visualisation and the detection service) on machines without a GPU.
+        By default, it procedurally generates a number of people walking on the spot in front of the camera. If
+        a list of recorded frame results is provided, those are replayed (cyclically) instead. In either case, a
+        configurable amount of time can be spent "processing" each image, to simulate inference latency.
+    """
+
+    # PRIVATE CLASS CONSTANTS
+
+    # The parent of each joint (-1 for the root), following the layout of XNect's 21-joint skeleton.
+    __JOINT_PARENTS = (16, 15, 1, 2, 3, 1, 5, 6, 14, 8, 9, 14, 11, 12, -1, 14, 1, 4, 7, 10, 13)  # type: Tuple[int, ...]
+
+    # The position of each joint relative to the mid-hip in the rest pose (in m, with y pointing down).
+    __REST_POSE = np.array([
+        [0.0, -0.75, 0.0], [0.0, -0.5, 0.0], [-0.18, -0.48, 0.0], [-0.2, -0.2, 0.0], [-0.22, 0.05, 0.0],
+        [0.18, -0.48, 0.0], [0.2, -0.2, 0.0], [0.22, 0.05, 0.0], [-0.1, 0.0, 0.0], [-0.1, 0.45, 0.0],
+        [-0.1, 0.88, 0.0], [0.1, 0.0, 0.0], [0.1, 0.45, 0.0], [0.1, 0.88, 0.0], [0.0, 0.0, 0.0],
+        [0.0, -0.25, 0.0], [0.0, -0.6, 0.0], [-0.23, 0.12, 0.0], [0.23, 0.12, 0.0], [-0.1, 0.93, -0.12],
+        [0.1, 0.93, -0.12]
+    ])  # type: np.ndarray
+
+    # How far forwards (+1) or backwards (-1) each joint swings as the person walks (arms swing opposite to legs).
+    __SWING_WEIGHTS = np.array([
+        0, 0, 0, -0.5, -1, 0, 0.5, 1, 0, 0.5, 1, 0, -0.5, -1, 0, 0, 0, -1, 1, 1, -1
+    ], dtype=float)  # type: np.ndarray
+
+    # CONSTRUCTOR
+
+    def __init__(self, *, frame_latency: float = 0.0, frames: Optional[Sequence[FrameResults]] = None,
+                 fps: float = 30.0, intrinsics: Tuple[float, float, float, float] = (532.57, 531.54, 320.0, 240.0),
+                 max_num_people: int = 15, num_people: int = 3, seed: int = 0):
+        """
+        Construct a synthetic XNect backend.
+
+        :param frame_latency:   The amount of time (in seconds) to spend "processing" each image.
+        :param frames:          An optional list of recorded frame results to replay (if None, the results will be
+                                generated procedurally instead).
+        :param fps:             The frame rate to assume when generating motion procedurally.
+        :param intrinsics:      The camera intrinsics (fx, fy, cx, cy) to use to project joints into the image.
+        :param max_num_people:  The maximum number of people that can be detected (ignored when replaying).
+        :param num_people:      The number of people to generate (ignored when replaying).
+        :param seed:            The seed for the random number generator used to place people and pick colours.
+        """
+        if frames is not None and len(frames) == 0:
+            raise ValueError("At least one frame must be provided for replay")
+        if not 0 <= num_people <= max_num_people:
+            raise ValueError("The number of people must be between 0 and {}".format(max_num_people))
+
+        self.__fps = fps                        # type: float
+        self.__frame_idx = -1                   # type: int
+        self.__frame_latency = frame_latency    # type: float
+        self.__frames = frames                  # type: Optional[Sequence[FrameResults]]
+        self.__intrinsics = intrinsics          # type: Tuple[float, float, float, float]
+        self.__num_people = num_people          # type: int
+        self.__seed = seed                      # type: int
+
+        if frames is not None:
+            max_num_people = len(frames[0][0])
+
+        # Choose where each person stands, how they move, and what colour they are.
+        rng = np.random.RandomState(seed)
+        self.__colours = rng.randint(0, 256, size=(max_num_people, 3))  # type: np.ndarray
+        self.__phases = rng.uniform(0.0, 2 * np.pi, size=max_num_people)  # type: np.ndarray
+        self.__standing_positions = np.column_stack([
+            rng.uniform(-1.5, 1.5, size=max_num_people),
+            rng.uniform(-0.1, 0.3, size=max_num_people),
+            rng.uniform(2.5, 6.0, size=max_num_people)
+        ])  # type: np.ndarray
+
+        # Start with an empty frame.
+        self.__results = XNectBackend.make_frame_results(
+            max_num_people, len(SyntheticXNect.__JOINT_PARENTS)
+        )  # type: FrameResults
+        self.__preds = np.zeros_like(self.__results[1])  # type: np.ndarray
+
+    # PUBLIC METHODS
+
+    def get_frame_results(self, out: Optional[FrameResults] = None) -> FrameResults:
+        """
+        Get all of the results for the most recently processed frame in one go.
+
+        :param out: An optional set of arrays into which to write the results.
+        :return:    See XNectBackend.get_frame_results.
+        """
+        if out is not None:
+            return XNectBackend.copy_frame_results(self.__results, out)
+        return tuple(a.copy() for a in self.__results)
+
+    def get_joint_local_rotation(self, p: int, joint: int) -> np.ndarray:
+        """
+        Get the local rotation of the specified joint of the specified person.
+
+        :param p:       The index of the person.
+        :param joint:   The index of the joint.
+        :return:        The local rotation of the joint, as a 3*3 matrix.
+        """
+        return self.__results[2][p, joint].copy()
+
+    def get_joint3d_ik(self, person: int, joint: int) -> np.ndarray:
+        """
+        Get the position of the specified joint of the specified person, as estimated by the skeleton fitting.
+
+        :param person:  The index of the person.
+        :param joint:   The index of the joint.
+        :return:        The position of the joint.
+        """
+        return self.__results[1][person, joint].copy()
+
+    def get_joint3d_parent(self, joint: int) -> int:
+        """
+        Get the index of the parent of the specified joint.
+
+        :param joint:   The index of the joint.
+        :return:        The index of the joint's parent, or -1 if it doesn't have one.
+        """
+        return SyntheticXNect.__JOINT_PARENTS[joint]
+
+    def get_joint3d_pred(self, person: int, joint: int) -> np.ndarray:
+        """
+        Get the position of the specified joint of the specified person, as "predicted by the network".
+
+        .. note::
+            This is the IK position plus a small amount of deterministic noise.
+
+        :param person:  The index of the person.
+        :param joint:   The index of the joint.
+        :return:        The position of the joint.
+        """
+        return self.__preds[person, joint].copy()
+
+    def get_num_of_3d_joints(self) -> int:
+        """
+        Get the number of joints in each skeleton.
+
+        :return:    The number of joints in each skeleton.
+        """
+        return self.__results[1].shape[1]
+
+    def get_num_of_people(self) -> int:
+        """
+        Get the maximum number of people that can be detected (i.e. the number of person slots).
+
+        :return:    The maximum number of people that can be detected.
+        """
+        return len(self.__results[0])
+
+    def get_person_colour(self, p: int) -> np.ndarray:
+        """
+        Get the colour assigned to the specified person.
+
+        :param p:   The index of the person.
+        :return:    The colour assigned to the person, as a 3-element integer array.
+        """
+        return self.__colours[p].copy()
+
+    def get_skeleton_global_position(self, p: int) -> np.ndarray:
+        """
+        Get the global position of the specified person's skeleton.
+
+        :param p:   The index of the person.
+        :return:    The global position of the person's skeleton (i.e. the position of their mid-hip).
+        """
+        return self.__results[1][p, 14].copy()
+
+    def get_skeleton_global_rotation(self, p: int) -> np.ndarray:
+        """
+        Get the global rotation of the specified person's skeleton.
+
+        :param p:   The index of the person.
+        :return:    The global rotation of the person's skeleton, as a 3*3 matrix.
+        """
+        return self.__results[3][p].copy()
+
+    def is_person_active(self, p: int) -> bool:
+        """
+        Get whether a person was detected in the specified slot in the most recently processed frame.
+
+        :param p:   The index of the person.
+        :return:    True, if a person was detected in the specified slot, or False otherwise.
+        """
+        return bool(self.__results[0][p])
+
+    def process_image(self, img: np.ndarray) -> None:
+        """
+        "Detect" any people in the specified image.
+
+        .. note::
+            The image is validated in the same way as by the native binding, but its contents are otherwise ignored.
+
+        :param img: The image (a uint8 array of shape HxWx3).
+        """
+        if img.dtype != np.uint8:
+            raise TypeError("process_image: expected a uint8 image, got dtype {}".format(img.dtype))
+        if img.ndim != 3 or img.shape[2] != 3:
+            raise ValueError("process_image: expected an HxWx3 image, got shape {}".format(img.shape))
+
+        start = timer()  # type: float
+
+        self.__frame_idx += 1
+        if self.__frames is not None:
+            self.__results = tuple(np.asarray(a) for a in self.__frames[self.__frame_idx % len(self.__frames)])
+        else:
+            self.__results = self.__generate_results(self.__frame_idx / self.__fps)
+
+        # Make the "predicted" joint positions by adding some deterministic noise to the IK ones.
+        noise = np.random.RandomState(self.__seed + self.__frame_idx).normal(0.0, 10.0, size=self.__results[1].shape)
+        self.__preds = np.where(self.__results[0][:, np.newaxis, np.newaxis], self.__results[1] + noise, 0.0)
+
+        # Simulate the inference latency (time.sleep releases the GIL, just as the native binding does).
+        remaining = self.__frame_latency - (timer() - start)  # type: float
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def project_with_intrinsics(self, point: np.ndarray) -> np.ndarray:
+        """
+        Project a 3D point in the XNect coordinate system into the image.
+
+        :param point:   The 3D point.
+        :return:        The 2D image position onto which the point projects.
+        """
+        return self.__project(np.asarray(point, dtype=float)[np.newaxis])[0]
+
+    def reset_tracking(self) -> bool:
+        """
+        Reset the temporal tracking state of the backend (i.e. restart the sequence from the beginning).
+
+        :return:    True (since the tracking state can always be reset).
+        """
+        self.__frame_idx = -1
+        return True
+
+    # PRIVATE METHODS
+
+    def __generate_results(self, t: float) -> FrameResults:
+        """
+        Procedurally generate the results for the frame at the specified time.
+
+        :param t:   The time (in seconds) since the start of the sequence.
+        :return:    The results for the frame.
+        """
+        max_num_people, joint_count = len(self.__phases), len(SyntheticXNect.__JOINT_PARENTS)
+        results = XNectBackend.make_frame_results(max_num_people, joint_count)  # type: FrameResults
+        active, positions, local_rotations, global_rotations, joints_2d = results
+        n = self.__num_people  # type: int
+        if n == 0:
+            return results
+
+        # Make each person sway from side to side and turn a little, whilst swinging their arms and legs.
+        phases = 2 * np.pi * 0.5 * t + self.__phases[:n]  # type: np.ndarray
+        headings = 0.3 * np.sin(phases)                  # type: np.ndarray
+        swings = 0.3 * np.sin(2 * phases)                # type: np.ndarray
+        roots = self.__standing_positions[:n] + np.column_stack([
+            0.2 * np.sin(phases), np.zeros(n), 0.1 * np.cos(phases)
+        ])  # type: np.ndarray
+
+        # Compute the (global) joint positions of all of the people at once (converting them into mm).
+        local_positions = np.broadcast_to(SyntheticXNect.__REST_POSE, (n, joint_count, 3)).copy()  # type: np.ndarray
+        local_positions[:, :, 2] += swings[:, np.newaxis] * SyntheticXNect.__SWING_WEIGHTS * 0.5
+        global_rotations[:n] = SyntheticXNect.__rotations_about_axis(1, headings)
+        positions[:n] = 1000 * (np.matmul(local_positions, np.transpose(global_rotations[:n], (0, 2, 1))) +
+                                roots[:, np.newaxis, :])
+
+        # Make the local rotations (each joint rotates about the x axis in proportion to how far it swings).
+        local_rotations[:n] = SyntheticXNect.__rotations_about_axis(
+            0, (swings[:, np.newaxis] * SyntheticXNect.__SWING_WEIGHTS).ravel()
+        ).reshape(n, joint_count, 3, 3)
+
+        # Project all of the joints into the image, and mark the people as active.
+        joints_2d[:n] = self.__project(positions[:n].reshape(-1, 3)).reshape(n, joint_count, 2)
+        active[:n] = True
+
+        return results
+
+    def __project(self, points: np.ndarray) -> np.ndarray:
+        """
+        Project a set of 3D points in the XNect coordinate system into the image.
+
+        .. note::
+            XNect's x and y axes point the opposite way to the image's u and v axes (which is why the detector
+            flips them when converting XNect's results into our camera space), so they're negated here as well.
+
+        :param points:  The 3D points, as an N*3 array.
+        :return:        The 2D image positions onto which the points project, as an N*2 array.
+        """
+        fx, fy, cx, cy = self.__intrinsics
+        z = np.maximum(points[:, 2], 1e-6)  # type: np.ndarray
+        return np.column_stack([cx - fx * points[:, 0] / z, cy - fy * points[:, 1] / z])
+
+    # PRIVATE STATIC METHODS
+
+    @staticmethod
+    def __rotations_about_axis(axis: int, angles: np.ndarray) -> np.ndarray:
+        """
+        Make rotation matrices for rotations by the specified angles about one of the coordinate axes.
+
+        :param axis:    The index of the axis (0 = x, 1 = y, 2 = z).
+        :param angles:  The angles (in radians), as an N-element array.
+        :return:        The rotation matrices, as an N*3*3 array.
+        """
+        i, j = [k for k in range(3) if k != axis]
+        c, s = np.cos(angles), np.sin(angles)
+        rots = np.zeros((len(angles), 3, 3))  # type: np.ndarray
+        rots[:, axis, axis] = 1.0
+        rots[:, i, i] = c
+        rots[:, i, j] = -s
+        rots[:, j, i] = s
+        rots[:, j, j] = c
+        return rots
@@ -0,0 +1,224 @@
+import numpy as np
+
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+
+
+# The results for a single frame, in the form returned by get_frame_results.
+FrameResults = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+class XNectBackend(ABC):
+    """
+    The interface that a backend for SkeletonDetector must provide.
+
+    .. note::
+        This mirrors the surface of the native XNect class (see pyxnect.pyi). The native class doesn't derive from
+        this (it's a pybind11 class), but it provides exactly the same methods, so it can be used interchangeably
+        with any backend that does. All positions are in the XNect coordinate system (i.e. camera space, in mm).
+    """
+
+    # PUBLIC STATIC METHODS
+
+    @staticmethod
+    def copy_frame_results(results: FrameResults, out: FrameResults) -> FrameResults:
+        """
+        Copy the results for a frame into a set of output buffers, checking them as the native binding does.
+
+        .. note::
+            This is intended to help backends implemented in Python to support the out parameter of
+            get_frame_results.
+
+        :param results: The results for the frame.
+        :param out:     The output buffers (see make_frame_results).
+        :return:        The output buffers.
+        :raises TypeError:  If any of the buffers has the wrong dtype.
+        :raises ValueError: If the wrong number of buffers is specified, or any of them has the wrong shape.
+        """
+        if len(out) != 5:
+            raise ValueError("get_frame_results: expected out to contain 5 arrays")
+
+        for i, (result, buffer) in enumerate(zip(results, out)):
+            if buffer.dtype != result.dtype:
+                raise TypeError("get_frame_results: expected out[{}] to be an array of dtype {}".format(
+                    i, result.dtype
+                ))
+            if buffer.shape != result.shape:
+                raise ValueError("get_frame_results: expected out[{}] to have shape {}, got shape {}".format(
+                    i, result.shape, buffer.shape
+                ))
+
+            np.copyto(buffer, result)
+
+        return tuple(out)
+
+    @staticmethod
+    def make_frame_results(people_count: int, joint_count: int) -> FrameResults:
+        """
+        Make a set of zeroed arrays of the right types and shapes to hold the results for a frame.
+
+        .. note::
+            These can be passed to get_frame_results as its output buffers, so that the results for each frame
+            are written into the same arrays, rather than into newly-allocated ones.
+
+        :param people_count:    The maximum number of people that can be detected (P).
+        :param joint_count:     The number of joints in each skeleton (J).
+        :return:                The arrays (see get_frame_results), in which nobody is active.
+        """
+        return (
+            np.zeros(people_count, dtype=bool),
+            np.zeros((people_count, joint_count, 3)),
+            np.zeros((people_count, joint_count, 3, 3)),
+            np.zeros((people_count, 3, 3)),
+            np.zeros((people_count, joint_count, 2))
+        )
+
+    # PUBLIC ABSTRACT METHODS
+
+    @abstractmethod
+    def get_frame_results(self, out: Optional[FrameResults] = None) -> FrameResults:
+        """
+        Get all of the results for the most recently processed frame in one go.
+
+        .. note::
+            Like the out parameters of NumPy's functions, out can be used to pass in a set of preallocated arrays
+            (see make_frame_results) into which to write the results, rather than allocating new ones. The
+            arrays must be C-contiguous, writeable and of exactly the right types and shapes.
+
+        :param out: An optional set of arrays into which to write the results.
+        :return:    A tuple consisting of a P-element person activity mask, a P*J*3 array of IK joint positions,
+                    a P*J*3*3 array of local joint rotations, a P*3*3 array of global skeleton rotations and a
+                    P*J*2 array of projected 2D joint positions (where P is the maximum number of people and J is
+                    the number of joints). The entries for inactive people are all zero. If out was specified,
+                    these are the arrays that were passed in.
+        """
+        pass
+
+    @abstractmethod
+    def get_joint_local_rotation(self, p: int, joint: int) -> np.ndarray:
+        """
+        Get the local rotation of the specified joint of the specified person.
+
+        :param p:       The index of the person.
+        :param joint:   The index of the joint.
+        :return:        The local rotation of the joint, as a 3*3 matrix.
+        """
+        pass
+
+    @abstractmethod
+    def get_joint3d_ik(self, person: int, joint: int) -> np.ndarray:
+        """
+        Get the position of the specified joint of the specified person, as estimated by the skeleton fitting.
+
+        :param person:  The index of the person.
+        :param joint:   The index of the joint.
+        :return:        The position of the joint.
+        """
+        pass
+
+    @abstractmethod
+    def get_joint3d_parent(self, joint: int) -> int:
+        """
+        Get the index of the parent of the specified joint.
+
+        :param joint:   The index of the joint.
+        :return:        The index of the joint's parent, or -1 if it doesn't have one.
+        """
+        pass
+
+    @abstractmethod
+    def get_joint3d_pred(self, person: int, joint: int) -> np.ndarray:
+        """
+        Get the position of the specified joint of the specified person, as predicted by the network.
+
+        :param person:  The index of the person.
+        :param joint:   The index of the joint.
+        :return:        The position of the joint.
+        """
+        pass
+
+    @abstractmethod
+    def get_num_of_3d_joints(self) -> int:
+        """
+        Get the number of joints in each skeleton.
+
+        :return:    The number of joints in each skeleton.
+        """
+        pass
+
+    @abstractmethod
+    def get_num_of_people(self) -> int:
+        """
+        Get the maximum number of people that can be detected (i.e. the number of person slots).
+
+        :return:    The maximum number of people that can be detected.
+        """
+        pass
+
+    @abstractmethod
+    def get_person_colour(self, p: int) -> np.ndarray:
+        """
+        Get the colour assigned to the specified person.
+
+        :param p:   The index of the person.
+        :return:    The colour assigned to the person, as a 3-element integer array.
+        """
+        pass
+
+    @abstractmethod
+    def get_skeleton_global_position(self, p: int) -> np.ndarray:
+        """
+        Get the global position of the specified person's skeleton.
+
+        :param p:   The index of the person.
+        :return:    The global position of the person's skeleton.
+        """
+        pass
+
+    @abstractmethod
+    def get_skeleton_global_rotation(self, p: int) -> np.ndarray:
+        """
+        Get the global rotation of the specified person's skeleton.
+
+        :param p:   The index of the person.
+        :return:    The global rotation of the person's skeleton, as a 3*3 matrix.
+        """
+        pass
+
+    @abstractmethod
+    def is_person_active(self, p: int) -> bool:
+        """
+        Get whether a person was detected in the specified slot in the most recently processed frame.
+
+        :param p:   The index of the person.
+        :return:    True, if a person was detected in the specified slot, or False otherwise.
+        """
+        pass
+
+    @abstractmethod
+    def process_image(self, img: np.ndarray) -> None:
+        """
+        Detect any people in the specified image.
+
+        :param img: The image (a uint8 array of shape HxWx3).
+        """
+        pass
+
+    @abstractmethod
+    def project_with_intrinsics(self, point: np.ndarray) -> np.ndarray:
+        """
+        Project a 3D point in the XNect coordinate system into the image.
+
+        :param point:   The 3D point.
+        :return:        The 2D image position onto which the point projects.
+        """
+        pass
+
+    @abstractmethod
+    def reset_tracking(self) -> bool:
+        """
+        Try to reset the temporal tracking state of the backend.
+
+        :return:    True, if the tracking state was successfully reset, or False otherwise.
+        """
+        pass
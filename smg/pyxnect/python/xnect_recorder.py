@@ -0,0 +1,165 @@
+import json
+import numpy as np
+import os
+
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+
+class XNectRecorder:
+    """
+    Records the raw per-frame outputs of XNect to disk, so that they can be replayed later (see ReplayXNect).
+
+    .. note::
+        A recording is a directory containing a metadata file (metadata.json) and a sequence of chunks, each of
+        which is a subdirectory containing one .npy file per field. Each file holds that field for a block of
+        consecutive frames. This makes it possible to memory-map each field of each chunk when replaying, rather
+        than having to load the whole recording into memory. The frames are buffered in memory until a whole chunk
+        is ready, at which point the chunk and the metadata are written out, so a recording that's interrupted
+        remains readable up to the last complete chunk.
+    """
+
+    # PUBLIC CLASS CONSTANTS
+
+    # The name of the directory for each chunk (formatted with the chunk's index).
+    CHUNK_DIR_FORMAT = "chunk_{:06d}"  # type: str
+
+    # The fields recorded for each frame.
+    FIELDS = (
+        "active", "global_rotations", "ik_positions", "image_size", "joints_2d", "local_rotations", "pred_positions",
+        "sequence_idx", "timestamp", "world_from_camera"
+    )  # type: Tuple[str, ...]
+
+    # The name of the metadata file.
+    METADATA_FILENAME = "metadata.json"  # type: str
+
+    # CONSTRUCTOR
+
+    def __init__(self, output_dir: str, *, chunk_size: int = 256):
+        """
+        Construct an XNect recorder.
+
+        :param output_dir:  The directory to which to write the recording (this will be created if necessary).
+        :param chunk_size:  The number of frames in each chunk.
+        """
+        if chunk_size < 1:
+            raise ValueError("The chunk size must be at least 1")
+
+        self.__buffers = None               # type: Optional[Dict[str, np.ndarray]]
+        self.__buffered_count = 0           # type: int
+        self.__chunk_count = 0              # type: int
+        self.__chunk_size = chunk_size      # type: int
+        self.__frame_count = 0              # type: int
+        self.__metadata = {}                # type: Dict[str, Any]
+        self.__output_dir = output_dir      # type: str
+        self.__sequence_idx = -1            # type: int
+
+        os.makedirs(output_dir, exist_ok=True)
+
+    # SPECIAL METHODS
+
+    def __enter__(self):
+        """No-op (needed to allow the recorder's lifetime to be managed by a with statement)."""
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        """Destroy the recorder at the end of the with statement that's used to manage its lifetime."""
+        self.close()
+
+    # PUBLIC METHODS
+
+    def close(self) -> None:
+        """Write out any frames that are still buffered."""
+        if self.__buffered_count > 0:
+            self.__write_chunk()
+
+    def record_frame(self, *, active: np.ndarray, global_rotations: np.ndarray, ik_positions: np.ndarray,
+                     image_size: Tuple[int, int], joints_2d: np.ndarray, local_rotations: np.ndarray,
+                     pred_positions: np.ndarray, timestamp: float, world_from_camera: np.ndarray) -> None:
+        """
+        Record XNect's outputs for a frame.
+
+        :param active:              The P-element person activity mask.
+        :param global_rotations:    The P*3*3 array of global skeleton rotations.
+        :param ik_positions:        The P*J*3 array of joint positions estimated by the skeleton fitting.
+        :param image_size:          The size of the image, as a (height, width) pair.
+        :param joints_2d:           The P*J*2 array of projected 2D joint positions.
+        :param local_rotations:     The P*J*3*3 array of local joint rotations.
+        :param pred_positions:      The P*J*3 array of joint positions predicted by the network.
+        :param timestamp:           The time (in seconds) at which the frame was processed.
+        :param world_from_camera:   The camera pose for the frame.
+        """
+        frame = {
+            "active": active,
+            "global_rotations": global_rotations,
+            "ik_positions": ik_positions,
+            "image_size": np.array(image_size, dtype=np.int32),
+            "joints_2d": joints_2d,
+            "local_rotations": local_rotations,
+            "pred_positions": pred_positions,
+            "sequence_idx": np.int32(max(self.__sequence_idx, 0)),
+            "timestamp": np.float64(timestamp),
+            "world_from_camera": world_from_camera
+        }  # type: Dict[str, Any]
+
+        # If this is the first frame in a chunk, allocate the buffers for the chunk (based on the shapes and types
+        # of the frame's fields).
+        if self.__buffers is None:
+            self.__buffers = {
+                name: np.zeros((self.__chunk_size,) + np.shape(value), dtype=np.asarray(value).dtype)
+                for name, value in frame.items()
+            }
+
+        for name, value in frame.items():
+            self.__buffers[name][self.__buffered_count] = value
+
+        self.__buffered_count += 1
+        if self.__buffered_count == self.__chunk_size:
+            self.__write_chunk()
+
+    def set_backend_info(self, *, intrinsics: Tuple[float, float, float, float], joint_parents: Sequence[int],
+                         person_colours: np.ndarray) -> None:
+        """
+        Record the fixed properties of the XNect instance whose outputs are being recorded.
+
+        :param intrinsics:      The camera intrinsics (fx, fy, cx, cy) that XNect uses.
+        :param joint_parents:   The parent of each joint (-1 for the root).
+        :param person_colours:  The colours assigned to the person slots, as a P*3 array.
+        """
+        self.__metadata.update({
+            "intrinsics": [float(x) for x in intrinsics],
+            "joint_parents": [int(x) for x in joint_parents],
+            "person_colours": np.asarray(person_colours).tolist()
+        })
+        self.__write_metadata()
+
+    def start_sequence(self) -> None:
+        """Start a new sequence (e.g. when the detector whose outputs are being recorded is restarted)."""
+        self.__sequence_idx += 1
+
+    # PRIVATE METHODS
+
+    def __write_chunk(self) -> None:
+        """Write out the frames that are currently buffered as a new chunk."""
+        chunk_dir = os.path.join(
+            self.__output_dir, XNectRecorder.CHUNK_DIR_FORMAT.format(self.__chunk_count)
+        )  # type: str
+        os.makedirs(chunk_dir, exist_ok=True)
+
+        for name, buffer in self.__buffers.items():
+            np.save(os.path.join(chunk_dir, name + ".npy"), buffer[:self.__buffered_count])
+
+        self.__chunk_count += 1
+        self.__frame_count += self.__buffered_count
+        self.__buffered_count = 0
+        self.__write_metadata()
+
+    def __write_metadata(self) -> None:
+        """Write out the metadata for the recording."""
+        self.__metadata.update({
+            "chunk_count": self.__chunk_count,
+            "chunk_size": self.__chunk_size,
+            "frame_count": self.__frame_count
+        })
+
+        with open(os.path.join(self.__output_dir, XNectRecorder.METADATA_FILENAME), "w") as f:
+            json.dump(self.__metadata, f, indent=2)
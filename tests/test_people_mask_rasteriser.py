@@ -0,0 +1,104 @@
+import numpy as np
+
+from typing import List, Tuple
+
+from smg.pyxnect import PeopleMaskRasteriser, SkeletonBatch, SkeletonDetector, SyntheticXNect
+
+
+INTRINSICS = (532.57, 531.54, 320.0, 240.0)  # type: Tuple[float, float, float, float]
+
+
+def detect_synthetic_skeletons(world_from_camera: np.ndarray, *, num_people: int = 3) \
+        -> Tuple[SkeletonBatch, np.ndarray]:
+    """
+    Detect the skeletons in a frame generated by the synthetic backend.
+
+    :param world_from_camera:   The camera pose.
+    :param num_people:          The number of people for the backend to generate.
+    :return:                    A tuple consisting of the detected skeletons, and the backend's 2D joint positions
+                                for them (for the joints that the detector keeps).
+    """
+    backends = []  # type: List[SyntheticXNect]
+
+    def make_backend() -> SyntheticXNect:
+        backends.append(SyntheticXNect(intrinsics=INTRINSICS, num_people=num_people))
+        return backends[-1]
+
+    detector = SkeletonDetector(backend_factory=make_backend)
+    batch, _ = detector.detect_skeleton_batch(np.zeros((480, 640, 3), dtype=np.uint8), world_from_camera)
+    joints_2d = backends[-1].get_frame_results()[4][batch.get_person_ids()]  # type: np.ndarray
+    return batch, joints_2d[:, :batch.get_positions().shape[1]]
+
+
+def make_pose(angle: float, translation: Tuple[float, float, float]) -> np.ndarray:
+    """
+    Make a camera pose that rotates about the y axis and then translates.
+
+    :param angle:       The angle (in radians) by which to rotate.
+    :param translation: The translation.
+    :return:            The camera pose, as a 4*4 matrix.
+    """
+    c, s = np.cos(angle), np.sin(angle)
+    pose = np.eye(4)  # type: np.ndarray
+    pose[0:3, 0:3] = [[c, 0, s], [0, 1, 0], [-s, 0, c]]
+    pose[0:3, 3] = translation
+    return pose
+
+
+def mask_values_at(mask: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """
+    Look up the values of a mask at a set of 2D points that lie within it.
+
+    :param mask:    The mask.
+    :param points:  The points, as an N*2 array of (u, v) coordinates.
+    :return:        The values of the mask at the points.
+    """
+    height, width = mask.shape
+    us, vs = np.round(points[:, 0]).astype(int), np.round(points[:, 1]).astype(int)
+    assert np.all((us >= 0) & (us < width) & (vs >= 0) & (vs < height))
+    return mask[vs, us]
+
+
+def test_mask_covers_projected_joints() -> None:
+    """Check that the mask covers the 2D joints of the people, whatever the camera pose."""
+    for world_from_camera in [np.eye(4), make_pose(0.3, (1.0, -0.5, 2.0))]:
+        batch, joints_2d = detect_synthetic_skeletons(world_from_camera)
+        assert len(batch.get_person_ids()) == 3
+
+        mask = PeopleMaskRasteriser(scale=0.5).make_mask(
+            batch, world_from_camera, INTRINSICS, (480, 640)
+        )  # type: np.ndarray
+        assert np.all(mask_values_at(mask, joints_2d.reshape(-1, 2)) == 255)
+
+        # Check that the mask isn't trivially covering the whole image.
+        assert np.count_nonzero(mask) < 0.5 * mask.size
+
+
+def test_depth_gating() -> None:
+    """Check that pixels whose depths are inconsistent with the people's are excluded from the mask."""
+    batch, joints_2d = detect_synthetic_skeletons(np.eye(4), num_people=1)
+    rasteriser = PeopleMaskRasteriser(depth_tolerance=1.0, scale=0.5)
+    ungated_mask = rasteriser.make_mask(batch, np.eye(4), INTRINSICS, (480, 640))  # type: np.ndarray
+    person_depth = float(np.mean(batch.get_positions()[0, :, 2]))  # type: float
+
+    # If the depths are consistent with the person's (or invalid), the mask should be unaffected.
+    for depth in [person_depth, 0.0]:
+        depth_image = np.full((480, 640), depth, dtype=np.float32)  # type: np.ndarray
+        mask = rasteriser.make_mask(batch, np.eye(4), INTRINSICS, (480, 640), depth_image=depth_image)
+        assert np.array_equal(mask, ungated_mask)
+
+    # If the part of the image to the left of the person's middle is occluded by something close to the camera,
+    # and the part to the right shows a wall behind the person, the mask should be empty.
+    joints_2d = joints_2d.reshape(-1, 2)
+    split = int(round(np.median(joints_2d[:, 0])))  # type: int
+    depth_image = np.full((480, 640), person_depth + 5.0, dtype=np.float32)
+    depth_image[:, :split] = 0.5
+    mask = rasteriser.make_mask(batch, np.eye(4), INTRINSICS, (480, 640), depth_image=depth_image)
+    assert np.count_nonzero(ungated_mask[:, :split]) > 0 and np.count_nonzero(ungated_mask[:, split:]) > 0
+    assert np.count_nonzero(mask) == 0
+
+    # If only the part to the left is occluded, the joints to the right should still be covered.
+    depth_image[:, split:] = person_depth
+    mask = rasteriser.make_mask(batch, np.eye(4), INTRINSICS, (480, 640), depth_image=depth_image)
+    assert np.all(mask[:, :split] == 0)
+    assert np.all(mask_values_at(mask, joints_2d[joints_2d[:, 0] >= split + 2]) == 255)
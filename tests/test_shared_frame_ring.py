@@ -0,0 +1,16 @@
+import numpy as np
+
+from smg.pyxnect import SharedFrameRing
+
+
+def test_smaller_images_are_read_back_contiguously() -> None:
+    """Check that an image smaller than the maximum size is read back intact, as a contiguous array."""
+    ring = SharedFrameRing(2, (1080, 1920))
+    image = np.random.RandomState(0).randint(0, 256, size=(480, 640, 3)).astype(np.uint8)  # type: np.ndarray
+    world_from_camera = np.arange(16, dtype=float).reshape(4, 4)  # type: np.ndarray
+    ring.write_frame(1, image, world_from_camera)
+
+    read_image, read_world_from_camera = ring.read_frame(1)
+    assert read_image.flags["C_CONTIGUOUS"]
+    assert np.array_equal(read_image, image)
+    assert np.array_equal(read_world_from_camera, world_from_camera)
@@ -0,0 +1,213 @@
+import numpy as np
+import os
+import pytest
+import threading
+import time
+import tracemalloc
+
+from timeit import default_timer as timer
+from typing import List, Optional, Tuple
+
+import smg.pyxnect
+
+from smg.pyxnect import SkeletonDetector, SkeletonTracker, SyntheticXNect, XNectBackend
+from smg.pyxnect.python.xnect_backend import FrameResults
+
+
+def test_other_threads_progress_during_detection() -> None:
+    """Check that other Python threads keep running whilst the detector is waiting for XNect to process a frame."""
+    frame_latency = 0.5  # type: float
+    tick_interval = 0.005  # type: float
+    detector = SkeletonDetector(backend_factory=lambda: SyntheticXNect(frame_latency=frame_latency))
+    image = np.zeros((480, 640, 3), dtype=np.uint8)  # type: np.ndarray
+    detector.detect_skeletons(image, np.eye(4))
+
+    # Start a thread that records the time at which each of its ticks happens.
+    ticks = []  # type: List[float]
+    stop = threading.Event()
+
+    def tick() -> None:
+        while not stop.is_set():
+            ticks.append(timer())
+            time.sleep(tick_interval)
+
+    ticker = threading.Thread(target=tick)
+    ticker.start()
+
+    # Detect the skeletons in a frame (the backend takes frame_latency seconds to process it).
+    try:
+        start = timer()  # type: float
+        detector.detect_skeletons(image, np.eye(4))
+        end = timer()  # type: float
+    finally:
+        stop.set()
+        ticker.join()
+
+    # If the GIL had been held for the duration of the backend call, the ticker couldn't have ticked during it.
+    # Allow plenty of slack for slow or heavily loaded machines.
+    ticks_during_detection = sum(1 for t in ticks if start <= t <= end)  # type: int
+    assert end - start >= frame_latency
+    assert ticks_during_detection >= 0.25 * frame_latency / tick_interval
+
+
+def test_reused_buffers_avoid_per_frame_allocations() -> None:
+    """Check that once it has warmed up, a detector that reuses its buffers allocates almost nothing per frame."""
+    image = np.zeros((480, 640, 3), dtype=np.uint8)  # type: np.ndarray
+
+    # Generate a cycle of frames in which the people move, and the number of people changes.
+    cycle = []  # type: List[FrameResults]
+    for num_people in [3, 1, 0, 5, 2]:
+        generator = SyntheticXNect(num_people=num_people)
+        for _ in range(3):
+            generator.process_image(image)
+            cycle.append(generator.get_frame_results())
+
+    class CyclingXNect(SyntheticXNect):
+        """
+        A synthetic backend that replays the cycle of frames without allocating anything itself (so that only the
+        detector's allocations are measured).
+        """
+        def __init__(self) -> None:
+            super().__init__()
+            self.__frame_idx = -1
+
+        def get_frame_results(self, out: Optional[FrameResults] = None) -> FrameResults:
+            results = cycle[self.__frame_idx]  # type: FrameResults
+            return XNectBackend.copy_frame_results(results, out) if out is not None else results
+
+        def process_image(self, img: np.ndarray) -> None:
+            self.__frame_idx = (self.__frame_idx + 1) % len(cycle)
+
+    # Warm the detector up by running it over the whole cycle.
+    detector = SkeletonDetector(backend_factory=CyclingXNect, reuse_buffers=True)
+    for _ in range(len(cycle)):
+        detector.detect_skeleton_batch(image, np.eye(4), visualise=True)
+
+    # Record the peak amount of memory that's allocated during each frame of a couple more cycles.
+    peaks = []  # type: List[int]
+    person_counts = []  # type: List[int]
+    tracemalloc.start()
+    try:
+        for _ in range(2 * len(cycle)):
+            tracemalloc.clear_traces()
+            batch, _ = detector.detect_skeleton_batch(image, np.eye(4), visualise=True)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak)
+            person_counts.append(len(batch.get_person_ids()))
+    finally:
+        tracemalloc.stop()
+
+    # Check that the frames really did change. Then check that the allocations stayed small: without buffer reuse,
+    # each frame allocates more than a full-size copy of the image (for the visualisation).
+    assert sorted(set(person_counts)) == [0, 1, 2, 3, 5]
+    assert max(peaks) < 32 * 1024
+
+
+def test_timestamps_make_extrapolation_and_tracking_independent_of_processing_speed() -> None:
+    """Check that the skeletons don't depend on how fast the frames are processed if their timestamps are given."""
+    image = np.zeros((480, 640, 3), dtype=np.uint8)  # type: np.ndarray
+    runs = []  # type: List[List[np.ndarray]]
+    for processing_delay in [0.0, 0.02]:
+        detector = SkeletonDetector(
+            backend_factory=SyntheticXNect, inference_interval=3, tracker_factory=SkeletonTracker
+        )
+        positions = []  # type: List[np.ndarray]
+        for frame_idx in range(9):
+            batch, _ = detector.detect_skeleton_batch(image, np.eye(4), timestamp=frame_idx / 30.0)
+            positions.append(batch.get_positions().copy())
+            time.sleep(processing_delay)
+        runs.append(positions)
+
+    for fast, slow in zip(*runs):
+        assert np.allclose(fast, slow)
+
+
+def test_synthetic_joints_match_projected_camera_space_skeletons() -> None:
+    """Check that the synthetic backend's 2D joints are where the detector's skeletons project with its intrinsics."""
+    intrinsics = (532.57, 531.54, 320.0, 240.0)  # type: Tuple[float, float, float, float]
+    backends = []  # type: List[SyntheticXNect]
+
+    def make_backend() -> SyntheticXNect:
+        backends.append(SyntheticXNect(intrinsics=intrinsics))
+        return backends[-1]
+
+    detector = SkeletonDetector(backend_factory=make_backend)
+    image = np.zeros((480, 640, 3), dtype=np.uint8)  # type: np.ndarray
+    for _ in range(5):
+        batch, _ = detector.detect_skeleton_batch(image, np.eye(4))
+        assert len(batch.get_person_ids()) > 0
+
+        # Project the (camera-space, since the camera pose is the identity) skeletons into the image, and compare
+        # the results with the 2D joints that the backend produced (for the joints that the detector keeps).
+        fx, fy, cx, cy = intrinsics
+        positions = batch.get_positions()  # type: np.ndarray
+        projections = np.stack([
+            fx * positions[..., 0] / positions[..., 2] + cx, fy * positions[..., 1] / positions[..., 2] + cy
+        ], axis=-1)  # type: np.ndarray
+        joints_2d = backends[-1].get_frame_results()[4][batch.get_person_ids(), :positions.shape[1]]  # type: np.ndarray
+        assert np.allclose(projections, joints_2d, atol=1e-3)
+
+
+def make_xnect_data_dir(root: str, network_path_prefix: str) -> str:
+    """
+    Make a minimal XNect data directory, whose params file specifies network paths with the specified prefix.
+
+    :param root:                The directory in which to make the data directory.
+    :param network_path_prefix: The prefix to use for the network paths.
+    :return:                    The path to the data directory.
+    """
+    data_dir = os.path.join(root, "data")  # type: str
+    os.makedirs(os.path.join(data_dir, "FullBodyTracker"))
+    os.makedirs(os.path.join(data_dir, "CNNModels"))
+    with open(os.path.join(data_dir, "CNNModels", "net.prototxt"), "w"):
+        pass
+    with open(os.path.join(data_dir, "FullBodyTracker", "XNECT.params"), "w") as f:
+        f.write("ProcessHeight: 360\nProcessWidth: 640\nFirstNet: {}CNNModels/net.prototxt\n".format(
+            network_path_prefix
+        ))
+    with open(os.path.join(data_dir, "FullBodyTracker", "other.txt"), "w") as f:
+        f.write("other")
+    return data_dir
+
+
+@pytest.mark.parametrize("network_path_prefix", ["", "../../data/"])
+def test_relative_network_paths_are_resolved(monkeypatch, tmpdir, network_path_prefix: str) -> None:
+    """Check that relative network paths (including the stock ones) are resolved against the data directory."""
+    data_dir = make_xnect_data_dir(str(tmpdir), network_path_prefix)  # type: str
+    configs = []  # type: List[Tuple[str, List[str]]]
+
+    class FakeXNect(SyntheticXNect):
+        """A synthetic backend that records the config that it's constructed with, as the native XNect reads it."""
+        def __init__(self, config_file: str) -> None:
+            super().__init__()
+            with open(os.path.join(config_file, "XNECT.params")) as f:
+                configs.append((f.read(), sorted(os.listdir(config_file))))
+
+    monkeypatch.setitem(vars(smg.pyxnect), "XNect", FakeXNect)
+    SkeletonDetector(data_dir=data_dir)
+
+    params, filenames = configs[0]
+    network_path = os.path.normpath(os.path.join(data_dir, "CNNModels", "net.prototxt")).replace("\\", "/")
+    assert "FirstNet: {}\n".format(network_path) in params
+    assert filenames == ["XNECT.params", "other.txt"]
+
+    # Check that cleaning up the temporary config directory left the original one intact.
+    assert sorted(os.listdir(os.path.join(data_dir, "FullBodyTracker"))) == ["XNECT.params", "other.txt"]
+
+
+def test_missing_network_files_are_reported(monkeypatch, tmpdir) -> None:
+    """Check that a network path that doesn't resolve to an existing file is reported before XNect is constructed."""
+    data_dir = make_xnect_data_dir(str(tmpdir), "missing/")  # type: str
+    monkeypatch.setitem(vars(smg.pyxnect), "XNect", lambda config_file: SyntheticXNect())
+    with pytest.raises(RuntimeError, match="does not exist"):
+        SkeletonDetector(data_dir=data_dir)
+
+
+def test_exe_dir_is_a_deprecated_alias_for_the_data_dir(monkeypatch, tmpdir) -> None:
+    """Check that the data directory can still be specified via the directory containing the XNect executable."""
+    data_dir = make_xnect_data_dir(str(tmpdir), "../../data/")  # type: str
+    monkeypatch.setitem(vars(smg.pyxnect), "XNect", lambda config_file: SyntheticXNect())
+    with pytest.warns(DeprecationWarning):
+        SkeletonDetector(exe_dir=os.path.join(str(tmpdir), "bin", "Release"))
+    with pytest.raises(ValueError):
+        SkeletonDetector(data_dir=data_dir, exe_dir=os.path.join(str(tmpdir), "bin", "Release"))